@@ -0,0 +1,114 @@
+# Registro de actividad del dashboard de administración.
+#
+# Las altas y cambios de médicos, pacientes y citas agregan un evento a la tabla
+# Eventos_actividad (solo se inserta, nunca se actualiza) dentro de la misma
+# transacción que el cambio, así que un evento existe si y solo si el cambio se
+# confirmó. El feed se lee con una sola consulta sobre la clave primaria
+# (`TOP n ... ORDER BY id_evento DESC`) en lugar de tres TOP 5 con joins
+# combinados y ordenados en Python.
+#
+# id_evento es creciente: sirve de cursor para pedir solo lo nuevo
+# (`?since=<id>` o la cabecera Last-Event-ID de EventSource).
+
+MEDICO = 'Médico'
+PACIENTE = 'Paciente'
+CITA = 'Cita'
+
+# Nombre y detalle de cada tipo de entidad, resueltos al momento del evento.
+# nombre: médico o paciente; en las citas, el paciente (detalle es el médico).
+# La condición sobre la entidad la agregan record/record_many con _KEYS.
+_SOURCES = {
+    MEDICO: """
+        SELECT ?, ?, m.id_medico, u.nombre_completo, m.especialidad, m.estado
+        FROM Medicos m
+        JOIN Usuarios u ON m.id_usuario = u.id_usuario
+    """,
+    PACIENTE: """
+        SELECT ?, ?, p.id_paciente, u.nombre_completo, NULL, p.estado
+        FROM Pacientes p
+        JOIN Usuarios u ON p.id_usuario = u.id_usuario
+    """,
+    CITA: """
+        SELECT ?, ?, c.id_cita, up.nombre_completo, um.nombre_completo, c.estado
+        FROM Citas c
+        JOIN Pacientes p ON c.id_paciente = p.id_paciente
+        JOIN Usuarios up ON p.id_usuario = up.id_usuario
+        JOIN Medicos m ON c.id_medico = m.id_medico
+        JOIN Usuarios um ON m.id_usuario = um.id_usuario
+    """,
+}
+_KEYS = {MEDICO: 'm.id_medico', PACIENTE: 'p.id_paciente', CITA: 'c.id_cita'}
+
+FEED_LIMIT = 10
+MAX_FEED_LIMIT = 100
+
+_FEED_COLUMNS = """
+    id_evento, tipo, accion, id_entidad, nombre, detalle, estado,
+    CONVERT(varchar, fecha_evento, 120) AS fecha
+"""
+
+
+def record(cursor, tipo, id_entidad, accion='creado'):
+    """
+    Agrega un evento con los datos actuales de la entidad. Debe llamarse antes
+    del commit del cambio, con el mismo cursor. Es una sola sentencia
+    (INSERT ... SELECT), sin ida y vuelta extra para leer los nombres.
+    """
+    cursor.execute(f"""
+        INSERT INTO Eventos_actividad (tipo, accion, id_entidad, nombre, detalle, estado)
+        {_SOURCES[tipo]}
+        WHERE {_KEYS[tipo]} = ?
+    """, (tipo, accion, id_entidad))
+
+
+def record_many(cursor, tipo, ids, accion='creado'):
+    """
+    Como record() para varias entidades en una sola sentencia (altas en lote).
+    Los eventos quedan en el orden de los ids. Como mucho 1000 ids por llamada.
+    """
+    if not ids:
+        return
+    cursor.execute(f"""
+        INSERT INTO Eventos_actividad (tipo, accion, id_entidad, nombre, detalle, estado)
+        {_SOURCES[tipo]}
+        WHERE {_KEYS[tipo]} IN ({', '.join('?' * len(ids))})
+        ORDER BY {_KEYS[tipo]}
+    """, [tipo, accion] + list(ids))
+
+
+def _serialize(row):
+    # Mismo formato que devolvía dashboard.fetch_recent_activity, más el cursor y la acción
+    event_id, tipo, accion, id_entidad, nombre, detalle, estado, fecha = row
+    item = {'event_id': event_id, 'id': id_entidad, 'type': tipo, 'action': accion, 'date': fecha}
+    if tipo == MEDICO:
+        item.update(name=nombre, specialty=detalle or 'No Asignada')
+    elif tipo == CITA:
+        item.update(name=f"Cita {id_entidad}", details=f"Paciente: {nombre}, Médico: {detalle}", status=estado)
+    else:
+        item['name'] = nombre
+    return item
+
+
+def fetch_feed(cursor, since=None, limit=FEED_LIMIT):
+    """Los `limit` eventos más recientes (posteriores a `since` si se indica), del más nuevo al más viejo."""
+    limit = max(1, min(int(limit), MAX_FEED_LIMIT))
+    if since is None:
+        cursor.execute(f"SELECT TOP {limit} {_FEED_COLUMNS} FROM Eventos_actividad ORDER BY id_evento DESC")
+    else:
+        cursor.execute(f"""
+            SELECT TOP {limit} {_FEED_COLUMNS}
+            FROM Eventos_actividad
+            WHERE id_evento > ?
+            ORDER BY id_evento DESC
+        """, (int(since),))
+    return [_serialize(row) for row in cursor.fetchall()]
+
+
+def parse_cursor(value):
+    """Cursor de ?since= o Last-Event-ID. Lanza ValueError si no es un id de evento."""
+    if value is None or str(value).strip() == '':
+        return None
+    since = int(str(value).strip())
+    if since < 0:
+        raise ValueError(value)
+    return since
@@ -1,26 +1,41 @@
 # app.py
 from flask import Flask
+import importlib
 import logging
 import os
+import time
 from flask_cors import CORS
+from json_provider import ClinicJSONProvider
+import compression
+import assets
+import page_cache
+import logger
+import password_service
 
-# Import blueprints
-from views import views_bp
-from auth import auth_bp
-from dashboard import dashboard_bp
-from users import users_bp
-from doctors import doctors_bp
-from patients import patients_bp
-from appointments import appointments_bp
-from schedules import schedules_bp
-from consultas import consultas_bp
-from chatbot import chatbot_bp
-from reports import reports_bp
-from asistencia import asistencias_bp
-from user_profile import profile_bp
+# Blueprints de la aplicación: (módulo, nombre del blueprint).
+# Se importan dentro de create_app() para poder medir el costo de cada uno.
+BLUEPRINTS = [
+    ('views', 'views_bp'),
+    ('auth', 'auth_bp'),
+    ('dashboard', 'dashboard_bp'),
+    ('users', 'users_bp'),
+    ('doctors', 'doctors_bp'),
+    ('patients', 'patients_bp'),
+    ('appointments', 'appointments_bp'),
+    ('schedules', 'schedules_bp'),
+    ('consultas', 'consultas_bp'),
+    ('chatbot', 'chatbot_bp'),
+    ('reports', 'reports_bp'),
+    ('asistencia', 'asistencias_bp'),
+    ('user_profile', 'profile_bp'),
+    ('metrics', 'metrics_bp'),
+    ('health', 'health_bp'),
+]
 
 def create_app():
+    started = time.perf_counter()
     app = Flask(__name__, template_folder='templates', static_folder='static')
+    app.json = ClinicJSONProvider(app)
     
     # Configure secret key for sessions
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -28,31 +43,32 @@ def create_app():
     # Enable CORS for API endpoints
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     
-    # Configure logging
-    log_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.log')
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            # Use an absolute path for the log file to avoid permission errors
-            logging.FileHandler(log_file_path),
-            logging.StreamHandler()
-        ]
-    )
+    # Configure logging: cola + hilo escritor, rotación, muestreo y request id (ver logger.py).
+    # Se registra antes que el resto para que su after_request mida la petición completa.
+    logger.init_app(app)
     
     # Register blueprints
-    app.register_blueprint(views_bp)
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(dashboard_bp)
-    app.register_blueprint(users_bp)
-    app.register_blueprint(doctors_bp)
-    app.register_blueprint(patients_bp)
-    app.register_blueprint(appointments_bp)
-    app.register_blueprint(schedules_bp)
-    app.register_blueprint(consultas_bp)
-    app.register_blueprint(chatbot_bp)
-    app.register_blueprint(reports_bp)
-    app.register_blueprint(asistencias_bp) # No change needed here, blueprint name is the same
-    app.register_blueprint(profile_bp)
+    import_timings = {}
+    for module_name, blueprint_name in BLUEPRINTS:
+        import_started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        import_timings[module_name] = round((time.perf_counter() - import_started) * 1000, 2)
+        app.register_blueprint(getattr(module, blueprint_name))
+
+    # Compresión, ETag y 304 para /api/*
+    compression.init_app(app)
+    # asset_url()/bundle_tags() en las plantillas y caché immutable para static/dist/
+    assets.init_app(app)
+    # Bytecode de plantillas en disco, páginas públicas y fragmentos por rol en memoria
+    page_cache.init_app(app)
+    # 503 cuando el pool de hash de contraseñas está saturado
+    password_service.init_app(app)
+
+    app.config['STARTUP_TIMINGS'] = {
+        'blueprint_imports_ms': import_timings,
+        'create_app_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+    logging.info(f"Aplicación creada en {app.config['STARTUP_TIMINGS']['create_app_ms']} ms "
+                 f"(importación de blueprints: {round(sum(import_timings.values()), 2)} ms)")
     
-    return app
\ No newline at end of file
+    return app
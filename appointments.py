@@ -1,21 +1,23 @@
 from flask import Blueprint, request, jsonify
 from auth_middleware import login_required
-import pyodbc
+from query_budget import query_budget
 import logging
 from datetime import datetime, timedelta
-from database import get_db_connection
+from database import get_db_connection, DatabaseError
+from json_provider import rows_response
+import activity
+import cache
+import schedule_cache
 
 appointments_bp = Blueprint('appointments', __name__)
 
-DIA_SEMANA_MAP = {
-    1: "Lunes",
-    2: "Martes",
-    3: "Miércoles",
-    4: "Jueves",
-    5: "Viernes",
-    6: "Sábado",
-    7: "Domingo"
+# Colores de los eventos de FullCalendar según el estado de la cita
+CALENDAR_COLORS = {
+    'pendiente': {'bg': '#ffc107', 'text': '#000'},
+    'completada': {'bg': '#198754', 'text': '#fff'},
+    'cancelada': {'bg': '#dc3545', 'text': '#fff'}
 }
+CALENDAR_DEFAULT_COLOR = {'bg': '#6c757d', 'text': '#fff'}
 
 # Endpoint para obtener horarios disponibles de un médico
 @appointments_bp.route('/api/medicos/<int:id_medico>/horarios', methods=['GET'])
@@ -31,27 +33,14 @@ def get_horarios_disponibles(current_user, id_medico):
         
     try:
         fecha_obj = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-        dia_semana_num = fecha_obj.isoweekday()  # Lunes=1, Domingo=7
-        dia_semana_str = DIA_SEMANA_MAP.get(dia_semana_num)
-
-        if not dia_semana_str:
-            return jsonify({'error': 'Día de la semana inválido'}), 400
+        # Bloques del horario laboral del médico ese día (Lunes=1, Domingo=7)
+        bloques = schedule_cache.day(id_medico, fecha_obj.isoweekday())
+        if bloques is None:
+            return jsonify({'error': 'Error al obtener horarios'}), 500
+        if not bloques:
+            return jsonify({'horarios': [], 'message': 'El médico no tiene un horario configurado para este día.'})
 
         with conn.cursor() as cursor:
-            # Obtener horario laboral del médico
-            cursor.execute("""
-                SELECT hora_inicio, hora_fin
-                FROM Horarios_disponibles
-                WHERE id_medico = ? AND dia_semana = ?
-            """, (id_medico, dia_semana_str))
-            
-            horario = cursor.fetchone()
-            if not horario:
-                return jsonify({'horarios': [], 'message': 'El médico no tiene un horario configurado para este día.'})
-                
-            hora_inicio = horario[0]
-            hora_fin = horario[1]
-            
             # Obtener citas existentes para ese médico y fecha
             cursor.execute("""
                 SELECT hora_cita
@@ -62,18 +51,19 @@ def get_horarios_disponibles(current_user, id_medico):
             
             citas_existentes = [row[0] for row in cursor.fetchall()]
             
-            # Generar franjas horarias disponibles (cada 30 minutos)
+            # Generar franjas horarias disponibles (cada 30 minutos) en cada bloque
             horarios_disponibles = []
-            hora_actual_dt = datetime.combine(fecha_obj, hora_inicio)
-            hora_fin_dt = datetime.combine(fecha_obj, hora_fin)
-
-            while hora_actual_dt < hora_fin_dt:
-                if hora_actual_dt.time() not in citas_existentes:
-                    horarios_disponibles.append(hora_actual_dt.strftime('%H:%M'))
-                hora_actual_dt += timedelta(minutes=30)
+            for _, hora_inicio, hora_fin in bloques:
+                hora_actual_dt = datetime.combine(fecha_obj, hora_inicio)
+                hora_fin_dt = datetime.combine(fecha_obj, hora_fin)
+
+                while hora_actual_dt < hora_fin_dt:
+                    if hora_actual_dt.time() not in citas_existentes:
+                        horarios_disponibles.append(hora_actual_dt.strftime('%H:%M'))
+                    hora_actual_dt += timedelta(minutes=30)
             
             return jsonify(horarios_disponibles)
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Error en base de datos: {str(e)}")
         return jsonify({'error': 'Error al obtener horarios'}), 500
     except ValueError:
@@ -127,7 +117,8 @@ def crear_cita(current_user):
                     hora_cita, 
                     motivo_consulta,
                     fecha_creacion
-                ) VALUES (?, ?, ?, ?, ?, GETDATE())
+                ) OUTPUT INSERTED.id_cita, INSERTED.id_paciente
+                VALUES (?, ?, ?, ?, ?, GETDATE())
             """, (
                 data['id_medico'],
                 data['id_paciente'],
@@ -135,18 +126,17 @@ def crear_cita(current_user):
                 data['hora_cita'],
                 data['motivo_consulta']
             ))
+            cita_id, id_paciente = cursor.fetchone()
+            activity.record(cursor, activity.CITA, cita_id, 'creada')
             
             conn.commit()
-            
-            # Obtener ID de la nueva cita
-            cursor.execute("SELECT SCOPE_IDENTITY()")
-            cita_id = cursor.fetchone()[0]
+            cache.invalidate('historial_pacientes', id_paciente)
             
             return jsonify({
                 'message': 'Cita programada exitosamente',
                 'cita_id': cita_id
             }), 201
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error en base de datos: {str(e)}")
         return jsonify({'error': 'Error al programar la cita'}), 500
@@ -199,12 +189,7 @@ def get_citas_for_calendar(current_user):
                 start_datetime = datetime.combine(row.fecha_cita, row.hora_cita)
                 end_datetime = start_datetime + timedelta(minutes=30) # Asumiendo citas de 30 min
 
-                color_map = {
-                    'pendiente': {'bg': '#ffc107', 'text': '#000'},
-                    'completada': {'bg': '#198754', 'text': '#fff'},
-                    'cancelada': {'bg': '#dc3545', 'text': '#fff'}
-                }
-                color = color_map.get(row.estado, {'bg': '#6c757d', 'text': '#fff'})
+                color = CALENDAR_COLORS.get(row.estado, CALENDAR_DEFAULT_COLOR)
 
                 events.append({
                     'id': row.id_cita,
@@ -282,8 +267,9 @@ def update_cita(current_user, id_cita):
     
     try:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT 1 FROM Citas WHERE id_cita = ?", (id_cita,))
-            if not cursor.fetchone():
+            cursor.execute("SELECT id_paciente FROM Citas WHERE id_cita = ?", (id_cita,))
+            cita_row = cursor.fetchone()
+            if not cita_row:
                 return jsonify({'error': 'Cita no encontrada'}), 404
 
             cursor.execute("""
@@ -297,12 +283,18 @@ def update_cita(current_user, id_cita):
                 UPDATE Citas SET
                     id_medico = ?, id_paciente = ?, fecha_cita = ?, hora_cita = ?,
                     motivo_consulta = ?, estado = 'pendiente', fecha_actualizacion = GETDATE()
+                OUTPUT INSERTED.id_paciente
                 WHERE id_cita = ?
             """, (
                 data['id_medico'], data['id_paciente'], data['fecha_cita'],
                 data['hora_cita'], data['motivo_consulta'], id_cita
             ))
+            id_paciente = cursor.fetchone()[0]
+            activity.record(cursor, activity.CITA, id_cita, 'reagendada')
             conn.commit()
+            # La cita puede haber cambiado de paciente
+            cache.invalidate('historial_pacientes', cita_row.id_paciente)
+            cache.invalidate('historial_pacientes', id_paciente)
             return jsonify({'message': 'Cita reagendada exitosamente'})
     except Exception as e:
         conn.rollback()
@@ -322,10 +314,13 @@ def cancel_cita(current_user, id_cita):
     
     try:
         with conn.cursor() as cursor:
-            cursor.execute("UPDATE Citas SET estado = 'cancelada', fecha_actualizacion = GETDATE() WHERE id_cita = ?", (id_cita,))
-            if cursor.rowcount == 0:
+            cursor.execute("UPDATE Citas SET estado = 'cancelada', fecha_actualizacion = GETDATE() OUTPUT INSERTED.id_paciente WHERE id_cita = ?", (id_cita,))
+            cita_row = cursor.fetchone()
+            if not cita_row:
                 return jsonify({'error': 'Cita no encontrada'}), 404
+            activity.record(cursor, activity.CITA, id_cita, 'cancelada')
             conn.commit()
+            cache.invalidate('historial_pacientes', cita_row[0])
             return jsonify({'message': 'Cita cancelada exitosamente'})
     except Exception as e:
         conn.rollback()
@@ -350,7 +345,7 @@ def confirm_cita(current_user, id_cita):
     try:
         with conn.cursor() as cursor:
             cursor.execute("""
-                SELECT c.estado FROM Citas c
+                SELECT c.estado, c.id_paciente FROM Citas c
                 JOIN Medicos m ON c.id_medico = m.id_medico
                 WHERE c.id_cita = ? AND m.id_usuario = ?
             """, (id_cita, current_user.get('id_usuario')))
@@ -362,7 +357,9 @@ def confirm_cita(current_user, id_cita):
                 return jsonify({'error': f'Solo se pueden confirmar citas pendientes. Estado actual: {cita.estado}'}), 400
 
             cursor.execute("UPDATE Citas SET estado = 'confirmada', fecha_actualizacion = GETDATE() WHERE id_cita = ?", (id_cita,))
+            activity.record(cursor, activity.CITA, id_cita, 'confirmada')
             conn.commit()
+            cache.invalidate('historial_pacientes', cita.id_paciente)
             return jsonify({'message': 'Cita confirmada exitosamente'})
     except Exception as e:
         conn.rollback()
@@ -374,6 +371,8 @@ def confirm_cita(current_user, id_cita):
 
 @appointments_bp.route('/api/citas/<int:id_cita>/reschedule', methods=['PATCH'])
 @login_required
+# 4 sentencias; la quinta y la segunda conexión son la carga de schedule_cache si está vacía
+@query_budget(round_trips=5, connections=2)
 def reschedule_cita(current_user, id_cita):
     """Reagenda una cita mediante drag-and-drop, con validaciones."""
     data = request.json
@@ -390,7 +389,7 @@ def reschedule_cita(current_user, id_cita):
     try:
         with conn.cursor() as cursor:
             # 1. Obtener datos de la cita original, incluyendo el id_medico
-            cursor.execute("SELECT id_medico, estado FROM Citas WHERE id_cita = ?", (id_cita,))
+            cursor.execute("SELECT id_medico, estado, id_paciente FROM Citas WHERE id_cita = ?", (id_cita,))
             cita_row = cursor.fetchone()
             if not cita_row:
                 return jsonify({'error': 'Cita no encontrada'}), 404
@@ -409,20 +408,20 @@ def reschedule_cita(current_user, id_cita):
 
             # 3. Validar que el nuevo horario esté dentro del horario laboral del médico
             fecha_obj = datetime.strptime(new_fecha_str, '%Y-%m-%d').date()
-            dia_semana_num = fecha_obj.isoweekday()
-            dia_semana_str = DIA_SEMANA_MAP.get(dia_semana_num)
-            
-            cursor.execute("SELECT hora_inicio, hora_fin FROM Horarios_disponibles WHERE id_medico = ? AND dia_semana = ?", (id_medico, dia_semana_str))
-            horario_laboral = cursor.fetchone()
+            bloques = schedule_cache.day(id_medico, fecha_obj.isoweekday())
+            if bloques is None:
+                return jsonify({'error': 'Error interno al reagendar la cita'}), 500
             new_hora_obj = datetime.strptime(new_hora_str, '%H:%M').time()
 
-            if not horario_laboral or not (horario_laboral.hora_inicio <= new_hora_obj < horario_laboral.hora_fin):
+            if not any(hora_inicio <= new_hora_obj < hora_fin for _, hora_inicio, hora_fin in bloques):
                  return jsonify({'error': 'El nuevo horario está fuera del horario laboral del médico'}), 400
 
             # 4. Actualizar la cita
             cursor.execute("UPDATE Citas SET fecha_cita = ?, hora_cita = ?, fecha_actualizacion = GETDATE() WHERE id_cita = ?", (new_fecha_str, new_hora_str, id_cita))
+            activity.record(cursor, activity.CITA, id_cita, 'reagendada')
             
             conn.commit()
+            cache.invalidate('historial_pacientes', cita_row.id_paciente)
             return jsonify({'message': 'Cita reagendada exitosamente'})
     except Exception as e:
         conn.rollback()
@@ -512,10 +511,13 @@ def complete_cita(current_user, id_cita):
         return jsonify({'error': 'Error de conexión'}), 500
     try:
         with conn.cursor() as cursor:
-            cursor.execute("UPDATE Citas SET estado = 'completada', fecha_actualizacion = GETDATE() WHERE id_cita = ? AND estado IN ('pendiente', 'confirmada')", (id_cita,))
-            if cursor.rowcount == 0:
+            cursor.execute("UPDATE Citas SET estado = 'completada', fecha_actualizacion = GETDATE() OUTPUT INSERTED.id_paciente WHERE id_cita = ? AND estado IN ('pendiente', 'confirmada')", (id_cita,))
+            cita_row = cursor.fetchone()
+            if not cita_row:
                 return jsonify({'error': 'Cita no encontrada o no se puede marcar como completada'}), 404
+            activity.record(cursor, activity.CITA, id_cita, 'completada')
             conn.commit()
+            cache.invalidate('historial_pacientes', cita_row[0])
             return jsonify({'message': 'Cita marcada como completada'})
     except Exception as e:
         conn.rollback()
@@ -544,7 +546,7 @@ def get_citas_detalladas(current_user):
                     c.fecha_cita,
                     c.hora_cita,
                     c.motivo_consulta,
-                    c.estado
+                    COALESCE(c.estado, 'pendiente') AS estado
                 FROM Citas c
                 JOIN Pacientes p ON c.id_paciente = p.id_paciente
                 JOIN Usuarios p_user ON p.id_usuario = p_user.id_usuario
@@ -578,18 +580,8 @@ def get_citas_detalladas(current_user):
             query += " ORDER BY c.fecha_cita DESC, c.hora_cita DESC"
             
             cursor.execute(query, params)
-            
-            citas = [{
-                'id_cita': row.id_cita,
-                'paciente_nombre': row.paciente_nombre,
-                'medico_nombre': row.medico_nombre,
-                'especialidad': row.especialidad,
-                'fecha_cita': row.fecha_cita.strftime('%Y-%m-%d'),
-                'hora_cita': row.hora_cita.strftime('%H:%M'),
-                'motivo_consulta': row.motivo_consulta,
-                'estado': row.estado or 'pendiente'
-            } for row in cursor.fetchall()]
-            return jsonify(citas)
+            # Las columnas ya tienen los nombres de la respuesta; fechas y horas las codifica json_provider
+            return rows_response(cursor)
     except Exception as e:
         logging.error(f"Error al obtener citas detalladas: {str(e)}")
         return jsonify({'error': 'Error al obtener la lista de citas'}), 500
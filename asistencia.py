@@ -1,13 +1,93 @@
 from flask import Blueprint, request, jsonify
-import pyodbc
 import logging
-from datetime import datetime
-from database import get_db_connection
+from datetime import date, datetime
+from database import get_db_connection, DatabaseError, is_unique_violation
 from auth_middleware import login_required, role_required
+from config import (ATTENDANCE_BATCH_MAX, ATTENDANCE_SUMMARY_MAX_AGE,
+                    RECONCILIATION_TOLERANCE_MIN, RECONCILIATION_MAX_DAYS)
+import cache
+import date_ranges
+import reconciliation
 
 asistencias_bp = Blueprint('asistencia', __name__)
 logger = logging.getLogger(__name__)
 
+ESTADOS_ASISTENCIA = ('Asistió', 'Tarde', 'Ausente')
+
+def _parse_time(value):
+    """'08:00' o '08:00:30' -> '08:00:00'/'08:00:30'. Lanza ValueError con cualquier otro texto."""
+    for time_format in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(str(value).strip(), time_format).strftime('%H:%M:%S')
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+# --- Resumen mensual por médico ---
+# Se calcula con una sola consulta agrupada. Los meses cerrados ya no cambian salvo
+# correcciones, así que se guardan en memoria; las escrituras de este módulo invalidan
+# el mes de la fecha que tocan. El mes en curso se calcula siempre.
+
+def _month_range(year, month):
+    """Primer y último día del mes."""
+    start = date(year, month, 1)
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, date.fromordinal(next_month.toordinal() - 1)
+
+
+def _load_month_summary(month):
+    year, month_number = month
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cursor:
+            where, params = date_ranges.between('a.fecha', *_month_range(year, month_number))
+            cursor.execute(f"""
+                SELECT a.id_medico, u.nombre_completo,
+                       SUM(CASE WHEN a.estado_asistencia IN ('Asistió', 'Tarde') THEN 1 ELSE 0 END) AS dias_presente,
+                       SUM(CASE WHEN a.estado_asistencia = 'Tarde' THEN 1 ELSE 0 END) AS dias_tarde,
+                       SUM(CASE WHEN a.estado_asistencia = 'Ausente' THEN 1 ELSE 0 END) AS dias_ausente,
+                       SUM(CASE WHEN a.hora_salida > a.hora_entrada
+                                THEN DATEDIFF(minute, a.hora_entrada, a.hora_salida) ELSE 0 END) AS minutos_trabajados
+                FROM Asistencias a
+                JOIN Medicos m ON a.id_medico = m.id_medico
+                JOIN Usuarios u ON m.id_usuario = u.id_usuario
+                WHERE {where}
+                GROUP BY a.id_medico, u.nombre_completo
+                ORDER BY u.nombre_completo
+            """, params)
+            return [{
+                'id_medico': row.id_medico,
+                'nombre_medico': row.nombre_completo,
+                'dias_presente': row.dias_presente,
+                'dias_tarde': row.dias_tarde,
+                'dias_ausente': row.dias_ausente,
+                'horas_trabajadas': round((row.minutos_trabajados or 0) / 60, 2)
+            } for row in cursor.fetchall()]
+    except DatabaseError as e:
+        logger.error(f"Error en base de datos al calcular el resumen de asistencias {year}-{month_number:02d}: {str(e)}")
+        return None
+    finally:
+        conn.close()
+
+
+monthly_summary = cache.VersionedCache('asistencia_mensual', _load_month_summary,
+                                       max_age=ATTENDANCE_SUMMARY_MAX_AGE, max_entries=36)
+
+
+def _attendance_changed(fecha, id_medicos):
+    """Tras escribir asistencias de esa fecha: resumen del mes y días a reconciliar."""
+    try:
+        day = date_ranges.parse_date(fecha)
+    except ValueError:
+        monthly_summary.bump()
+        reconciliation.store.clear()
+        return
+    monthly_summary.invalidate((day.year, day.month))
+    for id_medico in id_medicos:
+        reconciliation.mark_dirty(int(id_medico), day)
+
 # Endpoint para registrar una nueva asistencia (marcar entrada)
 @asistencias_bp.route('/api/asistencia', methods=['POST'])
 @login_required
@@ -25,12 +105,8 @@ def registrar_asistencia(current_user):
 
     try:
         with conn.cursor() as cursor:
-            # Verificar si ya existe un registro para ese médico en esa fecha
-            cursor.execute("SELECT 1 FROM Asistencias WHERE id_medico = ? AND fecha = ?", (data['id_medico'], data['fecha']))
-            if cursor.fetchone():
-                return jsonify({'error': 'Ya existe un registro de asistencia para este médico en la fecha especificada'}), 409
-
-            # Insertar el nuevo registro de asistencia
+            # Insertar el nuevo registro de asistencia; la restricción UQ_Asistencias_Medico_Fecha
+            # rechaza un segundo registro del mismo médico en la misma fecha
             cursor.execute("""
                 INSERT INTO Asistencias (id_medico, fecha, hora_entrada, estado_asistencia)
                 OUTPUT INSERTED.id_asistencia
@@ -43,20 +119,106 @@ def registrar_asistencia(current_user):
             ))
             asistencia_id = cursor.fetchone()[0]
             conn.commit()
+            _attendance_changed(data['fecha'], [data['id_medico']])
 
             return jsonify({
                 'message': 'Asistencia registrada exitosamente',
                 'id_asistencia': asistencia_id
             }), 201
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
+        if is_unique_violation(e):
+            return jsonify({'error': 'Ya existe un registro de asistencia para este médico en la fecha especificada'}), 409
         logger.error(f"Error en base de datos al registrar asistencia: {str(e)}")
         return jsonify({'error': 'Error al registrar la asistencia'}), 500
     finally:
         if conn:
             conn.close()
 
+# Endpoint para registrar la asistencia de todo un turno en una sola transacción
+@asistencias_bp.route('/api/asistencia/lote', methods=['POST'])
+@login_required
+@role_required(1, 3) # Admin y Recepcionista
+def registrar_asistencia_lote(current_user):
+    """
+    Registra la entrada de varios médicos en una fecha:
+    {"fecha": "AAAA-MM-DD", "registros": [{"id_medico", "hora_entrada", "estado_asistencia"}, ...]}
+    Es todo o nada: si algún médico ya tiene asistencia ese día no se registra ninguno.
+    """
+    data = request.json or {}
+    registros = data.get('registros')
+    if not data.get('fecha') or not isinstance(registros, list) or not registros:
+        return jsonify({'error': 'Se requieren la fecha y una lista de registros'}), 400
+    if len(registros) > ATTENDANCE_BATCH_MAX:
+        return jsonify({'error': f'Se permiten como máximo {ATTENDANCE_BATCH_MAX} registros por lote'}), 400
+    try:
+        fecha = date_ranges.parse_date(data['fecha'])
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}), 400
+
+    rows, invalidos = [], []
+    for posicion, registro in enumerate(registros):
+        try:
+            if not isinstance(registro, dict):
+                raise ValueError(registro)
+            estado = registro.get('estado_asistencia')
+            hora_entrada = registro.get('hora_entrada')
+            # Los ausentes pueden no tener hora de entrada
+            if not registro.get('id_medico') or estado not in ESTADOS_ASISTENCIA or (not hora_entrada and estado != 'Ausente'):
+                raise ValueError(registro)
+            rows.append((int(registro['id_medico']), fecha, _parse_time(hora_entrada) if hora_entrada else None, estado))
+        except (ValueError, TypeError):
+            invalidos.append(posicion)
+    if invalidos:
+        return jsonify({'error': 'Registros inválidos', 'registros_invalidos': invalidos}), 400
+    ids_medicos = [row[0] for row in rows]
+    if len(set(ids_medicos)) != len(ids_medicos):
+        return jsonify({'error': 'Hay médicos repetidos en el lote'}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
+
+    try:
+        with conn.cursor() as cursor:
+            # Con pyodbc, los parámetros de todas las filas viajan en un solo envío
+            cursor.fast_executemany = True
+            cursor.executemany("""
+                INSERT INTO Asistencias (id_medico, fecha, hora_entrada, estado_asistencia)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        _attendance_changed(fecha, ids_medicos)
+
+        return jsonify({
+            'message': 'Asistencias registradas exitosamente',
+            'registrados': len(rows)
+        }), 201
+
+    except DatabaseError as e:
+        conn.rollback()
+        if not is_unique_violation(e):
+            logger.error(f"Error en base de datos al registrar asistencias en lote: {str(e)}")
+            return jsonify({'error': 'Error al registrar las asistencias'}), 500
+        # Solo en el caso de error: qué médicos ya tenían registro ese día
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT id_medico FROM Asistencias
+                    WHERE fecha = ? AND id_medico IN ({', '.join('?' * len(ids_medicos))})
+                """, [fecha] + ids_medicos)
+                existentes = sorted(row[0] for row in cursor.fetchall())
+        except DatabaseError:
+            existentes = []
+        return jsonify({
+            'error': 'Algunos médicos ya tienen asistencia registrada en esa fecha',
+            'medicos_con_registro': existentes
+        }), 409
+    finally:
+        if conn:
+            conn.close()
+
 # Endpoint para obtener registros de asistencia (con filtros)
 @asistencias_bp.route('/api/asistencia', methods=['GET'])
 @login_required
@@ -110,7 +272,7 @@ def get_asistencias(current_user):
 
             return jsonify(asistencias)
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logger.error(f"Error en base de datos al obtener asistencias: {str(e)}")
         return jsonify({'error': 'Error al obtener los registros de asistencia'}), 500
     finally:
@@ -133,13 +295,15 @@ def actualizar_asistencia(current_user, id_asistencia):
 
     try:
         with conn.cursor() as cursor:
-            cursor.execute("UPDATE Asistencias SET hora_salida = ? WHERE id_asistencia = ?", (data['hora_salida'], id_asistencia))
-            if cursor.rowcount == 0:
+            cursor.execute("UPDATE Asistencias SET hora_salida = ? OUTPUT INSERTED.fecha, INSERTED.id_medico WHERE id_asistencia = ?", (data['hora_salida'], id_asistencia))
+            row = cursor.fetchone()
+            if not row:
                 return jsonify({'error': 'Registro de asistencia no encontrado'}), 404
             conn.commit()
+            _attendance_changed(row[0], [row[1]])
             return jsonify({'message': 'Hora de salida registrada exitosamente'})
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logger.error(f"Error en base de datos al actualizar asistencia: {str(e)}")
         return jsonify({'error': 'Error al actualizar la asistencia'}), 500
@@ -159,16 +323,103 @@ def eliminar_asistencia(current_user, id_asistencia):
 
     try:
         with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM Asistencias WHERE id_asistencia = ?", (id_asistencia,))
-            if cursor.rowcount == 0:
+            cursor.execute("DELETE FROM Asistencias OUTPUT DELETED.fecha, DELETED.id_medico WHERE id_asistencia = ?", (id_asistencia,))
+            row = cursor.fetchone()
+            if not row:
                 return jsonify({'error': 'Registro de asistencia no encontrado'}), 404
             conn.commit()
+            _attendance_changed(row[0], [row[1]])
             return jsonify({'message': 'Registro de asistencia eliminado exitosamente'})
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logger.error(f"Error en base de datos al eliminar asistencia: {str(e)}")
         return jsonify({'error': 'Error al eliminar la asistencia'}), 500
     finally:
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+
+# Endpoint para obtener el resumen mensual de asistencia por médico
+@asistencias_bp.route('/api/asistencia/resumen-mensual', methods=['GET'])
+@login_required
+@role_required(1, 3) # Admin y Recepcionista
+def resumen_mensual(current_user):
+    """Días presentes, tardes, ausencias y horas trabajadas por médico en un mes (?mes=AAAA-MM)."""
+    today = date.today()
+    try:
+        mes = datetime.strptime(request.args['mes'], '%Y-%m') if request.args.get('mes') else today
+        id_medico = int(request.args['id_medico']) if request.args.get('id_medico') else None
+    except ValueError:
+        return jsonify({'error': 'Formato de mes inválido. Use YYYY-MM.'}), 400
+
+    month = (mes.year, mes.month)
+    cerrado = month < (today.year, today.month)
+    # El mes en curso (o uno futuro) todavía cambia: no se guarda
+    medicos = monthly_summary.get(month) if cerrado else _load_month_summary(month)
+    if medicos is None:
+        return jsonify({'error': 'Error al obtener el resumen de asistencias'}), 500
+
+    if id_medico is not None:
+        medicos = [medico for medico in medicos if medico['id_medico'] == id_medico]
+    return jsonify({'mes': f'{month[0]}-{month[1]:02d}', 'cerrado': cerrado, 'medicos': medicos})
+
+
+@asistencias_bp.route('/api/asistencia/conciliacion', methods=['GET'])
+@login_required
+@role_required(1, 3) # Admin y Recepcionista
+def conciliacion(current_user):
+    """
+    Asistencias contra horarios planificados: llegadas tarde, salidas
+    anticipadas, ausencias, entradas sin salida y presencias sin horario.
+    ?fecha_inicio&fecha_fin (por defecto, el mes en curso hasta hoy), ?id_medico,
+    ?tolerancia=<minutos>, ?todos=1 para incluir los días sin incidencias e
+    ?incremental=0 para recalcular todo el rango.
+    """
+    today = date.today()
+    try:
+        desde = date_ranges.parse_date(request.args['fecha_inicio']) if request.args.get('fecha_inicio') else today.replace(day=1)
+        hasta = date_ranges.parse_date(request.args['fecha_fin']) if request.args.get('fecha_fin') else today
+        id_medico = int(request.args['id_medico']) if request.args.get('id_medico') else None
+        tolerancia = int(request.args.get('tolerancia', RECONCILIATION_TOLERANCE_MIN))
+    except ValueError:
+        return jsonify({'error': 'Parámetros inválidos. Use fechas YYYY-MM-DD y números enteros.'}), 400
+    if desde > hasta or tolerancia < 0:
+        return jsonify({'error': 'Rango de fechas o tolerancia inválidos'}), 400
+    if (hasta - desde).days + 1 > RECONCILIATION_MAX_DAYS:
+        return jsonify({'error': f'El rango no puede superar {RECONCILIATION_MAX_DAYS} días'}), 400
+    todos = request.args.get('todos') == '1'
+    incremental = request.args.get('incremental') != '0'
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
+
+    try:
+        with conn.cursor() as cursor:
+            medicos, dias, reprocesados = reconciliation.store.reconcile(
+                cursor, desde, hasta, id_medico=id_medico, incremental=incremental)
+    except DatabaseError as e:
+        logging.error(f"Error al conciliar asistencias: {str(e)}")
+        return jsonify({'error': 'Error al conciliar asistencias'}), 500
+    finally:
+        conn.close()
+
+    resumen = dict.fromkeys(reconciliation.INCIDENCIAS, 0)
+    resultado = []
+    for dia in dias:
+        encontradas = reconciliation.incidencias(dia, tolerancia)
+        for incidencia in encontradas:
+            resumen[incidencia] += 1
+        if encontradas or todos:
+            resultado.append({**dia, 'nombre_medico': medicos[dia['id_medico']], 'incidencias': encontradas})
+    resultado.sort(key=lambda dia: (dia['nombre_medico'], dia['fecha']))
+
+    return jsonify({
+        'desde': desde,
+        'hasta': min(hasta, today),
+        'tolerancia_min': tolerancia,
+        'reprocesados': reprocesados,
+        'resumen': resumen,
+        'dias': resultado,
+    })
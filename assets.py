@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+
+from flask import current_app, request, url_for
+from markupsafe import Markup, escape
+
+# Resolución de archivos estáticos a través del manifiesto generado por
+# build_assets.py. Con el manifiesto, las plantillas apuntan a copias
+# minificadas con el hash del contenido en el nombre (static/dist/), que se
+# sirven con Cache-Control immutable. Sin él (desarrollo) se usan los archivos
+# originales de static/ tal cual.
+#
+# El manifiesto guarda también el hash de cada archivo fuente. Al arrancar se
+# comparan con los archivos actuales: si un fuente cambió después del último
+# build_assets.py, sus entradas (y las de los paquetes que lo incluyen) se
+# descartan y se sirve el original, en lugar de la copia vieja.
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = 'dist'
+MANIFEST_PATH = os.path.join(STATIC_DIR, DIST_DIR, 'manifest.json')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SOURCE_HASH_LENGTH = 16
+
+# Paquetes por página: archivos que una plantilla carga seguidos y que se
+# sirven como uno solo. El orden es el de las etiquetas originales.
+BUNDLES = {
+    'bundles/admin_dashboard.css': ['css/admin-pacientes-styles.css', 'css/admin_chatbot.css'],
+    'bundles/admin_dashboard.js': ['js/admin_dashboard.js', 'js/admin_chatbot.js'],
+    'bundles/doctor_dashboard.css': ['css/admin-pacientes-styles.css', 'css/doctor_chatbot.css'],
+    'bundles/doctor_dashboard.js': ['js/doctor_dashboard.js', 'js/doctor_chatbot.js'],
+    'bundles/reception_dashboard.css': ['css/admin-pacientes-styles.css', 'css/reception_chatbot.css'],
+    'bundles/reception_dashboard.js': ['js/reception_dashboard.js', 'js/logout.js', 'js/reception_chatbot.js'],
+    'bundles/paciente_dashboard.css': ['css/admin-pacientes-styles.css', 'css/paciente_dashboard.css'],
+    'bundles/mi_perfil.css': ['css/admin-pacientes-styles.css', 'css/mi_perfil.css'],
+    'bundles/mis_citas_paciente.css': ['css/admin-pacientes-styles.css', 'css/mis_citas_paciente.css'],
+    'bundles/pacientes_recep.css': ['css/admin-pacientes-styles.css', 'css/paciente_recep.css'],
+    'bundles/reportes_recepcion.css': ['css/admin-pacientes-styles.css', 'css/reportes_recepcion.css'],
+    'bundles/directorio_medico.css': ['css/schedules.css', 'css/directorio_medico.css'],
+    'bundles/nuevo_usuario.css': ['css/Usuario.css', 'css/dark-green-theme.css'],
+}
+
+
+def source_hash(filename):
+    """Hash del archivo fuente de static/, o None si no existe."""
+    try:
+        with open(os.path.join(STATIC_DIR, filename), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:SOURCE_HASH_LENGTH]
+    except OSError:
+        return None
+
+
+def load_manifest():
+    """
+    Lee el manifiesto de build_assets.py sin las entradas cuyos fuentes cambiaron
+    desde que se construyó; vacío si no se han construido los assets.
+    """
+    try:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.error(f"No se pudo leer el manifiesto de assets: {e}")
+        return {}
+
+    if 'files' not in data or 'sources' not in data:
+        logging.warning("Manifiesto de assets de una versión anterior: se sirven los archivos originales (ejecute build_assets.py)")
+        return {}
+    manifest, sources = data['files'], data['sources']
+    stale = sorted(name for name, digest in sources.items() if source_hash(name) != digest)
+    if stale:
+        logging.warning(f"Assets modificados después de build_assets.py, se sirven los originales: {', '.join(stale)}")
+        for name in stale:
+            manifest.pop(name, None)
+        for bundle, files in BUNDLES.items():
+            if any(name in stale for name in files):
+                manifest.pop(bundle, None)
+    return manifest
+
+
+def asset_url(filename):
+    """URL de un archivo de static/, con hash si está en el manifiesto."""
+    manifest = current_app.config['ASSET_MANIFEST']
+    return url_for('static', filename=manifest.get(filename, filename))
+
+
+def bundle_tags(name):
+    """Etiquetas <link>/<script> de un paquete: una sola si está construido, una por archivo si no."""
+    manifest = current_app.config['ASSET_MANIFEST']
+    files = [name] if name in manifest else BUNDLES[name]
+    if name.endswith('.css'):
+        template = '<link rel="stylesheet" href="{}">'
+    else:
+        template = '<script src="{}"></script>'
+    return Markup('\n    '.join(template.format(escape(asset_url(f))) for f in files))
+
+
+def _cache_headers(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        filename = (request.view_args or {}).get('filename', '')
+        if filename.startswith(DIST_DIR + '/'):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def init_app(app):
+    app.config['ASSET_MANIFEST'] = load_manifest()
+    if not app.config['ASSET_MANIFEST']:
+        logging.info("Sin manifiesto de assets: se sirven los archivos originales (ejecute build_assets.py)")
+    app.jinja_env.globals.update(asset_url=asset_url, bundle_tags=bundle_tags)
+    app.after_request(_cache_headers)
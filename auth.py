@@ -1,13 +1,26 @@
 from flask import Blueprint, request, jsonify, url_for, session
 from middleware import token_required
-import pyodbc
 import logging
-from database import get_db_connection
-from werkzeug.security import generate_password_hash, check_password_hash
-import re
+from database import get_db_connection, DatabaseError
+import password_service
+import identity_index
+import activity
+from validators import is_valid_cedula, is_valid_email
 
 auth_bp = Blueprint('auth', __name__)
 
+# Búsqueda del usuario para el login por una sola columna (ver identity_index.lookup_columns)
+LOGIN_USER_QUERY = """
+    SELECT u.id_usuario, u.nombre_completo, u.id_rol, u.contraseña,
+           u.cedula, u.tipo_usuario, u.activo,
+           m.id_medico, m.especialidad, m.numero_colegiado,
+           p.id_paciente
+    FROM Usuarios u
+    LEFT JOIN Medicos m ON u.id_usuario = m.id_usuario
+    LEFT JOIN Pacientes p ON u.id_usuario = p.id_usuario
+    WHERE u.{column} = ?
+"""
+
 # API to get roles
 @auth_bp.route('/api/roles', methods=['GET'])
 def get_roles():
@@ -25,7 +38,7 @@ def get_roles():
         roles_dict = {r[0]: r[1] for r in roles}
         
         return jsonify(roles_dict)
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Database error in get_roles: {str(e)}")
         return jsonify({'error': 'Failed to fetch roles'}), 500
     finally:
@@ -38,6 +51,11 @@ def check_username():
     username = request.args.get('username')
     if not username:
         return jsonify({'error': 'Username parameter required'}), 400
+
+    # La mayoría de las comprobaciones se responden desde el índice en memoria
+    exists = identity_index.contains('usuario_login', username)
+    if exists is not None:
+        return jsonify({'exists': exists})
         
     conn = get_db_connection()
     if not conn:
@@ -48,7 +66,7 @@ def check_username():
             cursor.execute("SELECT 1 FROM Usuarios WHERE usuario_login = ?", (username,))
             exists = cursor.fetchone() is not None
             return jsonify({'exists': exists})
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Database error in check_username: {str(e)}")
         return jsonify({'error': 'Error checking username'}), 500
     finally:
@@ -60,6 +78,11 @@ def check_cedula():
     cedula = request.args.get('cedula')
     if not cedula:
         return jsonify({'error': 'Cedula parameter required'}), 400
+
+    # La mayoría de las comprobaciones se responden desde el índice en memoria
+    exists = identity_index.contains('cedula', cedula)
+    if exists is not None:
+        return jsonify({'exists': exists})
         
     conn = get_db_connection()
     if not conn:
@@ -70,7 +93,7 @@ def check_cedula():
             cursor.execute("SELECT 1 FROM Usuarios WHERE cedula = ?", (cedula,))
             exists = cursor.fetchone() is not None
             return jsonify({'exists': exists})
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Database error in check_cedula: {str(e)}")
         return jsonify({'error': 'Error checking cedula'}), 500
     finally:
@@ -82,6 +105,11 @@ def check_email():
     email = request.args.get('email')
     if not email:
         return jsonify({'error': 'Email parameter required'}), 400
+
+    # La mayoría de las comprobaciones se responden desde el índice en memoria
+    exists = identity_index.contains('gmail', email)
+    if exists is not None:
+        return jsonify({'exists': exists})
         
     conn = get_db_connection()
     if not conn:
@@ -92,7 +120,7 @@ def check_email():
             cursor.execute("SELECT 1 FROM Usuarios WHERE gmail = ?", (email,))
             exists = cursor.fetchone() is not None
             return jsonify({'exists': exists})
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Database error in check_email: {str(e)}")
         return jsonify({'error': 'Error checking email'}), 500
     finally:
@@ -125,11 +153,11 @@ def register():
         return jsonify({'error': 'La contraseña debe tener al menos 8 caracteres'}), 400
 
     # Validar formato de cédula (V-12345678)
-    if not re.match(r'^[VEGJ]-\d{5,9}$', data['cedula'], re.IGNORECASE):
+    if not is_valid_cedula(data['cedula']):
         return jsonify({'error': 'Formato de cédula inválido. Use V-12345678'}), 400
 
     # Validar formato de email
-    if not re.match(r'^[^\s@]+@[^\s@]+\.[^\s@]+$', data['gmail']):
+    if not is_valid_email(data['gmail']):
         return jsonify({'error': 'Formato de email inválido'}), 400
 
     # --- MODIFICACIÓN IMPORTANTE ---
@@ -159,16 +187,8 @@ def register():
         if admin_code != 'privacidad_medasistencia':
             return jsonify({'error': 'El código de acceso es incorrecto'}), 403
 
-    # Generar hash seguro de la contraseña
-    try:
-        hashed_password = generate_password_hash(
-            data['contraseña'],
-            method='pbkdf2:sha256',
-            salt_length=16
-        )
-    except Exception as e:
-        logging.error(f"Error al generar hash: {str(e)}")
-        return jsonify({'error': 'Error interno al procesar la contraseña'}), 500
+    # Generar hash seguro de la contraseña (fuera del hilo de la petición)
+    hashed_password = password_service.hash_password(data['contraseña'])
 
     conn = get_db_connection()
     if not conn:
@@ -221,10 +241,12 @@ def register():
         # Crear registro en la tabla correspondiente según el tipo de usuario
         if tipo_usuario == 'paciente':
             cursor.execute("""
-                INSERT INTO Pacientes (id_usuario, estado) VALUES (?, 'A')
+                INSERT INTO Pacientes (id_usuario, estado) OUTPUT INSERTED.id_paciente VALUES (?, 'A')
             """, (user_id,))
+            activity.record(cursor, activity.PACIENTE, cursor.fetchone()[0])
 
         conn.commit()
+        identity_index.record_created(usuario_login=data['usuario_login'], cedula=data['cedula'], gmail=data['gmail'])
         
         return jsonify({
             'message': 'Usuario registrado exitosamente',
@@ -232,7 +254,7 @@ def register():
             'redirect': url_for('views.login_page')
         }), 201
         
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error de base de datos en registro: {str(e)}")
         return jsonify({'error': 'Error en el registro. Por favor intente nuevamente.'}), 500
@@ -257,6 +279,12 @@ def login():
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Faltan campos requeridos'}), 400
 
+    # Limitar intentos por identificador y por IP antes de tocar la base de datos o el hash
+    wait = password_service.check_login_rate(data['identificador'], request.remote_addr)
+    if wait:
+        logging.warning(f"Login limitado para '{data['identificador']}' desde {request.remote_addr}")
+        return password_service.too_many_attempts_response(wait)
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión con la base de datos'}), 500
@@ -264,36 +292,28 @@ def login():
     cursor = None
     try:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT u.id_usuario, u.nombre_completo, u.id_rol, u.contraseña,
-                   u.cedula, u.tipo_usuario, u.activo,
-                   m.id_medico, m.especialidad, m.numero_colegiado,
-                   p.id_paciente
-            FROM Usuarios u
-            LEFT JOIN Medicos m ON u.id_usuario = m.id_usuario
-            LEFT JOIN Pacientes p ON u.id_usuario = p.id_usuario
-            WHERE u.usuario_login = ? OR u.cedula = ? OR u.gmail = ?
-        """, (data['identificador'], data['identificador'], data['identificador']))
-        
-        user = cursor.fetchone()
+        # Una búsqueda por índice por columna, empezando por la que corresponde al
+        # identificador, en lugar de un OR sobre las tres columnas
+        user = None
+        for column in identity_index.lookup_columns(data['identificador']):
+            cursor.execute(LOGIN_USER_QUERY.format(column=column), (data['identificador'],))
+            user = cursor.fetchone()
+            if user:
+                break
         
         if user:
             # Verificar si la cuenta está activa
             if not user[6]:  # activo field
                 return jsonify({'error': 'Cuenta desactivada. Contacte al administrador.'}), 403
                 
-            password_is_correct = False
-            try:
-                # user[3] is the 'contraseña' field from the database.
-                # A malformed hash in the DB can raise a ValueError here.
-                password_is_correct = check_password_hash(user[3], data['contraseña'])
-            except (ValueError, TypeError) as e:
-                # This handles corrupted password hashes gracefully instead of crashing.
-                # It also handles cases where the hash might be None.
-                logging.error(f"Error checking password hash for user_id {user[0]}: {e}")
-                password_is_correct = False
+            # user[3] es la contraseña; un hash corrupto o nulo cuenta como incorrecta
+            password_is_correct = password_service.verify_password(user[3], data['contraseña'])
 
             if password_is_correct:
+                # Hashes antiguos o con menos iteraciones se actualizan sin demorar la respuesta
+                if password_service.needs_rehash(user[3]):
+                    password_service.rehash_in_background(user[0], data['contraseña'])
+
                 # Establecer la sesión del usuario
                 session.permanent = True  # Opcional: para sesiones persistentes
                 session['id_usuario'] = user[0]
@@ -334,7 +354,7 @@ def login():
         else:
             return jsonify({'error': 'Usuario no encontrado'}), 404
             
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Error de base de datos en login: {str(e)}")
         return jsonify({'error': 'Error en el inicio de sesión'}), 500
     finally:
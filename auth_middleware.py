@@ -2,8 +2,7 @@
 # auth_middleware.py
 from functools import wraps
 from flask import session, redirect, url_for, flash, request, jsonify, g
-from database import get_db_connection
-import pyodbc
+from database import get_db_connection, DatabaseError
 import logging
 
 def login_required(f):
@@ -41,7 +40,7 @@ def login_required(f):
                         'tipo_usuario': user_data[4], 'id_medico': user_data[5],
                         'id_paciente': user_data[6]
                     }
-            except pyodbc.Error as e:
+            except DatabaseError as e:
                 logging.error(f"Error al cargar datos de usuario: {e}")
                 return jsonify({'error': 'Error al cargar datos de usuario'}), 500
             finally:
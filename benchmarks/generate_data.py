@@ -0,0 +1,248 @@
+"""Generador determinista de datos sintéticos de la clínica para benchmarks.
+
+Crea médicos, pacientes, recepcionistas y un administrador (usuarios con prefijo "bench_"), sus
+horarios, años de citas con una mezcla realista de estados y los registros de
+asistencia de los médicos. Con la misma semilla produce siempre los mismos datos.
+Funciona con cualquier backend (DB_BACKEND=sqlite para pruebas locales).
+
+Uso:
+    DB_BACKEND=sqlite python benchmarks/generate_data.py --doctors 50 --patients 5000 --years 3
+    python benchmarks/generate_data.py --reset ...   # borra antes los datos "bench_"
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from werkzeug.security import generate_password_hash
+from database import get_db_connection
+from init_database import init_database
+
+PREFIX = 'bench_'
+DEFAULT_PASSWORD = 'Bench1234!'
+BATCH_SIZE = 1000
+
+FIRST_NAMES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Pedro', 'Lucía', 'Jorge', 'Elena', 'Carlos',
+               'Sofía', 'Miguel', 'Valentina', 'Andrés', 'Daniela', 'Rafael', 'Gabriela', 'Fernando']
+LAST_NAMES = ['García', 'Rodríguez', 'Pérez', 'González', 'Hernández', 'López', 'Martínez', 'Sánchez',
+              'Ramírez', 'Torres', 'Flores', 'Rivera', 'Gómez', 'Díaz', 'Morales', 'Rojas']
+REASONS = ['Control general', 'Dolor de cabeza', 'Fiebre', 'Chequeo anual', 'Dolor abdominal',
+           'Seguimiento de tratamiento', 'Resultados de laboratorio', 'Tos persistente', 'Dolor de espalda']
+BLOOD_TYPES = ['O+', 'O-', 'A+', 'A-', 'B+', 'B-', 'AB+', 'AB-']
+SHIFTS = [('07:00:00', '13:00:00'), ('08:00:00', '12:00:00'), ('13:00:00', '17:00:00'), ('14:00:00', '19:00:00')]
+
+# Mezcla de estados: las citas pasadas ya se resolvieron, las futuras siguen abiertas
+PAST_STATES = [('completada', 0.72), ('cancelada', 0.15), ('confirmada', 0.05), ('pendiente', 0.08)]
+FUTURE_STATES = [('pendiente', 0.62), ('confirmada', 0.33), ('cancelada', 0.05)]
+ATTENDANCE_STATES = [('Asistió', 0.86), ('Tarde', 0.09), ('Ausente', 0.05)]
+
+
+def weighted_choice(rng, options):
+    return rng.choices([value for value, _ in options], weights=[weight for _, weight in options])[0]
+
+
+def batched(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def insert_many(cursor, sql, rows):
+    for batch in batched(rows):
+        cursor.executemany(sql, batch)
+
+
+def fetch_ids(cursor, prefix):
+    cursor.execute("SELECT usuario_login, id_usuario FROM Usuarios WHERE usuario_login LIKE ?", (prefix + '%',))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def reset(cursor):
+    """Borra los datos generados anteriormente (usuarios con prefijo bench_ y sus dependencias)."""
+    bench_users = "SELECT id_usuario FROM Usuarios WHERE usuario_login LIKE 'bench\\_%' ESCAPE '\\'"
+    bench_doctors = f"SELECT id_medico FROM Medicos WHERE id_usuario IN ({bench_users})"
+    bench_patients = f"SELECT id_paciente FROM Pacientes WHERE id_usuario IN ({bench_users})"
+    cursor.execute(f"DELETE FROM Citas WHERE id_medico IN ({bench_doctors}) OR id_paciente IN ({bench_patients})")
+    cursor.execute(f"DELETE FROM Asistencias WHERE id_medico IN ({bench_doctors})")
+    cursor.execute(f"DELETE FROM Horarios_disponibles WHERE id_medico IN ({bench_doctors})")
+    cursor.execute(f"DELETE FROM Medicos WHERE id_usuario IN ({bench_users})")
+    cursor.execute(f"DELETE FROM Pacientes WHERE id_usuario IN ({bench_users})")
+    cursor.execute(f"DELETE FROM Password_reset_tokens WHERE id_usuario IN ({bench_users})")
+    cursor.execute(f"DELETE FROM Usuarios WHERE id_usuario IN ({bench_users})")
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    password_hash = generate_password_hash(args.password)
+    today = date.today()
+    start_day = today - timedelta(days=365 * args.years)
+    end_day = today + timedelta(days=args.future_days)
+    timings = {}
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("No se pudo conectar a la base de datos")
+
+    try:
+        cursor = conn.cursor()
+        if args.reset:
+            reset(cursor)
+            conn.commit()
+        elif fetch_ids(cursor, PREFIX):
+            sys.exit("Ya existen datos de benchmark; use --reset para regenerarlos.")
+
+        cursor.execute("SELECT nombre_rol, id_rol FROM Roles")
+        roles = {row[0]: row[1] for row in cursor.fetchall()}
+        cursor.execute("SELECT nombre_especialidad FROM Especialidades")
+        specialties = sorted(row[0] for row in cursor.fetchall())
+
+        # 1. Usuarios
+        started = time.perf_counter()
+        users = []
+        for kind, count, role, user_type in (('medico', args.doctors, 'Médico', 'medico'),
+                                             ('paciente', args.patients, 'Paciente', 'paciente'),
+                                             ('recepcion', args.receptionists, 'Recepcionista', 'recepcion'),
+                                             ('admin', 1, 'Administrador', 'admin')):
+            for i in range(1, count + 1):
+                login = f'{PREFIX}{kind}_{i}'
+                name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}'
+                created = datetime.combine(start_day + timedelta(days=rng.randrange((today - start_day).days + 1)),
+                                           datetime.min.time()) + timedelta(minutes=rng.randrange(24 * 60))
+                users.append((name, login, password_hash, roles[role], f'B{kind[0].upper()}{i:07d}',
+                              f'0414{rng.randrange(10 ** 7):07d}', f'{login}@bench.local', user_type, 1, created))
+        insert_many(cursor, """
+            INSERT INTO Usuarios (nombre_completo, usuario_login, contraseña, id_rol, cedula, telefono, gmail,
+                                  tipo_usuario, activo, fecha_creacion)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, users)
+        user_ids = fetch_ids(cursor, PREFIX)
+        created_at = {user[1]: user[9] for user in users}
+        timings['usuarios'] = time.perf_counter() - started
+
+        # 2. Médicos y pacientes
+        started = time.perf_counter()
+        doctor_logins = [f'{PREFIX}medico_{i}' for i in range(1, args.doctors + 1)]
+        insert_many(cursor, """
+            INSERT INTO Medicos (id_usuario, especialidad, numero_colegiado, años_experiencia, estado, fecha_creacion)
+            VALUES (?, ?, ?, ?, 'A', ?)
+        """, [(user_ids[login], rng.choice(specialties), f'BMPPS-{i:06d}', rng.randint(1, 35), created_at[login])
+              for i, login in enumerate(doctor_logins, 1)])
+
+        patient_logins = [f'{PREFIX}paciente_{i}' for i in range(1, args.patients + 1)]
+        insert_many(cursor, """
+            INSERT INTO Pacientes (id_usuario, fecha_nacimiento, genero, tipo_sangre, estado, fecha_creacion)
+            VALUES (?, ?, ?, ?, 'A', ?)
+        """, [(user_ids[login], today - timedelta(days=rng.randint(365, 365 * 90)),
+               rng.choice(['Masculino', 'Femenino']), rng.choice(BLOOD_TYPES), created_at[login])
+              for login in patient_logins])
+
+        cursor.execute(f"""
+            SELECT m.id_medico FROM Medicos m JOIN Usuarios u ON m.id_usuario = u.id_usuario
+            WHERE u.usuario_login LIKE '{PREFIX}%' ORDER BY m.id_medico
+        """)
+        doctor_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"""
+            SELECT p.id_paciente FROM Pacientes p JOIN Usuarios u ON p.id_usuario = u.id_usuario
+            WHERE u.usuario_login LIKE '{PREFIX}%' ORDER BY p.id_paciente
+        """)
+        patient_ids = [row[0] for row in cursor.fetchall()]
+        timings['medicos_pacientes'] = time.perf_counter() - started
+
+        # 3. Horarios: cada médico trabaja de lunes a viernes y algunos los sábados
+        started = time.perf_counter()
+        schedules = {}
+        schedule_rows = []
+        for id_medico in doctor_ids:
+            shift = rng.choice(SHIFTS)
+            days = [1, 2, 3, 4, 5] + ([6] if rng.random() < 0.3 else [])
+            schedules[id_medico] = (days, shift)
+            schedule_rows.extend((id_medico, day, shift[0], shift[1]) for day in days)
+        insert_many(cursor, "INSERT INTO Horarios_disponibles (id_medico, dia_semana_num, hora_inicio, hora_fin) VALUES (?, ?, ?, ?)",
+                    schedule_rows)
+        timings['horarios'] = time.perf_counter() - started
+
+        # 4. Citas (franjas de 30 minutos) y asistencias, día por día
+        started = time.perf_counter()
+        appointment_rows, attendance_rows = [], []
+        day = start_day
+        while day <= end_day:
+            weekday = day.isoweekday()
+            for id_medico in doctor_ids:
+                days, (shift_start, shift_end) = schedules[id_medico]
+                if weekday not in days:
+                    continue
+                begin = datetime.combine(day, datetime.strptime(shift_start, '%H:%M:%S').time())
+                finish = datetime.combine(day, datetime.strptime(shift_end, '%H:%M:%S').time())
+                slots = int((finish - begin).total_seconds() // 1800)
+                booked = rng.sample(range(slots), k=min(slots, round(slots * args.occupancy * rng.uniform(0.6, 1.2))))
+                for slot in booked:
+                    slot_time = (begin + timedelta(minutes=30 * slot)).time()
+                    states = PAST_STATES if day < today else FUTURE_STATES
+                    appointment_rows.append((
+                        id_medico, rng.choice(patient_ids), day, slot_time, rng.choice(REASONS),
+                        datetime.combine(day - timedelta(days=rng.randint(1, 30)), datetime.min.time()) + timedelta(minutes=rng.randrange(600, 1080)),
+                        weighted_choice(rng, states)
+                    ))
+                if day < today:
+                    attendance = weighted_choice(rng, ATTENDANCE_STATES)
+                    if attendance == 'Ausente':
+                        attendance_rows.append((id_medico, day, None, None, attendance))
+                    else:
+                        late = rng.randint(10, 45) if attendance == 'Tarde' else rng.randint(-10, 5)
+                        attendance_rows.append((id_medico, day, (begin + timedelta(minutes=late)).time(),
+                                                (finish + timedelta(minutes=rng.randint(-15, 30))).time(), attendance))
+            day += timedelta(days=1)
+
+        insert_many(cursor, """
+            INSERT INTO Citas (id_medico, id_paciente, fecha_cita, hora_cita, motivo_consulta, fecha_creacion, estado)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, appointment_rows)
+        insert_many(cursor, """
+            INSERT INTO Asistencias (id_medico, fecha, hora_entrada, hora_salida, estado_asistencia)
+            VALUES (?, ?, ?, ?, ?)
+        """, attendance_rows)
+        timings['citas_asistencias'] = time.perf_counter() - started
+
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        'usuarios': len(users),
+        'medicos': len(doctor_ids),
+        'pacientes': len(patient_ids),
+        'horarios': len(schedule_rows),
+        'citas': len(appointment_rows),
+        'asistencias': len(attendance_rows),
+        'tiempos_s': {name: round(value, 2) for name, value in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=40)
+    parser.add_argument('--patients', type=int, default=4000)
+    parser.add_argument('--receptionists', type=int, default=4)
+    parser.add_argument('--years', type=int, default=2, help='años de historial de citas')
+    parser.add_argument('--future-days', type=int, default=60, help='días de citas futuras')
+    parser.add_argument('--occupancy', type=float, default=0.7, help='fracción media de franjas ocupadas')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help='contraseña de todos los usuarios generados')
+    parser.add_argument('--reset', action='store_true', help='borrar los datos bench_ existentes antes de generar')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if not init_database():
+        sys.exit("No se pudo inicializar el esquema")
+    summary = generate(args)
+    for name, value in summary.items():
+        print(f"{name:<12} {value}")
+
+
+if __name__ == '__main__':
+    main()
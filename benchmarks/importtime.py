@@ -0,0 +1,100 @@
+"""Benchmark de regresión del tiempo de importación de la aplicación.
+
+Ejecuta `python -X importtime` sobre create_app() y compara el tiempo acumulado
+de los módulos propios de la aplicación contra una línea base guardada en JSON.
+
+Uso:
+    python benchmarks/importtime.py            # compara contra la línea base
+    python benchmarks/importtime.py --update   # guarda los tiempos actuales como línea base
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'importtime_baseline.json')
+TARGET = "from app import create_app; create_app()"
+# Módulos que se vigilan además del total (los pesados que deben cargarse bajo demanda)
+WATCHED = ['app', 'views', 'auth', 'dashboard', 'users', 'doctors', 'patients', 'appointments',
+           'schedules', 'consultas', 'chatbot', 'reports', 'asistencia', 'user_profile',
+           'reportlab', 'smtplib']
+
+
+def measure(runs):
+    """Ejecuta el objetivo `runs` veces y devuelve el mejor tiempo acumulado (us) por módulo."""
+    best = {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', TARGET],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            sys.exit(f"No se pudo importar la aplicación:\n{result.stderr[-2000:]}")
+
+        timings = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            # Formato: "import time:  <self us> | <cumulative us> | <módulo>"
+            _, cumulative_us, name = line[len('import time:'):].split('|')
+            timings[name.strip()] = int(cumulative_us)
+        timings['__total__'] = timings.get('app', 0) + sum(
+            timings.get(module, 0) for module in WATCHED if module not in ('app', 'reportlab', 'smtplib')
+        )
+
+        for name, value in timings.items():
+            best[name] = min(best.get(name, value), value)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='número de ejecuciones (se toma el mejor tiempo)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='regresión permitida (0.25 = 25%%)')
+    parser.add_argument('--update', action='store_true', help='guardar los tiempos actuales como línea base')
+    args = parser.parse_args()
+
+    timings = measure(args.runs)
+    current = {name: timings[name] for name in WATCHED + ['__total__'] if name in timings}
+
+    for name, value in sorted(current.items(), key=lambda item: -item[1]):
+        print(f"{name:<15} {value / 1000:>9.2f} ms")
+
+    if args.update:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"Línea base guardada en {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("No existe línea base; ejecute con --update para crearla.")
+        return 0
+
+    with open(BASELINE_PATH, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, value in current.items():
+        if name not in baseline:
+            # Un módulo vigilado que antes no se cargaba al iniciar (p. ej. reportlab)
+            if name in ('reportlab', 'smtplib'):
+                regressions.append(f"{name} ahora se importa al iniciar ({value / 1000:.2f} ms)")
+            continue
+        limit = baseline[name] * (1 + args.tolerance)
+        if value > limit:
+            regressions.append(f"{name}: {value / 1000:.2f} ms (línea base {baseline[name] / 1000:.2f} ms)")
+
+    if regressions:
+        print("Regresiones en el tiempo de importación:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+
+    print("Sin regresiones en el tiempo de importación.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Benchmark del costo de serialización JSON de listados grandes.
+
+Genera filas sintéticas con la forma de /api/citas/detalladas y compara:
+
+  - jsonify_strftime: dict por fila con strftime y json estándar (lo que hacían
+    los handlers antes de json_provider)
+  - provider_dicts:   dict por fila con fechas nativas, ClinicJSONProvider.dumps
+  - encode_rows:      tuplas del cursor codificadas con json_provider.encode_rows
+  - encode_rows_std:  encode_rows forzando el camino sin orjson
+
+Uso:
+    python benchmarks/json_serialization.py --rows 50000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+
+import json_provider
+from json_provider import ClinicJSONProvider, encode_rows
+
+COLUMNS = ['id_cita', 'paciente_nombre', 'medico_nombre', 'especialidad',
+           'fecha_cita', 'hora_cita', 'motivo_consulta', 'estado']
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Daniela', 'Andrés']
+APELLIDOS = ['Pérez', 'Díaz', 'Flores', 'Rojas', 'Ramírez', 'García', 'Hernández']
+ESPECIALIDADES = ['Cardiología', 'Pediatría', 'Dermatología', 'Medicina General']
+ESTADOS = ['pendiente', 'completada', 'cancelada']
+
+
+def make_rows(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, 7, 0)
+    rows = []
+    for i in range(count):
+        when = start + timedelta(days=rng.randrange(365), minutes=30 * rng.randrange(20))
+        rows.append((
+            i + 1,
+            f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+            f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+            rng.choice(ESPECIALIDADES),
+            when.date(),
+            when.time(),
+            'Control general',
+            rng.choice(ESTADOS),
+        ))
+    return rows
+
+
+def jsonify_strftime(rows, provider):
+    citas = [{
+        'id_cita': row[0],
+        'paciente_nombre': row[1],
+        'medico_nombre': row[2],
+        'especialidad': row[3],
+        'fecha_cita': row[4].strftime('%Y-%m-%d'),
+        'hora_cita': row[5].strftime('%H:%M'),
+        'motivo_consulta': row[6],
+        'estado': row[7] or 'pendiente'
+    } for row in rows]
+    # Mismos argumentos que DefaultJSONProvider.response()
+    return (json.dumps(citas, ensure_ascii=True, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def provider_dicts(rows, provider):
+    return provider.dumps([dict(zip(COLUMNS, row)) for row in rows]).encode('utf-8')
+
+
+def encode_rows_fast(rows, provider):
+    return encode_rows(COLUMNS, rows)
+
+
+def encode_rows_std(rows, provider):
+    saved = json_provider.orjson
+    json_provider.orjson = None
+    try:
+        return encode_rows(COLUMNS, rows)
+    finally:
+        json_provider.orjson = saved
+
+
+CASES = [
+    ('jsonify_strftime', jsonify_strftime),
+    ('provider_dicts', provider_dicts),
+    ('encode_rows', encode_rows_fast),
+    ('encode_rows_std', encode_rows_std),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.seed)
+    provider = ClinicJSONProvider(Flask(__name__))
+    reference = json.loads(jsonify_strftime(rows, provider))
+
+    print(f"orjson: {'sí' if json_provider.orjson else 'no'} | filas: {args.rows}")
+    print(f"{'caso':<18}{'mejor ms':>10}{'media ms':>10}{'bytes':>12}")
+    for name, func in CASES:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            body = func(rows, provider)
+            timings.append((time.perf_counter() - started) * 1000)
+        if json.loads(body) != reference:
+            sys.exit(f"{name}: la salida no coincide con la de referencia")
+        print(f"{name:<18}{min(timings):>10.1f}{sum(timings) / len(timings):>10.1f}{len(body):>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""Benchmark de carga de extremo a extremo por flujo de rol.
+
+Reproduce los flujos de recepción (consultar horarios y reservar citas), los
+dashboards de administración, la generación de reportes y conversaciones con el
+chatbot, y reporta latencia p50/p95/p99 y throughput por endpoint. Los resultados
+se guardan en JSON para comparar corridas.
+
+Por defecto ejecuta la aplicación en proceso con el cliente de pruebas de Flask;
+con --base-url se dirige a un servidor en marcha. Requiere los usuarios creados
+por generate_data.py.
+
+Uso:
+    DB_BACKEND=sqlite python benchmarks/load_test.py run --iterations 50 --concurrency 4
+    python benchmarks/load_test.py compare benchmarks/results/antes.json benchmarks/results/despues.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_data import DEFAULT_PASSWORD, PREFIX
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+CHATBOT_MESSAGES = {
+    'reception': ['agendar cita', 'ver horarios', 'buscar paciente', 'hola'],
+    'admin': ['buscar usuario', 'gestionar médicos', 'ver horarios', 'estadísticas'],
+    'doctor': ['mi horario', 'mis citas de hoy', 'mis pacientes', 'ayuda'],
+}
+
+
+class InProcessClient:
+    """Cliente sobre app.test_client(); cada hilo usa el suyo para tener su propia sesión."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, url, json_body=None):
+        response = self._client.open(url, method=method, json=json_body,
+                                     headers={'X-Requested-With': 'XMLHttpRequest'})
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Cliente HTTP mínimo con cookies para un servidor en marcha."""
+
+    def __init__(self, base_url):
+        self._base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, url, json_body=None):
+        data = json.dumps(json_body).encode() if json_body is not None else None
+        request = urllib.request.Request(self._base_url + url, data=data, method=method, headers={
+            'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest'})
+        try:
+            with self._opener.open(request) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            body, status = e.read(), e.code
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            return status, None
+
+
+class Recorder:
+    """Acumula las latencias por endpoint de todos los hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def timed(self, client, label, method, url, json_body=None, expected=(200, 201)):
+        started = time.perf_counter()
+        status, body = client.request(method, url, json_body)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.samples[label].append(elapsed_ms)
+            if status not in expected:
+                self.errors[label] += 1
+        return status, body
+
+
+def login(client, login_name, password):
+    status, body = client.request('POST', '/api/login', {'identificador': login_name, 'contraseña': password})
+    if status != 200:
+        raise RuntimeError(f"No se pudo iniciar sesión como {login_name}: {status} {body}")
+
+
+# --- Flujos por rol ---
+
+def reception_flow(client, recorder, rng, context):
+    """Consulta horarios disponibles de un médico y reserva la primera franja libre."""
+    id_medico = rng.choice(context['doctor_ids'])
+    fecha = (date.today() + timedelta(days=rng.randint(1, 30))).isoformat()
+    status, slots = recorder.timed(client, 'GET /api/medicos/<id>/horarios', 'GET',
+                                   f'/api/medicos/{id_medico}/horarios?fecha={fecha}')
+    if status == 200 and isinstance(slots, list) and slots:
+        recorder.timed(client, 'POST /api/citas', 'POST', '/api/citas', {
+            'id_medico': id_medico,
+            'id_paciente': rng.choice(context['patient_ids']),
+            'fecha_cita': fecha,
+            'hora_cita': rng.choice(slots),
+            'motivo_consulta': 'Benchmark de carga'
+        }, expected=(201, 400))
+    recorder.timed(client, 'GET /api/citas/agenda-hoy', 'GET', '/api/citas/agenda-hoy')
+
+
+def admin_dashboard_flow(client, recorder, rng, context):
+    """Carga del dashboard de administración: bootstrap y widgets individuales."""
+    recorder.timed(client, 'GET /api/admin/bootstrap', 'GET', '/api/admin/bootstrap')
+    recorder.timed(client, 'GET /api/admin/stats', 'GET', '/api/admin/stats')
+    recorder.timed(client, 'GET /api/admin/recent-activity', 'GET', '/api/admin/recent-activity')
+    recorder.timed(client, 'GET /api/admin/appointments-chart', 'GET', '/api/admin/appointments-chart')
+    recorder.timed(client, 'GET /api/admin/appointments-status-chart', 'GET', '/api/admin/appointments-status-chart')
+
+
+def reports_flow(client, recorder, rng, context):
+    """Reportes sobre un rango de entre uno y seis meses."""
+    end = date.today() - timedelta(days=rng.randint(0, 180))
+    start = end - timedelta(days=rng.choice([30, 90, 180]))
+    query = f'start_date={start.isoformat()}&end_date={end.isoformat()}'
+    for report in ('activity', 'appointment-compliance', 'new-patients', 'doctor-occupancy'):
+        recorder.timed(client, f'GET /api/reports/{report}', 'GET', f'/api/reports/{report}?{query}')
+
+
+def chatbot_flow(client, recorder, rng, context):
+    chatbot_type = rng.choice(list(CHATBOT_MESSAGES))
+    for message in rng.sample(CHATBOT_MESSAGES[chatbot_type], 2):
+        recorder.timed(client, 'POST /api/chatbot/response', 'POST', '/api/chatbot/response',
+                       {'message': message, 'type': chatbot_type})
+
+
+FLOWS = {
+    'reception': (f'{PREFIX}recepcion_1', reception_flow),
+    'admin': (f'{PREFIX}admin_1', admin_dashboard_flow),
+    'reports': (f'{PREFIX}admin_1', reports_flow),
+    'chatbot': (f'{PREFIX}recepcion_1', chatbot_flow),
+}
+
+
+# --- Ejecución y resultados ---
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def load_context():
+    """Ids de médicos y pacientes generados, leídos directamente de la base de datos."""
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("No se pudo conectar a la base de datos")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT m.id_medico FROM Medicos m JOIN Usuarios u ON m.id_usuario = u.id_usuario WHERE u.usuario_login LIKE '{PREFIX}%'")
+        doctor_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT p.id_paciente FROM Pacientes p JOIN Usuarios u ON p.id_usuario = u.id_usuario WHERE u.usuario_login LIKE '{PREFIX}%'")
+        patient_ids = [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    if not doctor_ids or not patient_ids:
+        sys.exit("No hay datos de benchmark; ejecute primero benchmarks/generate_data.py")
+    return {'doctor_ids': doctor_ids, 'patient_ids': patient_ids}
+
+
+def run(args):
+    flows = args.flows.split(',') if args.flows else list(FLOWS)
+    context = load_context()
+    recorder = Recorder()
+
+    if args.base_url:
+        make_client = lambda: HttpClient(args.base_url)
+    else:
+        from app import create_app
+        app = create_app()
+        make_client = lambda: InProcessClient(app)
+
+    def worker(worker_id):
+        rng = random.Random(args.seed + worker_id)
+        clients = {}
+        for _ in range(args.iterations):
+            flow = rng.choice(flows)
+            login_name, flow_fn = FLOWS[flow]
+            if login_name not in clients:
+                clients[login_name] = make_client()
+                login(clients[login_name], login_name, args.password)
+            flow_fn(clients[login_name], recorder, rng, context)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_s = time.perf_counter() - started
+
+    endpoints = {}
+    for label, samples in sorted(recorder.samples.items()):
+        samples.sort()
+        endpoints[label] = {
+            'requests': len(samples),
+            'errors': recorder.errors[label],
+            'mean_ms': round(sum(samples) / len(samples), 2),
+            'p50_ms': round(percentile(samples, 50), 2),
+            'p95_ms': round(percentile(samples, 95), 2),
+            'p99_ms': round(percentile(samples, 99), 2),
+            'max_ms': round(samples[-1], 2),
+            'throughput_rps': round(len(samples) / wall_s, 2),
+        }
+
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'target': args.base_url or 'in-process',
+        'backend': os.getenv('DB_BACKEND', 'mssql'),
+        'flows': flows,
+        'iterations': args.iterations,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'wall_s': round(wall_s, 2),
+        'total_requests': sum(stats['requests'] for stats in endpoints.values()),
+        'endpoints': endpoints,
+    }
+
+    print(f"{'endpoint':<42} {'n':>6} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8}")
+    for label, stats in endpoints.items():
+        print(f"{label:<42} {stats['requests']:>6} {stats['errors']:>4} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['throughput_rps']:>8.1f}")
+    print(f"{result['total_requests']} peticiones en {result['wall_s']} s")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output}")
+
+
+def compare(before_path, after_path):
+    with open(before_path, encoding='utf-8') as f:
+        before = json.load(f)['endpoints']
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)['endpoints']
+
+    print(f"{'endpoint':<42} {'p95 antes':>10} {'p95 después':>12} {'cambio':>8}")
+    for label in sorted(set(before) & set(after)):
+        old, new = before[label]['p95_ms'], after[label]['p95_ms']
+        change = f"{(new - old) / old * 100:+.1f}%" if old else '-'
+        print(f"{label:<42} {old:>10.1f} {new:>12.1f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='ejecutar el benchmark')
+    run_parser.add_argument('--iterations', type=int, default=50, help='flujos por hilo')
+    run_parser.add_argument('--concurrency', type=int, default=4, help='hilos concurrentes')
+    run_parser.add_argument('--flows', help=f"flujos separados por coma ({', '.join(FLOWS)})")
+    run_parser.add_argument('--base-url', help='servidor en marcha (por defecto, la app en proceso)')
+    run_parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    run_parser.add_argument('--seed', type=int, default=7)
+    run_parser.add_argument('--output', help='ruta del JSON de resultados')
+    compare_parser = subparsers.add_parser('compare', help='comparar dos corridas')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args.before, args.after)
+
+
+if __name__ == '__main__':
+    main()
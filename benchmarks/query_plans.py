@@ -0,0 +1,195 @@
+"""Captura los planes de ejecución estimados de las consultas frecuentes.
+
+Sirve para comprobar el efecto de una migración de índices: se capturan los planes
+antes y después de aplicarla y luego se comparan. Las consultas con sufijo
+_funcion conservan la forma anterior (columna envuelta en CONVERT/CAST) de la
+consulta del mismo nombre, para comparar ambos planes en una sola captura.
+
+Uso:
+    python benchmarks/query_plans.py capture antes
+    python migrations.py
+    python benchmarks/query_plans.py capture despues
+    python benchmarks/query_plans.py compare antes despues
+"""
+import argparse
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PLANS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plans')
+SHOWPLAN_NS = {'sp': 'http://schemas.microsoft.com/sqlserver/2004/07/showplan'}
+
+# Consultas representativas de appointments.py, dashboard.py y reports.py con valores de ejemplo.
+# SHOWPLAN no ejecuta la consulta, por lo que los valores no necesitan existir.
+QUERIES = {
+    'disponibilidad_horario': "SELECT hora_inicio, hora_fin FROM Horarios_disponibles WHERE id_medico = 1 AND dia_semana_num = 1 ORDER BY hora_inicio",
+    'citas_medico_dia': "SELECT hora_cita FROM Citas WHERE id_medico = 1 AND fecha_cita = '2024-01-15' ORDER BY hora_cita",
+    'conflicto_cita': "SELECT 1 FROM Citas WHERE id_medico = 1 AND fecha_cita = '2024-01-15' AND hora_cita = '09:00'",
+    'citas_hoy': """
+        SELECT c.id_cita, c.hora_cita, p_user.nombre_completo, m_user.nombre_completo
+        FROM Citas c
+        JOIN Pacientes p ON c.id_paciente = p.id_paciente
+        JOIN Usuarios p_user ON p.id_usuario = p_user.id_usuario
+        JOIN Medicos m ON c.id_medico = m.id_medico
+        JOIN Usuarios m_user ON m.id_usuario = m_user.id_usuario
+        WHERE c.fecha_cita = CAST(GETDATE() AS DATE)
+        ORDER BY c.hora_cita
+    """,
+    'citas_pendientes': "SELECT COUNT(*) FROM Citas WHERE estado = 'pendiente'",
+    'citas_por_estado': "SELECT estado, COUNT(*) FROM Citas WHERE estado IS NOT NULL GROUP BY estado",
+    'grafica_citas': """
+        SELECT CAST(fecha_cita AS DATE) AS dia, COUNT(*) FROM Citas
+        WHERE fecha_cita >= '2024-01-01' AND fecha_cita <= '2024-01-31'
+        GROUP BY CAST(fecha_cita AS DATE) ORDER BY dia
+    """,
+    'actividad_reciente': """
+        SELECT TOP 5 c.id_cita, c.fecha_creacion FROM Citas c
+        JOIN Pacientes p ON c.id_paciente = p.id_paciente
+        JOIN Medicos m ON c.id_medico = m.id_medico
+        ORDER BY c.fecha_creacion DESC
+    """,
+    'citas_paciente': """
+        SELECT c.fecha_cita, c.hora_cita, c.estado FROM Citas c
+        JOIN Pacientes p ON c.id_paciente = p.id_paciente
+        WHERE p.id_usuario = 1 ORDER BY c.fecha_cita, c.hora_cita
+    """,
+    'reporte_citas_rango': """
+        SELECT estado, COUNT(*) FROM Citas
+        WHERE fecha_cita BETWEEN '2024-01-01' AND '2024-12-31'
+        GROUP BY estado
+    """,
+    'reporte_citas_por_medico': """
+        SELECT m.nombre_completo, COUNT(*) AS total_citas FROM Citas c
+        JOIN Medicos med ON c.id_medico = med.id_medico
+        JOIN Usuarios m ON med.id_usuario = m.id_usuario
+        WHERE c.fecha_cita BETWEEN '2024-01-01' AND '2024-12-31' AND c.estado != 'cancelada'
+        GROUP BY m.nombre_completo ORDER BY total_citas DESC
+    """,
+    'reporte_pacientes': """
+        SELECT fecha_creacion_dia AS fecha, COUNT(*) FROM Usuarios
+        WHERE tipo_usuario = 'paciente' AND fecha_creacion_dia >= '2024-01-01' AND fecha_creacion_dia < '2025-01-01'
+        GROUP BY fecha_creacion_dia ORDER BY fecha
+    """,
+    'reporte_pacientes_funcion': """
+        SELECT CAST(fecha_creacion AS DATE) AS fecha, COUNT(*) FROM Usuarios
+        WHERE tipo_usuario = 'paciente' AND CAST(fecha_creacion AS DATE) BETWEEN '2024-01-01' AND '2024-12-31'
+        GROUP BY CAST(fecha_creacion AS DATE) ORDER BY fecha
+    """,
+    # Predicados de date_ranges.py en dashboard.py y patients.py
+    'conteo_citas_hoy': """
+        SELECT COUNT(*) FROM Citas
+        WHERE fecha_cita >= CAST(GETDATE() AS DATE) AND fecha_cita < CAST(DATEADD(day, 1, GETDATE()) AS DATE)
+        AND estado != 'Cancelada'
+    """,
+    'conteo_citas_hoy_funcion': """
+        SELECT COUNT(*) FROM Citas
+        WHERE CONVERT(date, fecha_cita) = CONVERT(date, GETDATE()) AND estado != 'Cancelada'
+    """,
+    'completadas_semana': """
+        SELECT COUNT(*) FROM Citas
+        WHERE estado = 'completada' AND fecha_cita >= CAST(DATEADD(day, -6, GETDATE()) AS DATE)
+    """,
+    'completadas_semana_funcion': """
+        SELECT COUNT(*) FROM Citas
+        WHERE estado = 'completada' AND fecha_cita >= DATEADD(day, -7, GETDATE())
+    """,
+    'pacientes_por_alta': """
+        SELECT p.id_paciente, p.estado FROM Pacientes p
+        WHERE p.fecha_creacion >= '2024-03-01' AND p.fecha_creacion < '2024-07-01'
+    """,
+    'pacientes_por_alta_funcion': """
+        SELECT p.id_paciente, p.estado FROM Pacientes p
+        WHERE CONVERT(date, p.fecha_creacion) >= '2024-03-01' AND CONVERT(date, p.fecha_creacion) <= '2024-06-30'
+    """,
+    'token_recuperacion': "SELECT id_usuario, expiration, used FROM Password_reset_tokens WHERE token = 'abc'",
+}
+
+
+def summarize_plan(plan_xml):
+    """Extrae el costo estimado y los operadores de acceso de un plan XML."""
+    root = ET.fromstring(plan_xml)
+    statement = root.find('.//sp:StmtSimple', SHOWPLAN_NS)
+    operators = []
+    for relop in root.iter(f"{{{SHOWPLAN_NS['sp']}}}RelOp"):
+        physical = relop.get('PhysicalOp')
+        if physical not in ('Index Seek', 'Index Scan', 'Clustered Index Seek', 'Clustered Index Scan',
+                            'Table Scan', 'Key Lookup', 'RID Lookup'):
+            continue
+        obj = relop.find('.//sp:Object', SHOWPLAN_NS)
+        index = f"{obj.get('Table', '')}.{obj.get('Index', '')}".replace('[', '').replace(']', '') if obj is not None else ''
+        operators.append(f"{physical} {index}".strip())
+    return {
+        'estimated_cost': float(statement.get('StatementSubTreeCost', 0)) if statement is not None else None,
+        'operators': operators,
+    }
+
+
+def capture(label):
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("No se pudo conectar a la base de datos")
+
+    target_dir = os.path.join(PLANS_DIR, label)
+    os.makedirs(target_dir, exist_ok=True)
+    summary = {}
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SET SHOWPLAN_XML ON")
+        for name, sql in QUERIES.items():
+            cursor.execute(sql)
+            plan_xml = cursor.fetchone()[0]
+            with open(os.path.join(target_dir, f'{name}.sqlplan'), 'w', encoding='utf-8') as f:
+                f.write(plan_xml)
+            summary[name] = summarize_plan(plan_xml)
+            print(f"{name:<28} costo {summary[name]['estimated_cost']:.4f}  {', '.join(summary[name]['operators'])}")
+        cursor.execute("SET SHOWPLAN_XML OFF")
+    finally:
+        conn.close()
+
+    with open(os.path.join(target_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"Planes guardados en {target_dir}")
+
+
+def compare(before, after):
+    def load(label):
+        with open(os.path.join(PLANS_DIR, label, 'summary.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    old, new = load(before), load(after)
+    print(f"{'consulta':<28} {before:>10} {after:>10}  cambio")
+    for name in QUERIES:
+        if name not in old or name not in new:
+            continue
+        old_cost, new_cost = old[name]['estimated_cost'], new[name]['estimated_cost']
+        change = f"{(new_cost - old_cost) / old_cost * 100:+.1f}%" if old_cost else '-'
+        print(f"{name:<28} {old_cost:>10.4f} {new_cost:>10.4f}  {change}")
+        if old[name]['operators'] != new[name]['operators']:
+            print(f"    antes:   {', '.join(old[name]['operators'])}")
+            print(f"    después: {', '.join(new[name]['operators'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    capture_parser = subparsers.add_parser('capture', help='capturar los planes actuales')
+    capture_parser.add_argument('label')
+    compare_parser = subparsers.add_parser('compare', help='comparar dos capturas')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    args = parser.parse_args()
+
+    if args.command == 'capture':
+        capture(args.label)
+    else:
+        compare(args.before, args.after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark de throughput: servidor de desarrollo contra serve.py.
+
+Levanta cada servidor en un subproceso, espera a /api/health/live, ejecuta
+load_test.py contra él con --base-url y guarda los resultados en
+benchmarks/results/serving_<servidor>.json. Al final muestra el throughput
+total y la comparación de p95 por endpoint.
+
+Requiere los datos de generate_data.py y, para el perfil de producción,
+gunicorn o waitress instalados.
+
+Uso:
+    DB_BACKEND=sqlite python benchmarks/serving.py --iterations 30 --concurrency 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# Lo mismo que main.py (depurador activo) pero sin el recargador, que duplica el proceso
+DEV_SERVER = ("from app import create_app; "
+              "create_app().run(host='127.0.0.1', port={port}, debug=True, use_reloader=False)")
+
+
+def server_command(name, port, args):
+    if name == 'dev':
+        return [sys.executable, '-c', DEV_SERVER.format(port=port)]
+    command = [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port)]
+    if args.workers:
+        command += ['--workers', str(args.workers)]
+    if args.threads:
+        command += ['--threads', str(args.threads)]
+    return command
+
+
+def wait_ready(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/api/health/live', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.3)
+    return False
+
+
+def run_server(name, port, args):
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(server_command(name, port, args), cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_ready(base_url):
+            sys.exit(f"El servidor '{name}' no respondió en {base_url}")
+        output = os.path.join(RESULTS_DIR, f'serving_{name}.json')
+        subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'load_test.py'), 'run',
+                        '--base-url', base_url, '--iterations', str(args.iterations),
+                        '--concurrency', str(args.concurrency), '--output', output],
+                       cwd=ROOT, check=True)
+        with open(output, encoding='utf-8') as f:
+            return output, json.load(f)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=30, help='flujos por hilo cliente')
+    parser.add_argument('--concurrency', type=int, default=8, help='hilos cliente')
+    parser.add_argument('--workers', type=int, help='workers para serve.py')
+    parser.add_argument('--threads', type=int, help='hilos por worker para serve.py')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    results = {}
+    for offset, name in enumerate(['dev', 'production']):
+        print(f"--- {name} ---")
+        results[name] = run_server(name, args.port + offset, args)
+
+    print(f"\n{'servidor':<12} {'peticiones':>10} {'segundos':>9} {'req/s':>8}")
+    for name, (_, result) in results.items():
+        rps = result['total_requests'] / result['wall_s'] if result['wall_s'] else 0
+        print(f"{name:<12} {result['total_requests']:>10} {result['wall_s']:>9.2f} {rps:>8.1f}")
+
+    sys.path.insert(0, BENCH_DIR)
+    from load_test import compare
+    print()
+    compare(results['dev'][0], results['production'][0])
+
+
+if __name__ == '__main__':
+    main()
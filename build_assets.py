@@ -0,0 +1,142 @@
+"""Construye los assets estáticos para producción.
+
+Minifica los CSS/JS que usan las plantillas, une los paquetes por página de
+assets.BUNDLES y escribe cada resultado en static/dist/ con el hash del
+contenido en el nombre. El manifiesto static/dist/manifest.json relaciona el
+nombre lógico ('css/login.css') con el archivo generado, y assets.asset_url()
+lo usa al renderizar las plantillas. También guarda el hash de cada fuente para
+que la aplicación detecte los archivos editados después del último build.
+
+La minificación usa rcssmin y rjsmin (requirements.txt). Si no están
+instalados los archivos se copian sin minificar, con un aviso: un minificador
+propio no reconoce bien las expresiones regulares ni las plantillas anidadas y
+puede romper JavaScript válido.
+
+Uso:
+    python build_assets.py
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+from assets import BUNDLES, DIST_DIR, MANIFEST_PATH, STATIC_DIR, SOURCE_HASH_LENGTH
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+ASSET_REFERENCE = re.compile(r"asset_url\('([^']+)'\)")
+HASH_LENGTH = 10
+
+
+def minify_css(source):
+    return rcssmin.cssmin(source) if rcssmin else source
+
+
+# Desde un '${' hasta la siguiente '`': si las llaves no se cerraron, esa '`' abre
+# una plantilla dentro de la interpolación. Ante la duda (llaves en cadenas) se
+# considera anidada
+_INTERPOLATION_TO_BACKTICK = re.compile(r'\$\{([^`]*)`')
+
+
+def has_nested_template(source):
+    """True si el JS tiene una plantilla dentro de otra (`a ${x ? `b` : ''}`)."""
+    return any(body.count('}') <= body.count('{')
+               for body in _INTERPOLATION_TO_BACKTICK.findall(source))
+
+
+def minify_js(source):
+    # rjsmin no reconoce las plantillas anidadas: cambia su contenido en silencio
+    # (espacios, '//' o '/* */' dentro de la plantilla interior)
+    if not rjsmin or has_nested_template(source):
+        return source
+    return rjsmin.jsmin(source)
+
+
+def _read(filename):
+    with open(os.path.join(STATIC_DIR, filename), 'rb') as f:
+        return f.read()
+
+
+def _process(filename, content):
+    if filename.endswith('.css'):
+        return minify_css(content.decode('utf-8')).encode('utf-8')
+    if filename.endswith('.js'):
+        source = content.decode('utf-8')
+        if rjsmin and has_nested_template(source):
+            print(f"  aviso: {filename} tiene plantillas anidadas; se copia sin minificar")
+        return minify_js(source).encode('utf-8')
+    return content
+
+
+def _write(filename, content):
+    """Escribe el contenido en dist/ con el hash en el nombre y devuelve la ruta relativa a static/."""
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    base, ext = os.path.splitext(filename)
+    hashed = f"{DIST_DIR}/{base}.{digest}{ext}"
+    path = os.path.join(STATIC_DIR, hashed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return hashed
+
+
+def referenced_assets():
+    """Archivos de static/ que las plantillas cargan con asset_url()."""
+    found = set()
+    for name in os.listdir(TEMPLATES_DIR):
+        if name.endswith('.html'):
+            with open(os.path.join(TEMPLATES_DIR, name), encoding='utf-8') as f:
+                found.update(ASSET_REFERENCE.findall(f.read()))
+    for files in BUNDLES.values():
+        found.update(files)
+    return sorted(found)
+
+
+def build():
+    dist = os.path.join(STATIC_DIR, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    missing = [name for name, module in (('rcssmin', rcssmin), ('rjsmin', rjsmin)) if module is None]
+    if missing:
+        print(f"  aviso: falta {', '.join(missing)} (pip install -r requirements.txt); se copia sin minificar")
+
+    manifest = {}
+    sources = {}
+    processed = {}
+    original_size = built_size = 0
+    for filename in referenced_assets():
+        if not os.path.isfile(os.path.join(STATIC_DIR, filename)):
+            print(f"  aviso: {filename} no existe, se omite")
+            continue
+        content = _read(filename)
+        sources[filename] = hashlib.sha256(content).hexdigest()[:SOURCE_HASH_LENGTH]
+        processed[filename] = _process(filename, content)
+        manifest[filename] = _write(filename, processed[filename])
+        original_size += len(content)
+        built_size += len(processed[filename])
+
+    for name, files in BUNDLES.items():
+        parts = [processed[f] for f in files if f in processed]
+        # ';' entre scripts por si alguno termina sin él
+        separator = b'\n' if name.endswith('.css') else b';\n'
+        manifest[name] = _write(name, separator.join(parts))
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'files': manifest, 'sources': sources}, f, indent=2, sort_keys=True)
+
+    print(f"{len(processed)} archivos y {len(BUNDLES)} paquetes en static/{DIST_DIR}/")
+    print(f"Tamaño: {original_size / 1024:.1f} KiB -> {built_size / 1024:.1f} KiB")
+    return manifest
+
+
+if __name__ == '__main__':
+    sys.exit(0 if build() else 1)
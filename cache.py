@@ -0,0 +1,152 @@
+import hashlib
+import threading
+import time
+
+from flask import current_app
+
+# Cachés en memoria de datos de referencia que cambian poco (médicos,
+# especialidades...).
+#
+# Cada VersionedCache guarda valores ya construidos (y, si hace falta, su JSON
+# ya serializado) junto con la versión con la que se cargaron. Las escrituras
+# llaman a bump() y la siguiente lectura vuelve a cargar; mientras tanto las
+# lecturas no tocan la base de datos. bump() solo afecta a este proceso: con
+# varios workers, max_age acota cuánto tarda un cambio hecho en otro worker
+# en verse aquí.
+#
+# invalidate(key) también cuenta una generación por clave: una carga que empezó
+# antes de la invalidación no guarda su resultado (podría ser anterior a la
+# escritura). Las generaciones se descartan con bump(), y si se acumulan más de
+# MAX_GENERATIONS claves la caché se vacía entera por el mismo motivo.
+
+MAX_GENERATIONS = 10000
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class VersionedCache:
+    """
+    Valores por clave cargados con `loader(key)` (o `loader()` si la caché
+    tiene una sola entrada) e invalidados en bloque con bump().
+    """
+
+    def __init__(self, name, loader, max_age=None, max_entries=None):
+        self.name = name
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.version = 0
+        self._loader = loader
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'bumps': 0}
+        with _registry_lock:
+            _registry[name] = self
+
+    def _fresh(self, entry):
+        version, loaded_at, _ = entry
+        if version != self.version:
+            return False
+        return self.max_age is None or time.monotonic() - loaded_at < self.max_age
+
+    def get(self, key=None):
+        """Valor en caché o recién cargado. Si el loader devuelve None no se guarda."""
+        entry = self._entries.get(key)
+        if entry is not None and self._fresh(entry):
+            self._stats['hits'] += 1
+            return entry[2]
+
+        self._stats['misses'] += 1
+        version = self.version
+        generation = self._generations.get(key, 0)
+        value = self._loader() if key is None else self._loader(key)
+        if value is None:
+            return None
+        with self._lock:
+            # Si hubo un bump() o un invalidate(key) durante la carga, el valor puede no incluir ese cambio
+            if version == self.version and generation == self._generations.get(key, 0):
+                if self.max_entries and key not in self._entries and len(self._entries) >= self.max_entries:
+                    # Se descarta la entrada más antigua (orden de inserción)
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (version, time.monotonic(), value)
+        return value
+
+    def bump(self):
+        """Invalida todas las entradas tras una escritura."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._generations.clear()
+            self._stats['bumps'] += 1
+
+    def invalidate(self, key=None):
+        """Invalida una sola entrada (y las cargas de esa clave que estén en curso)."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            if len(self._generations) > MAX_GENERATIONS:
+                # El cambio de versión también descarta las cargas en curso de cualquier clave
+                self.version += 1
+                self._entries.clear()
+                self._generations.clear()
+
+    def snapshot(self):
+        return {**self._stats, 'version': self.version, 'entries': len(self._entries)}
+
+
+def bump(name):
+    """Invalida una caché por nombre, sin importar el módulo que la define."""
+    with _registry_lock:
+        cache = _registry.get(name)
+    if cache is not None:
+        cache.bump()
+
+
+def invalidate(name, key):
+    """Invalida una entrada de una caché por nombre."""
+    with _registry_lock:
+        cache = _registry.get(name)
+    if cache is not None:
+        cache.invalidate(key)
+
+
+def json_payload(value):
+    """
+    JSON ya serializado con el proveedor de la aplicación (ver json_provider.py)
+    y su ETag. El ETag depende solo del contenido, así que coincide entre workers.
+    """
+    body = current_app.json.dumps(value).encode('utf-8')
+    return body, hashlib.sha1(body).hexdigest()[:20]
+
+
+def json_response(payload):
+    """Respuesta a partir de json_payload(); compression.py ya no calcula el hash del cuerpo."""
+    body, etag = payload
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def snapshot():
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.name: cache.snapshot() for cache in caches}
+
+
+def render_prometheus():
+    """Aciertos, fallos e invalidaciones por caché en el formato de texto de Prometheus."""
+    data = snapshot()
+    lines = []
+    cache_metrics = [
+        ('clinica_cache_hits_total', 'Lecturas servidas desde la caché.', 'counter', 'hits'),
+        ('clinica_cache_misses_total', 'Lecturas que cargaron desde la base de datos.', 'counter', 'misses'),
+        ('clinica_cache_bumps_total', 'Invalidaciones por escritura.', 'counter', 'bumps'),
+        ('clinica_cache_entries', 'Entradas guardadas.', 'gauge', 'entries'),
+    ]
+    for name, help_text, metric_type, field in cache_metrics:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for cache_name, stats in sorted(data.items()):
+            lines.append(f'{name}{{cache="{cache_name}"}} {stats[field]}')
+    return '\n'.join(lines) + '\n'
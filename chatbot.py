@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from auth_middleware import login_required
 from datetime import date, datetime, timedelta
 from database import get_db_connection
+from config import DAY_NAMES
+import schedule_cache
 import logging
 import threading
 import atexit
@@ -232,47 +234,25 @@ def handle_doctor_greeting(current_user):
 
 def handle_doctor_schedule(current_user):
     """Proporciona información sobre el horario del médico."""
-    conn = None
     try:
-        conn = get_thread_safe_connection()
-        if not conn:
+        week = schedule_cache.week(current_user.get('id_medico'))
+        if week is None:
             return {
                 'text': '📅 Puedes ver tu horario de trabajo completo en la sección <a href="/mi-horario" style="color: #1E8449; font-weight: 600;">Mi Horario</a>.'
             }
-        
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT dia_semana, hora_inicio, hora_fin 
-                FROM HorariosMedicos 
-                WHERE id_medico = (
-                    SELECT id_medico FROM Medicos WHERE id_usuario = ?
-                ) 
-                ORDER BY 
-                    CASE dia_semana
-                        WHEN 'Lunes' THEN 1
-                        WHEN 'Martes' THEN 2
-                        WHEN 'Miércoles' THEN 3
-                        WHEN 'Jueves' THEN 4
-                        WHEN 'Viernes' THEN 5
-                        WHEN 'Sábado' THEN 6
-                        WHEN 'Domingo' THEN 7
-                    END
-            """, (current_user.id_usuario,))
-            
-            horarios = cursor.fetchall()
-            
-            if horarios:
-                schedule_text = "📅 <strong>Tu horario semanal:</strong><br><br>"
-                for horario in horarios:
-                    dia, inicio, fin = horario
-                    schedule_text += f"• <strong>{dia}</strong>: {inicio} - {fin}<br>"
-                schedule_text += "<br>Puedes gestionar tu horario en <a href='/mi-horario' style='color: #1E8449; font-weight: 600;'>Mi Horario</a>."
-                return {'text': schedule_text}
-            else:
-                return {
-                    'text': '📅 No tienes un horario configurado. Puedes establecerlo en la sección <a href="/mi-horario" style="color: #1E8449; font-weight: 600;">Mi Horario</a>.'
-                }
-                
+
+        if any(week):
+            schedule_text = "📅 <strong>Tu horario semanal:</strong><br><br>"
+            for dia_num in range(1, 8):
+                for _, inicio, fin in week[dia_num]:
+                    schedule_text += f"• <strong>{DAY_NAMES[dia_num]}</strong>: {str(inicio)[:5]} - {str(fin)[:5]}<br>"
+            schedule_text += "<br>Puedes gestionar tu horario en <a href='/mi-horario' style='color: #1E8449; font-weight: 600;'>Mi Horario</a>."
+            return {'text': schedule_text}
+        else:
+            return {
+                'text': '📅 No tienes un horario configurado. Puedes establecerlo en la sección <a href="/mi-horario" style="color: #1E8449; font-weight: 600;">Mi Horario</a>.'
+            }
+
     except Exception as e:
         logging.error(f"Error al obtener horario del médico: {e}")
         return {
@@ -0,0 +1,158 @@
+import gzip
+import threading
+import zlib
+from collections import defaultdict
+
+from flask import request
+
+from config import COMPRESS_MIN_SIZE, COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se usa gzip
+    brotli = None
+
+# Middleware de respuestas para /api/*:
+#   - ETag débil en las respuestas JSON de GET y 304 si coincide con If-None-Match
+#   - compresión gzip (o brotli si está instalado) por encima de COMPRESS_MIN_SIZE,
+#     también para respuestas en streaming
+#   - bytes ahorrados por endpoint, expuestos en /api/admin/metrics
+# Igual que db_metrics, los contadores son por proceso.
+
+ENCODINGS = (['br'] if brotli else []) + ['gzip']
+
+_lock = threading.Lock()
+_endpoints = defaultdict(lambda: {'responses': 0, 'compressed': 0, 'not_modified': 0,
+                                  'bytes_original': 0, 'bytes_sent': 0})
+
+
+def init_app(app):
+    app.after_request(process_response)
+
+
+def _record(endpoint, original, sent, compressed=False, not_modified=False):
+    with _lock:
+        stats = _endpoints[endpoint]
+        stats['responses'] += 1
+        stats['bytes_original'] += original
+        stats['bytes_sent'] += sent
+        if compressed:
+            stats['compressed'] += 1
+        if not_modified:
+            stats['not_modified'] += 1
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    for encoding in ENCODINGS:
+        if accepted[encoding]:
+            return encoding
+    return None
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, encoding, endpoint):
+    """Comprime un cuerpo en streaming; cada fragmento se envía en cuanto se comprime."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+    original = sent = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            original += len(chunk)
+            data = compress(chunk) + flush()
+            sent += len(data)
+            if data:
+                yield data
+        data = finish()
+        sent += len(data)
+        yield data
+    finally:
+        _record(endpoint, original, sent, compressed=True)
+
+
+def process_response(response):
+    if not request.path.startswith('/api/') or response.direct_passthrough:
+        return response
+    endpoint = request.endpoint or request.path
+
+    if request.method in ('GET', 'HEAD') and response.status_code == 200 \
+            and response.is_json and not response.is_streamed:
+        response.add_etag(weak=True)
+        # Los datos dependen del usuario: el navegador puede guardarlos pero debe revalidar
+        response.headers.setdefault('Cache-Control', 'private, no-cache')
+        response.make_conditional(request)
+        if response.status_code == 304:
+            _record(endpoint, len(response.get_data()), 0, not_modified=True)
+            return response
+
+    if response.status_code < 200 or response.status_code in (204, 304) \
+            or 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+
+    if response.is_streamed:
+        if encoding:
+            response.response = _compress_stream(response.response, encoding, endpoint)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    data = response.get_data()
+    if not encoding or len(data) < COMPRESS_MIN_SIZE:
+        _record(endpoint, len(data), len(data))
+        return response
+
+    compressed = _compress(data, encoding)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    _record(endpoint, len(data), len(compressed), compressed=True)
+    return response
+
+
+def snapshot():
+    with _lock:
+        return {endpoint: dict(stats) for endpoint, stats in _endpoints.items()}
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def render_prometheus():
+    """Contadores de compresión y 304 por endpoint en el formato de texto de Prometheus."""
+    data = snapshot()
+    lines = []
+    endpoint_metrics = [
+        ('clinica_http_responses_total', 'Respuestas /api/* procesadas por endpoint.', lambda s: s['responses']),
+        ('clinica_http_compressed_responses_total', 'Respuestas comprimidas por endpoint.', lambda s: s['compressed']),
+        ('clinica_http_not_modified_total', 'Respuestas 304 por ETag por endpoint.', lambda s: s['not_modified']),
+        ('clinica_http_response_bytes_original_total', 'Bytes del cuerpo antes de comprimir.', lambda s: s['bytes_original']),
+        ('clinica_http_response_bytes_sent_total', 'Bytes del cuerpo enviados.', lambda s: s['bytes_sent']),
+        ('clinica_http_response_bytes_saved_total', 'Bytes ahorrados por compresión y 304.',
+         lambda s: s['bytes_original'] - s['bytes_sent']),
+    ]
+    for name, help_text, value in endpoint_metrics:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for endpoint, stats in sorted(data.items()):
+            lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {value(stats)}')
+    return '\n'.join(lines) + '\n'
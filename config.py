@@ -9,6 +9,106 @@ USE_WINDOWS_AUTH = os.getenv('USE_WINDOWS_AUTH', 'True').lower() == 'true'
 USERNAME = os.getenv('DB_USERNAME', r'RAFAEL2004\PC')  # Raw string
 PASSWORD = os.getenv('DB_PASSWORD', 'your_secure_password')  # Never leave empty
 
+# Motor de base de datos: 'mssql' (producción) o 'sqlite' (pruebas locales y benchmarks)
+DB_BACKEND = os.getenv('DB_BACKEND', 'mssql').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clinica_local.db'))
+
+# Instrumentación de consultas: registra duración y filas por endpoint
+DB_INSTRUMENTATION = os.getenv('DB_INSTRUMENTATION', 'True').lower() == 'true'
+# Consultas más lentas que este umbral (ms) se escriben en slow_queries.log
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+
+# Servidor de producción (ver serve.py)
+WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+WEB_PORT = int(os.getenv('WEB_PORT', '8000'))
+# Hilos por worker: cada hilo usa como mucho una conexión a la vez
+WEB_THREADS = int(os.getenv('WEB_THREADS', '4'))
+# Workers; 0 = automático según CPUs y DB_MAX_CONNECTIONS
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '0'))
+# Conexiones simultáneas que la base de datos admite para esta aplicación
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', '32'))
+
+# Contraseñas (ver password_service.py)
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', '16'))
+# Hilos dedicados a calcular hashes y operaciones admitidas en curso o en cola
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(max(2, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32'))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+# Intentos de login permitidos: 'N/segundos' por identificador y por IP
+LOGIN_RATE_IDENTIFIER = os.getenv('LOGIN_RATE_IDENTIFIER', '5/60')
+LOGIN_RATE_IP = os.getenv('LOGIN_RATE_IP', '50/60')
+
+# Índice en memoria de usuario_login/cedula/gmail (ver identity_index.py):
+# segundos entre reconstrucciones y tasa de falsos positivos del filtro de Bloom
+IDENTITY_INDEX_REFRESH = int(os.getenv('IDENTITY_INDEX_REFRESH', '300'))
+IDENTITY_INDEX_FALSE_POSITIVE = float(os.getenv('IDENTITY_INDEX_FALSE_POSITIVE', '0.01'))
+
+# Segundos que un worker sirve datos de referencia (médicos, especialidades) sin
+# recargarlos; las escrituras del propio worker los invalidan al momento (ver cache.py)
+REFERENCE_CACHE_MAX_AGE = int(os.getenv('REFERENCE_CACHE_MAX_AGE', '300'))
+
+# Historial de citas por paciente (ver consultas.py): citas por página, citas más
+# recientes que se guardan en memoria por paciente, pacientes en memoria y segundos
+# que se sirven sin recargar (las citas escritas en este worker lo invalidan al momento)
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '20'))
+HISTORY_CACHE_ROWS = int(os.getenv('HISTORY_CACHE_ROWS', '100'))
+HISTORY_CACHE_PATIENTS = int(os.getenv('HISTORY_CACHE_PATIENTS', '1000'))
+HISTORY_CACHE_MAX_AGE = int(os.getenv('HISTORY_CACHE_MAX_AGE', '300'))
+
+# Asistencias (ver asistencia.py): médicos por registro en lote y segundos que un
+# worker sirve el resumen de un mes cerrado sin recalcularlo
+ATTENDANCE_BATCH_MAX = int(os.getenv('ATTENDANCE_BATCH_MAX', '500'))
+ATTENDANCE_SUMMARY_MAX_AGE = int(os.getenv('ATTENDANCE_SUMMARY_MAX_AGE', '3600'))
+
+# Conciliación de asistencias contra horarios (ver reconciliation.py): minutos de
+# tolerancia por defecto, días máximos por consulta y segundos que un día conciliado
+# se reutiliza sin reprocesarlo
+RECONCILIATION_TOLERANCE_MIN = int(os.getenv('RECONCILIATION_TOLERANCE_MIN', '10'))
+RECONCILIATION_MAX_DAYS = int(os.getenv('RECONCILIATION_MAX_DAYS', '366'))
+RECONCILIATION_MAX_AGE = int(os.getenv('RECONCILIATION_MAX_AGE', '900'))
+
+# Reporte de cumplimiento de citas (ver reports.py): filas de detalle por página
+# por defecto y máximo que se acepta en ?per_page
+COMPLIANCE_PAGE_SIZE = int(os.getenv('COMPLIANCE_PAGE_SIZE', '100'))
+COMPLIANCE_MAX_PAGE_SIZE = int(os.getenv('COMPLIANCE_MAX_PAGE_SIZE', '1000'))
+
+# Importación masiva de pacientes (ver patient_import.py): filas por lote (máximo
+# 1000, el límite de parámetros de SQL Server), hilos para los hashes de contraseña
+# y errores que se devuelven en la respuesta del endpoint
+PATIENT_IMPORT_BATCH_SIZE = min(int(os.getenv('PATIENT_IMPORT_BATCH_SIZE', '500')), 1000)
+PATIENT_IMPORT_HASH_WORKERS = int(os.getenv('PATIENT_IMPORT_HASH_WORKERS', str(PASSWORD_HASH_WORKERS)))
+PATIENT_IMPORT_MAX_ERRORS = int(os.getenv('PATIENT_IMPORT_MAX_ERRORS', '1000'))
+# Minutos sin avance tras los que una importación en curso se da por interrumpida
+# (el worker que la ejecutaba terminó); debe superar lo que tarda un lote
+PATIENT_IMPORT_STALE_MINUTES = int(os.getenv('PATIENT_IMPORT_STALE_MINUTES', '15'))
+
+# Logging (ver logger.py)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Formato de app.log: 'json' (un objeto por línea) o 'text'
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+# Cómo se escriben app.log y slow_queries.log: 'rotate' (rotación por tamaño; solo
+# con un proceso), 'watched' (la rotación la hace logrotate; seguro con varios
+# workers) o 'stdout' (solo consola). serve.py usa 'watched' con varios workers
+LOG_FILE_MODE = os.getenv('LOG_FILE_MODE', 'rotate').lower()
+# Muestreo de mensajes INFO/DEBUG frecuentes: 'logger=N,...' escribe 1 de cada N
+LOG_SAMPLE_RATES = {
+    name.strip(): int(rate)
+    for name, rate in (item.split('=') for item in os.getenv('LOG_SAMPLE_RATES', 'clinica.access=10,werkzeug=10').split(',') if item)
+}
+# Peticiones más lentas que este umbral (ms) se registran como WARNING y no se muestrean
+LOG_SLOW_REQUEST_MS = float(os.getenv('LOG_SLOW_REQUEST_MS', '1000'))
+
+# Compresión de respuestas /api/* (ver compression.py): tamaño mínimo en bytes y niveles
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+
+# Bytecode compilado de las plantillas Jinja (ver page_cache.py)
+JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jinja_cache'))
+
 # Diccionario de nombres de días
 DAY_NAMES = {
     1: 'Lunes',
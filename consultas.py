@@ -1,10 +1,18 @@
 from flask import Blueprint, request, jsonify, render_template, session, redirect, url_for
-import pyodbc
 import logging
-from database import get_db_connection
+from datetime import datetime
+from database import get_db_connection, DatabaseError
+from json_provider import rows_response
+from config import HISTORY_PAGE_SIZE, HISTORY_CACHE_ROWS, HISTORY_CACHE_PATIENTS, HISTORY_CACHE_MAX_AGE
+import cache
 
 consultas_bp = Blueprint('consultas', __name__)
 
+# Edad en años cumplidos: diferencia de años menos uno si el cumpleaños de este año aún no llegó
+AGE_SQL = """(DATEDIFF(year, p.fecha_nacimiento, GETDATE())
+                    - CASE WHEN CAST(DATEADD(year, DATEDIFF(year, p.fecha_nacimiento, GETDATE()), p.fecha_nacimiento) AS DATE)
+                                > CAST(GETDATE() AS DATE) THEN 1 ELSE 0 END)"""
+
 # Página de login para consultas (solo cédula)
 @consultas_bp.route('/consultas/login', methods=['GET'])
 def consultas_login_page():
@@ -50,7 +58,7 @@ def consultas_login():
                 }), 200
             else:
                 return jsonify({'error': 'Cédula no encontrada o usuario inactivo'}), 401
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Error en base de datos: {str(e)}")
         return jsonify({'error': 'Error al procesar la solicitud'}), 500
     finally:
@@ -78,100 +86,177 @@ def get_pacientes_asignados():
 
     try:
         with conn.cursor() as cursor:
-            # Obtener todos los pacientes activos (sin filtrar por médico)
-            cursor.execute("""
+            # Obtener todos los pacientes activos (sin filtrar por médico); la edad se calcula en la consulta
+            cursor.execute(f"""
                 SELECT
                     p.id_paciente,
                     u.nombre_completo,
-                    p.fecha_nacimiento,
+                    {AGE_SQL} AS edad,
                     u.telefono,
-                    u.gmail,
+                    u.gmail AS correo,
                     u.cedula,
                     p.genero,
                     p.tipo_sangre
                 FROM Pacientes p
                 JOIN Usuarios u ON p.id_usuario = u.id_usuario
-                WHERE estado = 'A'
+                WHERE p.estado = 'A'
                 ORDER BY u.nombre_completo
             """)
-
-            pacientes = []
-            for row in cursor.fetchall():
-                # Calcular edad si hay fecha de nacimiento
-                edad = None
-                if row.fecha_nacimiento:
-                    from datetime import datetime
-                    today = datetime.today()
-                    birth_date = row.fecha_nacimiento
-                    edad = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-
-                paciente = {
-                    'id_paciente': row.id_paciente,
-                    'nombre_completo': row.nombre_completo,
-                    'edad': edad,
-                    'telefono': row.telefono,
-                    'correo': row.gmail,
-                    'cedula': row.cedula,
-                    'genero': row.genero,
-                    'tipo_sangre': row.tipo_sangre
-                }
-                pacientes.append(paciente)
-
-            return jsonify(pacientes)
-    except pyodbc.Error as e:
+            return rows_response(cursor)
+    except DatabaseError as e:
         logging.error(f"Error en base de datos: {str(e)}")
         return jsonify({'error': 'Error al obtener pacientes'}), 500
     finally:
         conn.close()
 
-# API para obtener historial médico de un paciente
-@consultas_bp.route('/api/consultas/pacientes/<int:id_paciente>/historial', methods=['GET'])
-def get_historial_paciente(id_paciente):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Sesión no válida'}), 401
+# --- Historial de citas por paciente ---
+# Paginado por clave (fecha, hora, id de la cita, del más reciente al más antiguo):
+# cada página es una búsqueda en IX_Citas_Paciente_Fecha, sin importar cuántas citas
+# tenga el paciente ni en qué página se esté. Las HISTORY_CACHE_ROWS citas más
+# recientes de cada paciente se guardan en memoria, así que abrir la ficha en
+# consulta no toca la base de datos; appointments.py invalida la entrada del
+# paciente cuando escribe una de sus citas.
+
+HISTORY_FIELDS = {
+    'id_cita': 'c.id_cita',
+    'fecha_cita': 'c.fecha_cita',
+    'hora_cita': 'c.hora_cita',
+    'motivo_consulta': 'c.motivo_consulta',
+    'estado': 'c.estado',
+    'nombre_medico': 'med_user.nombre_completo',
+}
+MAX_HISTORY_PAGE_SIZE = 100
+
+HISTORY_ORDER = "ORDER BY c.fecha_cita DESC, c.hora_cita DESC, c.id_cita DESC"
+# Citas anteriores a la última de la página previa
+HISTORY_BEFORE = "(c.fecha_cita < ? OR (c.fecha_cita = ? AND (c.hora_cita < ? OR (c.hora_cita = ? AND c.id_cita < ?))))"
 
-    # Obtener todas las citas del paciente (sin filtrar por médico específico)
+
+def _history_item(row, columns):
+    item = dict(zip(columns, row))
+    if 'fecha_cita' in item:
+        item['fecha_cita'] = item['fecha_cita'].strftime('%Y-%m-%d') if item['fecha_cita'] else None
+    if 'hora_cita' in item:
+        item['hora_cita'] = str(item['hora_cita']) if item['hora_cita'] else None
+    if 'nombre_medico' in item:
+        item['nombre_medico'] = item['nombre_medico'] or 'Sin asignar'
+    return item
+
+
+def _history_key(item):
+    # Cursor de paginación y clave de orden; los textos de fecha y hora ordenan igual que los valores
+    return (item['fecha_cita'] or '', item['hora_cita'] or '', item['id_cita'])
+
+
+def _parse_history_cursor(value):
+    """'AAAA-MM-DD|HH:MM:SS|id' -> (fecha, hora, id). Lanza ValueError si no es válido."""
+    fecha, hora, id_cita = value.split('|')
+    datetime.strptime(fecha, '%Y-%m-%d')
+    datetime.strptime(hora[:8], '%H:%M:%S')
+    return fecha, hora, int(id_cita)
+
+
+def _query_history(cursor, id_paciente, fields, limit, before=None):
+    """Hasta `limit` citas del paciente, solo con las columnas pedidas más las del cursor."""
+    columns = list(dict.fromkeys(['id_cita', 'fecha_cita', 'hora_cita'] + fields))
+    joins = ""
+    if 'nombre_medico' in columns:
+        joins = """
+            JOIN Medicos med ON c.id_medico = med.id_medico
+            JOIN Usuarios med_user ON med.id_usuario = med_user.id_usuario
+        """
+    where, params = "c.id_paciente = ?", [id_paciente]
+    if before:
+        fecha, hora, id_cita = before
+        where += f" AND {HISTORY_BEFORE}"
+        params += [fecha, fecha, hora, hora, id_cita]
+    cursor.execute(f"""
+        SELECT TOP {int(limit)} {', '.join(f'{HISTORY_FIELDS[c]} AS {c}' for c in columns)}
+        FROM Citas c {joins}
+        WHERE {where}
+        {HISTORY_ORDER}
+    """, params)
+    return [_history_item(row, columns) for row in cursor.fetchall()]
+
+
+def _load_recent_history(id_paciente):
+    """Citas más recientes del paciente con todos los campos, y si son todas las que tiene."""
     conn = get_db_connection()
     if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
-
+        return None
     try:
         with conn.cursor() as cursor:
-            # Obtener todas las citas del paciente
-            cursor.execute("""
-                SELECT
-                    c.id_cita,
-                    c.fecha_cita,
-                    c.hora_cita,
-                    c.motivo_consulta,
-                    c.estado,
-                    med_user.nombre_completo as nombre_medico
-                FROM Citas c
-                JOIN Medicos med ON c.id_medico = med.id_medico
-                JOIN Usuarios med_user ON med.id_usuario = med_user.id_usuario
-                WHERE c.id_paciente = ?
-                ORDER BY c.fecha_cita DESC, c.hora_cita DESC
-            """, (id_paciente,))
-
-            historial = []
-            for row in cursor.fetchall():
-                cita = {
-                    'id_cita': row[0],
-                    'fecha_cita': row[1].strftime('%Y-%m-%d') if row[1] else None,
-                    'hora_cita': str(row[2]) if row[2] else None,
-                    'motivo_consulta': row[3],
-                    'estado': row[4],
-                    'nombre_medico': row[5] or 'Sin asignar'
-                }
-                historial.append(cita)
-
-            return jsonify(historial)
-    except pyodbc.Error as e:
-        logging.error(f"Error en base de datos: {str(e)}")
-        return jsonify({'error': 'Error al obtener historial médico'}), 500
+            items = _query_history(cursor, id_paciente, list(HISTORY_FIELDS), HISTORY_CACHE_ROWS + 1)
+            return items[:HISTORY_CACHE_ROWS], len(items) <= HISTORY_CACHE_ROWS
+    except DatabaseError as e:
+        logging.error(f"Error al cargar el historial del paciente {id_paciente}: {str(e)}")
+        return None
     finally:
         conn.close()
 
+
+recent_history = cache.VersionedCache('historial_pacientes', _load_recent_history,
+                                      max_age=HISTORY_CACHE_MAX_AGE, max_entries=HISTORY_CACHE_PATIENTS)
+
+
+def _history_page_from_cache(id_paciente, limit, before):
+    """Página servida desde la caché, o None si se sale de las citas guardadas."""
+    cached = recent_history.get(id_paciente)
+    if cached is None:
+        return None
+    items, complete = cached
+    start = 0
+    if before:
+        start = next((i for i, item in enumerate(items) if _history_key(item) < before), len(items))
+    page = items[start:start + limit + 1]
+    if len(page) <= limit and not complete:
+        # La página llega al final de lo guardado y el paciente tiene más citas: se lee de la base de datos
+        return None
+    return page
+
+
+# API para obtener historial médico de un paciente
+# ?limit=20&before=<cursor>&fields=fecha_cita,estado,... ; la cabecera X-Next-Cursor trae
+# el cursor de la página siguiente cuando hay más citas
+@consultas_bp.route('/api/consultas/pacientes/<int:id_paciente>/historial', methods=['GET'])
+def get_historial_paciente(id_paciente):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Sesión no válida'}), 401
+
+    try:
+        limit = max(1, min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), MAX_HISTORY_PAGE_SIZE))
+        before = _parse_history_cursor(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
+    fields = list(HISTORY_FIELDS)
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        invalid = [field for field in fields if field not in HISTORY_FIELDS]
+        if invalid:
+            return jsonify({'error': 'Campos no válidos', 'campos_invalidos': invalid}), 400
+
+    page = _history_page_from_cache(id_paciente, limit, before)
+    if page is None:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Error de conexión a la base de datos'}), 500
+        try:
+            with conn.cursor() as cursor:
+                # Una fila de más para saber si hay página siguiente
+                page = _query_history(cursor, id_paciente, fields, limit + 1, before)
+        except DatabaseError as e:
+            logging.error(f"Error en base de datos: {str(e)}")
+            return jsonify({'error': 'Error al obtener historial médico'}), 500
+        finally:
+            conn.close()
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    response = jsonify([{field: item[field] for field in fields} for item in page])
+    if has_more:
+        response.headers['X-Next-Cursor'] = '|'.join(str(part) for part in _history_key(page[-1]))
+    return response
+
 # API para obtener información del usuario actual
 @consultas_bp.route('/api/consultas/user-info', methods=['GET'])
 def get_user_info():
@@ -1,16 +1,434 @@
 from flask import Blueprint, jsonify, session, request
-import pyodbc
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from database import get_db_connection
+import os
+import time
+from database import get_db_connection, DatabaseError
 from datetime import datetime, timedelta
 from auth_middleware import login_required, role_required
+from query_budget import query_budget, propagate
+import date_ranges
+import activity
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Número de hilos para calcular los widgets del bootstrap en paralelo.
+# pyodbc declara threadsafety = 1 (las conexiones no se comparten entre hilos),
+# así que el modo paralelo abre una conexión por hilo; con 1 (por defecto) todos
+# los widgets se calculan de forma secuencial sobre una única conexión.
+BOOTSTRAP_WORKERS = int(os.getenv('DASHBOARD_BOOTSTRAP_WORKERS', '1'))
+_bootstrap_executor = None
+
+# --- Consultas de los widgets del dashboard ---
+# Cada función recibe un cursor abierto y devuelve los datos ya serializables,
+# para que los endpoints individuales y el bootstrap compartan la misma lógica.
+
+def fetch_admin_stats(cursor):
+    stats = {}
+
+    # Obtener conteo de médicos activos
+    cursor.execute("SELECT COUNT(*) FROM Medicos WHERE estado = 'A'")
+    stats['doctors'] = cursor.fetchone()[0]
+
+    # Obtener conteo de pacientes activos
+    cursor.execute("SELECT COUNT(*) FROM Pacientes WHERE estado = 'A'")
+    stats['patients'] = cursor.fetchone()[0]
+
+    # Obtener citas para hoy
+    cursor.execute(f"""
+        SELECT COUNT(*) 
+        FROM Citas 
+        WHERE {date_ranges.today('fecha_cita')}
+        AND estado != 'Cancelada'
+    """)
+    stats['appointments'] = cursor.fetchone()[0]
+
+    # Obtener conteo de usuarios activos
+    cursor.execute("SELECT COUNT(*) FROM Usuarios WHERE activo = 1")
+    stats['users'] = cursor.fetchone()[0]
+
+    # Obtener conteo de citas pendientes
+    cursor.execute("SELECT COUNT(*) FROM Citas WHERE estado = 'pendiente'")
+    stats['pending_appointments'] = cursor.fetchone()[0]
+
+    # Obtener conteo de citas completadas esta semana
+    cursor.execute(f"""
+        SELECT COUNT(*) 
+        FROM Citas 
+        WHERE estado = 'completada' 
+        AND {date_ranges.last_days('fecha_cita', 7)}
+    """)
+    stats['weekly_completed'] = cursor.fetchone()[0]
+
+    return stats
+
+def fetch_appointments_chart(cursor, start_date, end_date):
+    date_filter, params = date_ranges.between('fecha_cita', start_date, end_date)
+    query = f"""
+        SELECT 
+            fecha_cita as dia, 
+            COUNT(id_cita) as total
+        FROM Citas
+        WHERE {date_filter}
+        GROUP BY fecha_cita
+        ORDER BY dia;
+    """
+
+    cursor.execute(query, params)
+    data = cursor.fetchall()
+
+    # Prepare the data for the chart, ensuring all days in the range are present
+    delta = end_date - start_date
+    labels = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(delta.days + 1)]
+    counts = {label: 0 for label in labels}
+
+    for row in data:
+        day_str = row.dia.strftime('%Y-%m-%d')
+        if day_str in counts:
+            counts[day_str] = row.total
+
+    return {'labels': list(counts.keys()), 'data': list(counts.values())}
+
+def fetch_appointments_status_chart(cursor):
+    cursor.execute("""
+        SELECT 
+            estado, 
+            COUNT(id_cita) as total
+        FROM Citas
+        WHERE estado IS NOT NULL
+        GROUP BY estado;
+    """)
+
+    data = cursor.fetchall()
+
+    labels = [row.estado.capitalize() for row in data]
+    counts = [row.total for row in data]
+
+    return {'labels': labels, 'data': counts}
+
+def fetch_recent_activity(cursor, since=None, limit=activity.FEED_LIMIT):
+    # Una sola lectura del registro de actividad (ver activity.py)
+    return activity.fetch_feed(cursor, since=since, limit=limit)
+
+def fetch_doctor_stats(cursor, doctor_id):
+    stats = {}
+
+    # Obtener citas de hoy para este médico
+    cursor.execute(f"""
+        SELECT COUNT(*) 
+        FROM Citas 
+        WHERE id_medico = ? 
+        AND {date_ranges.today('fecha_cita')}
+        AND estado != 'cancelada'
+    """, (doctor_id,))
+    stats['today_appointments'] = cursor.fetchone()[0]
+
+    # Obtener citas pendientes para este médico
+    cursor.execute("""
+        SELECT COUNT(*) 
+        FROM Citas 
+        WHERE id_medico = ? 
+        AND estado = 'pendiente'
+    """, (doctor_id,))
+    stats['pending_appointments'] = cursor.fetchone()[0]
+
+    # Obtener citas completadas esta semana
+    cursor.execute(f"""
+        SELECT COUNT(*) 
+        FROM Citas 
+        WHERE id_medico = ? 
+        AND estado = 'completada' 
+        AND {date_ranges.last_days('fecha_cita', 7)}
+    """, (doctor_id,))
+    stats['weekly_completed'] = cursor.fetchone()[0]
+
+    # Obtener próximo turno
+    cursor.execute(f"""
+        SELECT TOP 1 tipo_turno, fecha, hora_inicio, hora_fin
+        FROM Turnos 
+        WHERE id_medico = ? 
+        AND {date_ranges.from_today('fecha')}
+        ORDER BY fecha, hora_inicio
+    """, (doctor_id,))
+    next_shift = cursor.fetchone()
+    if next_shift:
+        stats['next_shift'] = {
+            'type': next_shift[0],
+            'date': str(next_shift[1]),
+            'start_time': str(next_shift[2]),
+            'end_time': str(next_shift[3])
+        }
+
+    return stats
+
+def fetch_reception_stats(cursor):
+    stats = {}
+
+    # Obtener citas para hoy
+    cursor.execute(f"""
+        SELECT COUNT(*) 
+        FROM Citas 
+        WHERE {date_ranges.today('fecha_cita')}
+        AND estado != 'cancelada'
+    """)
+    stats['today_appointments'] = cursor.fetchone()[0]
+
+    # Obtener citas pendientes
+    cursor.execute("SELECT COUNT(*) FROM Citas WHERE estado = 'pendiente'")
+    stats['pending_appointments'] = cursor.fetchone()[0]
+
+    # Obtener nuevos pacientes esta semana
+    cursor.execute(f"""
+        SELECT COUNT(*) 
+        FROM Pacientes 
+        WHERE {date_ranges.last_days('fecha_creacion', 7)}
+        AND estado = 'A'
+    """)
+    stats['weekly_new_patients'] = cursor.fetchone()[0]
+
+    # Obtener citas por confirmar
+    cursor.execute(f"""
+        SELECT COUNT(*)
+        FROM Citas 
+        WHERE estado = 'pendiente' 
+        AND {date_ranges.today('fecha_cita')}
+    """)
+    stats['to_confirm'] = cursor.fetchone()[0]
+
+    return stats
+
+def fetch_upcoming_appointments(cursor, user_type, user_id):
+    if user_type == 'medico':
+        # Para médicos: obtener sus próximas citas
+        cursor.execute(f"""
+            SELECT TOP 10 c.id_cita, c.fecha_cita, c.hora_cita, c.estado,
+                   u.nombre_completo as paciente_nombre, c.motivo_consulta
+            FROM Citas c
+            JOIN Pacientes p ON c.id_paciente = p.id_paciente
+            JOIN Usuarios u ON p.id_usuario = u.id_usuario
+            JOIN Medicos m ON c.id_medico = m.id_medico
+            WHERE m.id_usuario = ?
+            AND c.estado IN ('pendiente', 'confirmada') 
+            AND {date_ranges.from_today('c.fecha_cita')}
+            ORDER BY c.fecha_cita, c.hora_cita
+        """, (user_id,))
+
+    elif user_type == 'paciente':
+        # Para pacientes: obtener sus próximas citas
+        cursor.execute(f"""
+            SELECT TOP 5 c.id_cita, c.fecha_cita, c.hora_cita, c.estado,
+                   u.nombre_completo as medico_nombre, c.motivo_consulta
+            FROM Citas c
+            JOIN Medicos m ON c.id_medico = m.id_medico
+            JOIN Usuarios u ON m.id_usuario = u.id_usuario
+            JOIN Pacientes p ON c.id_paciente = p.id_paciente
+            WHERE p.id_usuario = ?
+            AND {date_ranges.from_today('c.fecha_cita')}
+            ORDER BY c.fecha_cita, c.hora_cita
+        """, (user_id,))
+
+    else:
+        # Para admin/recepción: obtener todas las próximas citas
+        cursor.execute(f"""
+            SELECT TOP 10 c.id_cita, c.fecha_cita, c.hora_cita, c.estado,
+                   up.nombre_completo as paciente_nombre,
+                   um.nombre_completo as medico_nombre,
+                   c.motivo_consulta
+            FROM Citas c
+            JOIN Pacientes p ON c.id_paciente = p.id_paciente
+            JOIN Usuarios up ON p.id_usuario = up.id_usuario
+            JOIN Medicos m ON c.id_medico = m.id_medico
+            JOIN Usuarios um ON m.id_usuario = um.id_usuario
+            WHERE {date_ranges.from_today('c.fecha_cita')}
+            ORDER BY c.fecha_cita, c.hora_cita
+        """)
+
+    appointments = []
+    for row in cursor.fetchall():
+        appointment = {
+            'id': row[0],
+            'date': str(row[1]),
+            'time': str(row[2]),
+            'status': row[3],
+            'reason': row[4] if len(row) > 4 else ''
+        }
+
+        if user_type == 'medico':
+            appointment['patient_name'] = row[4]
+            appointment['reason'] = row[5] if len(row) > 5 else ''
+        elif user_type == 'paciente':
+            appointment['doctor_name'] = row[4]
+            appointment['reason'] = row[5] if len(row) > 5 else ''
+        else:
+            appointment['patient_name'] = row[4]
+            appointment['doctor_name'] = row[5]
+            appointment['reason'] = row[6] if len(row) > 6 else ''
+
+        appointments.append(appointment)
+
+    return appointments
+
+def fetch_user_profile(cursor, current_user):
+    """Devuelve el perfil del usuario actual o None si ya no existe en la base de datos."""
+    # La mayoría de los datos ya están en 'current_user'.
+    # Solo necesitamos obtener los datos de contacto que no están en el objeto.
+    cursor.execute("SELECT cedula, gmail, telefono FROM Usuarios WHERE id_usuario = ?", (current_user.get('id_usuario'),))
+    contact_info = cursor.fetchone()
+
+    if not contact_info:
+        return None
+
+    user_profile = {
+        'nombre': current_user.get('nombre_completo'),
+        'rol': current_user.get('nombre_rol'),
+        'tipo_usuario': current_user.get('tipo_usuario'),
+        'cedula': contact_info[0],
+        'email': contact_info[1],
+        'telefono': contact_info[2]
+    }
+
+    # Si es médico, agregar información específica del médico
+    if user_profile['tipo_usuario'] == 'medico' and current_user.get('id_medico'):
+        cursor.execute("SELECT especialidad, numero_colegiado, años_experiencia FROM Medicos WHERE id_medico = ?", (current_user['id_medico'],))
+        medico_info = cursor.fetchone()
+        if medico_info:
+            user_profile.update({
+                'especialidad': medico_info[0],
+                'numero_colegiado': medico_info[1],
+                'años_experiencia': medico_info[2]
+            })
+
+    return user_profile
+
+# --- Bootstrap: todos los widgets del primer render en una sola petición ---
+
+def _timed_widget(cursor, widget):
+    start = time.perf_counter()
+    try:
+        return widget(cursor), None, (time.perf_counter() - start) * 1000
+    except DatabaseError as e:
+        return None, str(e), (time.perf_counter() - start) * 1000
+
+def _run_widget_on_own_connection(widget):
+    conn = get_db_connection()
+    if not conn:
+        return None, 'Database connection failed', 0.0
+    try:
+        with conn.cursor() as cursor:
+            return _timed_widget(cursor, widget)
+    finally:
+        conn.close()
+
+def run_dashboard_widgets(widgets):
+    """
+    Ejecuta los widgets {nombre: función(cursor)} y devuelve el payload del bootstrap
+    con los datos, el tiempo de cada widget en milisegundos y los errores parciales.
+    """
+    global _bootstrap_executor
+    started = time.perf_counter()
+    results = {}
+
+    if BOOTSTRAP_WORKERS > 1 and len(widgets) > 1:
+        if _bootstrap_executor is None:
+            _bootstrap_executor = ThreadPoolExecutor(max_workers=BOOTSTRAP_WORKERS,
+                                                     thread_name_prefix='dashboard-bootstrap')
+        futures = {name: _bootstrap_executor.submit(propagate(_run_widget_on_own_connection), widget)
+                   for name, widget in widgets.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    else:
+        conn = get_db_connection()
+        if not conn:
+            return None
+        try:
+            with conn.cursor() as cursor:
+                for name, widget in widgets.items():
+                    results[name] = _timed_widget(cursor, widget)
+        finally:
+            conn.close()
+
+    payload = {
+        'widgets': {name: result[0] for name, result in results.items()},
+        'timings_ms': {name: round(result[2], 2) for name, result in results.items()},
+        'total_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+    errors = {name: result[1] for name, result in results.items() if result[1]}
+    if errors:
+        for name, error in errors.items():
+            logging.error(f"Database error in dashboard widget {name}: {error}")
+        payload['errors'] = {name: 'Failed to fetch widget' for name in errors}
+    return payload
+
+def _bootstrap_connections(widget_count):
+    """Conexiones que usa un bootstrap: una por widget si corre en paralelo."""
+    return widget_count if BOOTSTRAP_WORKERS > 1 else 1
+
+def _bootstrap_response(widgets):
+    payload = run_dashboard_widgets(widgets)
+    if payload is None:
+        return jsonify({'error': 'Database connection failed'}), 500
+    return jsonify(payload)
+
+@dashboard_bp.route('/api/admin/bootstrap', methods=['GET'])
+@login_required
+@role_required(1) # Solo Admin
+@query_budget(round_trips=11, connections=_bootstrap_connections(6))
+def admin_bootstrap(current_user):
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=6)
+    return _bootstrap_response({
+        'user': lambda cursor: fetch_user_profile(cursor, current_user),
+        'stats': fetch_admin_stats,
+        'upcoming_appointments': lambda cursor: fetch_upcoming_appointments(
+            cursor, current_user.get('tipo_usuario'), current_user.get('id_usuario')),
+        'recent_activity': fetch_recent_activity,
+        'appointments_chart': lambda cursor: fetch_appointments_chart(cursor, start_date, end_date),
+        'status_chart': fetch_appointments_status_chart
+    })
+
+@dashboard_bp.route('/api/doctor/bootstrap', methods=['GET'])
+@login_required
+@role_required(2) # Solo Médico
+@query_budget(round_trips=7, connections=_bootstrap_connections(3))
+def doctor_bootstrap(current_user):
+    doctor_id = current_user.get('id_medico')
+    if not doctor_id:
+        return jsonify({'error': 'Perfil de médico no encontrado para este usuario.'}), 404
+
+    return _bootstrap_response({
+        'user': lambda cursor: fetch_user_profile(cursor, current_user),
+        'stats': lambda cursor: fetch_doctor_stats(cursor, doctor_id),
+        'upcoming_appointments': lambda cursor: fetch_upcoming_appointments(
+            cursor, current_user.get('tipo_usuario'), current_user.get('id_usuario'))
+    })
+
+@dashboard_bp.route('/api/reception/bootstrap', methods=['GET'])
+@login_required
+@role_required(1, 3) # Admin y Recepcionista
+@query_budget(round_trips=6, connections=_bootstrap_connections(3))
+def reception_bootstrap(current_user):
+    return _bootstrap_response({
+        'user': lambda cursor: fetch_user_profile(cursor, current_user),
+        'stats': fetch_reception_stats,
+        'upcoming_appointments': lambda cursor: fetch_upcoming_appointments(
+            cursor, current_user.get('tipo_usuario'), current_user.get('id_usuario'))
+    })
+
+@dashboard_bp.route('/api/patient/bootstrap', methods=['GET'])
+@login_required
+@role_required(4) # Solo Paciente
+@query_budget(round_trips=2, connections=_bootstrap_connections(2))
+def patient_bootstrap(current_user):
+    return _bootstrap_response({
+        'user': lambda cursor: fetch_user_profile(cursor, current_user),
+        'upcoming_appointments': lambda cursor: fetch_upcoming_appointments(
+            cursor, current_user.get('tipo_usuario'), current_user.get('id_usuario'))
+    })
+
 # API para obtener datos del dashboard de administrador
 @dashboard_bp.route('/api/admin/stats', methods=['GET'])
 @login_required
 @role_required(1) # Solo Admin
+@query_budget(round_trips=6)
 def admin_stats(current_user):
     conn = get_db_connection()
     if not conn:
@@ -19,45 +437,8 @@ def admin_stats(current_user):
     cursor = None
     try:
         cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Obtener conteo de médicos activos
-        cursor.execute("SELECT COUNT(*) FROM Medicos WHERE estado = 'A'")
-        stats['doctors'] = cursor.fetchone()[0]
-        
-        # Obtener conteo de pacientes activos
-        cursor.execute("SELECT COUNT(*) FROM Pacientes WHERE estado = 'A'")
-        stats['patients'] = cursor.fetchone()[0]
-        
-        # Obtener citas para hoy
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Citas 
-            WHERE CONVERT(date, fecha_cita) = CONVERT(date, GETDATE())
-            AND estado != 'Cancelada'
-        """)
-        stats['appointments'] = cursor.fetchone()[0]
-        
-        # Obtener conteo de usuarios activos
-        cursor.execute("SELECT COUNT(*) FROM Usuarios WHERE activo = 1")
-        stats['users'] = cursor.fetchone()[0]
-        
-        # Obtener conteo de citas pendientes
-        cursor.execute("SELECT COUNT(*) FROM Citas WHERE estado = 'pendiente'")
-        stats['pending_appointments'] = cursor.fetchone()[0]
-        
-        # Obtener conteo de citas completadas esta semana
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Citas 
-            WHERE estado = 'completada' 
-            AND fecha_cita >= DATEADD(day, -7, GETDATE())
-        """)
-        stats['weekly_completed'] = cursor.fetchone()[0]
-        
-        return jsonify(stats)
-    except pyodbc.Error as e:
+        return jsonify(fetch_admin_stats(cursor))
+    except DatabaseError as e:
         logging.error(f"Database error in admin_stats: {str(e)}")
         return jsonify({'error': 'Failed to fetch stats'}), 500
     finally:
@@ -68,7 +449,22 @@ def admin_stats(current_user):
 @dashboard_bp.route('/api/admin/appointments-chart', methods=['GET'])
 @login_required
 @role_required(1) # Solo Admin
+@query_budget(round_trips=1)
 def appointments_chart_data(current_user):
+    start_date_str = request.args.get('start_date')
+    end_date_str = request.args.get('end_date')
+
+    # Default to last 7 days if no dates are provided
+    if not start_date_str or not end_date_str:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=6)
+    else:
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}), 400
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -76,49 +472,8 @@ def appointments_chart_data(current_user):
     cursor = None
     try:
         cursor = conn.cursor()
-        
-        start_date_str = request.args.get('start_date')
-        end_date_str = request.args.get('end_date')
-
-        # Default to last 7 days if no dates are provided
-        if not start_date_str or not end_date_str:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=6)
-        else:
-            try:
-                start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-                end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            except ValueError:
-                return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}), 400
-
-        # Build the query
-        query = """
-            SELECT 
-                CAST(fecha_cita AS DATE) as dia, 
-                COUNT(id_cita) as total
-            FROM Citas
-            WHERE fecha_cita >= ? AND fecha_cita <= ?
-            GROUP BY CAST(fecha_cita AS DATE)
-            ORDER BY dia;
-        """
-        params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-        
-        cursor.execute(query, params)
-        data = cursor.fetchall()
-        
-        # Prepare the data for the chart, ensuring all days in the range are present
-        delta = end_date - start_date
-        labels = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(delta.days + 1)]
-        counts = {label: 0 for label in labels}
-        
-        for row in data:
-            day_str = row.dia.strftime('%Y-%m-%d')
-            if day_str in counts:
-                counts[day_str] = row.total
-        
-        return jsonify({'labels': list(counts.keys()), 'data': list(counts.values())})
-        
-    except pyodbc.Error as e:
+        return jsonify(fetch_appointments_chart(cursor, start_date, end_date))
+    except DatabaseError as e:
         logging.error(f"Database error in appointments_chart_data: {str(e)}")
         return jsonify({'error': 'Failed to fetch chart data'}), 500
     finally:
@@ -129,6 +484,7 @@ def appointments_chart_data(current_user):
 @dashboard_bp.route('/api/admin/appointments-status-chart', methods=['GET'])
 @login_required
 @role_required(1) # Solo Admin
+@query_budget(round_trips=1)
 def appointments_status_chart_data(current_user):
     conn = get_db_connection()
     if not conn:
@@ -137,24 +493,8 @@ def appointments_status_chart_data(current_user):
     cursor = None
     try:
         cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                estado, 
-                COUNT(id_cita) as total
-            FROM Citas
-            WHERE estado IS NOT NULL
-            GROUP BY estado;
-        """)
-        
-        data = cursor.fetchall()
-        
-        labels = [row.estado.capitalize() for row in data]
-        counts = [row.total for row in data]
-        
-        return jsonify({'labels': labels, 'data': counts})
-        
-    except pyodbc.Error as e:
+        return jsonify(fetch_appointments_status_chart(cursor))
+    except DatabaseError as e:
         logging.error(f"Database error in appointments_status_chart_data: {str(e)}")
         return jsonify({'error': 'Failed to fetch chart data'}), 500
     finally:
@@ -165,7 +505,15 @@ def appointments_status_chart_data(current_user):
 @dashboard_bp.route('/api/admin/recent-activity', methods=['GET'])
 @login_required
 @role_required(1) # Solo Admin
+@query_budget(round_trips=1)
 def recent_activity(current_user):
+    # Cursor opcional: solo los eventos posteriores (polling o EventSource con Last-Event-ID)
+    try:
+        since = activity.parse_cursor(request.args.get('since', request.headers.get('Last-Event-ID')))
+        limit = int(request.args.get('limit', activity.FEED_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -173,67 +521,14 @@ def recent_activity(current_user):
     cursor = None
     try:
         cursor = conn.cursor()
-        
-        # Obtener últimos 5 médicos registrados
-        cursor.execute("""
-            SELECT TOP 5 m.id_medico, u.nombre_completo, m.especialidad, 
-                   CONVERT(varchar, m.fecha_creacion, 120) as fecha
-            FROM Medicos m
-            JOIN Usuarios u ON m.id_usuario = u.id_usuario
-            WHERE m.estado = 'A'
-            ORDER BY m.fecha_creacion DESC
-        """)
-        doctors = [{
-            'id': row[0],
-            'name': row[1],
-            'type': 'Médico',
-            'specialty': row[2] or 'No Asignada',
-            'date': row[3]
-        } for row in cursor.fetchall()]
-        
-        # Obtener últimos 5 pacientes registrados
-        cursor.execute("""
-            SELECT TOP 5 p.id_paciente, u.nombre_completo, 
-                   CONVERT(varchar, p.fecha_creacion, 120) as fecha
-            FROM Pacientes p
-            JOIN Usuarios u ON p.id_usuario = u.id_usuario
-            WHERE p.estado = 'A'
-            ORDER BY p.fecha_creacion DESC
-        """)
-        patients = [{
-            'id': row[0],
-            'name': row[1],
-            'type': 'Paciente',
-            'date': row[2]
-        } for row in cursor.fetchall()]
-        
-        # Obtener últimas 5 citas programadas
-        cursor.execute("""
-            SELECT TOP 5 c.id_cita, up.nombre_completo, um.nombre_completo,
-                   CONVERT(varchar, c.fecha_cita, 120) + ' ' + CONVERT(varchar, c.hora_cita, 108) as fecha,
-                   c.estado
-            FROM Citas c
-            JOIN Pacientes p ON c.id_paciente = p.id_paciente
-            JOIN Usuarios up ON p.id_usuario = up.id_usuario
-            JOIN Medicos m ON c.id_medico = m.id_medico
-            JOIN Usuarios um ON m.id_usuario = um.id_usuario
-            ORDER BY c.fecha_creacion DESC
-        """)
-        appointments = [{
-            'id': row[0],
-            'name': f"Cita {row[0]}",
-            'type': 'Cita',
-            'details': f"Paciente: {row[1]}, Médico: {row[2]}",
-            'status': row[4],
-            'date': row[3]
-        } for row in cursor.fetchall()]
-        
-        # Combinar todos los resultados y ordenar por fecha
-        recent_activity = doctors + patients + appointments
-        recent_activity.sort(key=lambda x: x['date'], reverse=True)
-        
-        return jsonify(recent_activity[:10])  # Devolver solo los 10 más recientes
-    except pyodbc.Error as e:
+        events = fetch_recent_activity(cursor, since=since, limit=limit)
+        response = jsonify(events)
+        # Último evento visto; si no hay nuevos se devuelve el mismo cursor recibido
+        cursor_id = events[0]['event_id'] if events else since
+        if cursor_id is not None:
+            response.headers['X-Activity-Cursor'] = str(cursor_id)
+        return response
+    except DatabaseError as e:
         logging.error(f"Database error in recent_activity: {str(e)}")
         return jsonify({'error': 'Failed to fetch recent activity'}), 500
     finally:
@@ -244,6 +539,7 @@ def recent_activity(current_user):
 @dashboard_bp.route('/api/doctor/stats', methods=['GET'])
 @login_required
 @role_required(2) # Solo Médico
+@query_budget(round_trips=4)
 def doctor_stats(current_user):
     doctor_id = current_user.get('id_medico')
     if not doctor_id:
@@ -257,57 +553,8 @@ def doctor_stats(current_user):
     cursor = None
     try:
         cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Obtener citas de hoy para este médico
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Citas 
-            WHERE id_medico = ? 
-            AND CONVERT(date, fecha_cita) = CONVERT(date, GETDATE())
-            AND estado != 'cancelada'
-        """, (doctor_id,))
-        stats['today_appointments'] = cursor.fetchone()[0]
-        
-        # Obtener citas pendientes para este médico
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Citas 
-            WHERE id_medico = ? 
-            AND estado = 'pendiente'
-        """, (doctor_id,))
-        stats['pending_appointments'] = cursor.fetchone()[0]
-        
-        # Obtener citas completadas esta semana
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Citas 
-            WHERE id_medico = ? 
-            AND estado = 'completada' 
-            AND fecha_cita >= DATEADD(day, -7, GETDATE())
-        """, (doctor_id,))
-        stats['weekly_completed'] = cursor.fetchone()[0]
-        
-        # Obtener próximo turno
-        cursor.execute("""
-            SELECT TOP 1 tipo_turno, fecha, hora_inicio, hora_fin
-            FROM Turnos 
-            WHERE id_medico = ? 
-            AND fecha >= CONVERT(date, GETDATE())
-            ORDER BY fecha, hora_inicio
-        """, (doctor_id,))
-        next_shift = cursor.fetchone()
-        if next_shift:
-            stats['next_shift'] = {
-                'type': next_shift[0],
-                'date': str(next_shift[1]),
-                'start_time': str(next_shift[2]),
-                'end_time': str(next_shift[3])
-            }
-        
-        return jsonify(stats)
-    except pyodbc.Error as e:
+        return jsonify(fetch_doctor_stats(cursor, doctor_id))
+    except DatabaseError as e:
         logging.error(f"Database error in doctor_stats: {str(e)}")
         return jsonify({'error': 'Failed to fetch doctor stats'}), 500
     finally:
@@ -318,6 +565,7 @@ def doctor_stats(current_user):
 @dashboard_bp.route('/api/reception/stats', methods=['GET'])
 @login_required
 @role_required(1, 3) # Admin y Recepcionista
+@query_budget(round_trips=4)
 def reception_stats(current_user):
     conn = get_db_connection()
     if not conn:
@@ -326,42 +574,8 @@ def reception_stats(current_user):
     cursor = None
     try:
         cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Obtener citas para hoy
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Citas 
-            WHERE CONVERT(date, fecha_cita) = CONVERT(date, GETDATE())
-            AND estado != 'cancelada'
-        """)
-        stats['today_appointments'] = cursor.fetchone()[0]
-        
-        # Obtener citas pendientes
-        cursor.execute("SELECT COUNT(*) FROM Citas WHERE estado = 'pendiente'")
-        stats['pending_appointments'] = cursor.fetchone()[0]
-        
-        # Obtener nuevos pacientes esta semana
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Pacientes 
-            WHERE fecha_creacion >= DATEADD(day, -7, GETDATE())
-            AND estado = 'A'
-        """)
-        stats['weekly_new_patients'] = cursor.fetchone()[0]
-        
-        # Obtener citas por confirmar
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM Citas 
-            WHERE estado = 'pendiente' 
-            AND fecha_cita = CONVERT(date, GETDATE())
-        """)
-        stats['to_confirm'] = cursor.fetchone()[0]
-        
-        return jsonify(stats)
-    except pyodbc.Error as e:
+        return jsonify(fetch_reception_stats(cursor))
+    except DatabaseError as e:
         logging.error(f"Database error in reception_stats: {str(e)}")
         return jsonify({'error': 'Failed to fetch reception stats'}), 500
     finally:
@@ -371,6 +585,7 @@ def reception_stats(current_user):
 # API para obtener próximas citas
 @dashboard_bp.route('/api/upcoming-appointments', methods=['GET'])
 @login_required
+@query_budget(round_trips=1)
 def upcoming_appointments(current_user):
     user_type = current_user.get('tipo_usuario')
     user_id = current_user.get('id_usuario')
@@ -382,77 +597,8 @@ def upcoming_appointments(current_user):
     cursor = None
     try:
         cursor = conn.cursor()
-        
-        if user_type == 'medico':
-            # Para médicos: obtener sus próximas citas
-            cursor.execute("""
-                SELECT TOP 10 c.id_cita, c.fecha_cita, c.hora_cita, c.estado,
-                       u.nombre_completo as paciente_nombre, c.motivo_consulta
-                FROM Citas c
-                JOIN Pacientes p ON c.id_paciente = p.id_paciente
-                JOIN Usuarios u ON p.id_usuario = u.id_usuario
-                JOIN Medicos m ON c.id_medico = m.id_medico
-                WHERE m.id_usuario = ?
-                AND c.estado IN ('pendiente', 'confirmada') 
-                AND c.fecha_cita >= CONVERT(date, GETDATE())
-                ORDER BY c.fecha_cita, c.hora_cita
-            """, (user_id,))
-            
-        elif user_type == 'paciente':
-            # Para pacientes: obtener sus próximas citas
-            cursor.execute("""
-                SELECT TOP 5 c.id_cita, c.fecha_cita, c.hora_cita, c.estado,
-                       u.nombre_completo as medico_nombre, c.motivo_consulta
-                FROM Citas c
-                JOIN Medicos m ON c.id_medico = m.id_medico
-                JOIN Usuarios u ON m.id_usuario = u.id_usuario
-                JOIN Pacientes p ON c.id_paciente = p.id_paciente
-                WHERE p.id_usuario = ?
-                AND c.fecha_cita >= CONVERT(date, GETDATE())
-                ORDER BY c.fecha_cita, c.hora_cita
-            """, (user_id,))
-            
-        else:
-            # Para admin/recepción: obtener todas las próximas citas
-            cursor.execute("""
-                SELECT TOP 10 c.id_cita, c.fecha_cita, c.hora_cita, c.estado,
-                       up.nombre_completo as paciente_nombre,
-                       um.nombre_completo as medico_nombre,
-                       c.motivo_consulta
-                FROM Citas c
-                JOIN Pacientes p ON c.id_paciente = p.id_paciente
-                JOIN Usuarios up ON p.id_usuario = up.id_usuario
-                JOIN Medicos m ON c.id_medico = m.id_medico
-                JOIN Usuarios um ON m.id_usuario = um.id_usuario
-                WHERE c.fecha_cita >= CONVERT(date, GETDATE())
-                ORDER BY c.fecha_cita, c.hora_cita
-            """)
-        
-        appointments = []
-        for row in cursor.fetchall():
-            appointment = {
-                'id': row[0],
-                'date': str(row[1]),
-                'time': str(row[2]),
-                'status': row[3],
-                'reason': row[4] if len(row) > 4 else ''
-            }
-            
-            if user_type == 'medico':
-                appointment['patient_name'] = row[4]
-                appointment['reason'] = row[5] if len(row) > 5 else ''
-            elif user_type == 'paciente':
-                appointment['doctor_name'] = row[4]
-                appointment['reason'] = row[5] if len(row) > 5 else ''
-            else:
-                appointment['patient_name'] = row[4]
-                appointment['doctor_name'] = row[5]
-                appointment['reason'] = row[6] if len(row) > 6 else ''
-                
-            appointments.append(appointment)
-        
-        return jsonify(appointments)
-    except pyodbc.Error as e:
+        return jsonify(fetch_upcoming_appointments(cursor, user_type, user_id))
+    except DatabaseError as e:
         logging.error(f"Database error in upcoming_appointments: {str(e)}")
         return jsonify({'error': 'Failed to fetch upcoming appointments'}), 500
     finally:
@@ -462,9 +608,8 @@ def upcoming_appointments(current_user):
 # API para obtener datos del usuario actual
 @dashboard_bp.route('/api/user-data', methods=['GET'])
 @login_required
+@query_budget(round_trips=2)
 def user_data(current_user):
-    user_id = current_user.get('id_usuario')
-
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -472,40 +617,16 @@ def user_data(current_user):
     cursor = None
     try:
         cursor = conn.cursor()
-        
-        # La mayoría de los datos ya están en 'current_user'.
-        # Solo necesitamos obtener los datos de contacto que no están en el objeto.
-        cursor.execute("SELECT cedula, gmail, telefono FROM Usuarios WHERE id_usuario = ?", (user_id,))
-        contact_info = cursor.fetchone()
+        user_profile = fetch_user_profile(cursor, current_user)
 
-        if not contact_info:
+        if not user_profile:
             return jsonify({'error': 'User not found in database'}), 404
 
-        user_profile = {
-            'nombre': current_user.get('nombre_completo'),
-            'rol': current_user.get('nombre_rol'),
-            'tipo_usuario': current_user.get('tipo_usuario'),
-            'cedula': contact_info[0],
-            'email': contact_info[1],
-            'telefono': contact_info[2]
-        }
-
-        # Si es médico, agregar información específica del médico
-        if user_profile['tipo_usuario'] == 'medico' and current_user.get('id_medico'):
-            cursor.execute("SELECT especialidad, numero_colegiado, años_experiencia FROM Medicos WHERE id_medico = ?", (current_user['id_medico'],))
-            medico_info = cursor.fetchone()
-            if medico_info:
-                user_profile.update({
-                    'especialidad': medico_info[0],
-                    'numero_colegiado': medico_info[1],
-                    'años_experiencia': medico_info[2]
-                })
-        
         return jsonify(user_profile)
             
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Database error in user_data: {str(e)}")
         return jsonify({'error': 'Failed to fetch user data'}), 500
     finally:
         if cursor: cursor.close()
-        if conn: conn.close()
\ No newline at end of file
+        if conn: conn.close()
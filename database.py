@@ -1,30 +1,182 @@
-import pyodbc
 import logging
-from config import SERVER, DATABASE, USE_WINDOWS_AUTH, USERNAME, PASSWORD
+import sqlite3
+import time
+from flask import has_request_context, request
+import db_metrics
+import query_budget
+from config import SERVER, DATABASE, USE_WINDOWS_AUTH, USERNAME, PASSWORD, DB_INSTRUMENTATION, SLOW_QUERY_MS, DB_BACKEND, SQLITE_PATH
+
+try:
+    import pyodbc
+except ImportError:  # Con DB_BACKEND=sqlite no hace falta el driver ODBC
+    pyodbc = None
+
+# Excepción base de la base de datos activa. Los blueprints capturan DatabaseError
+# en lugar de pyodbc.Error para funcionar igual con el backend SQLite.
+DatabaseError = pyodbc.Error if pyodbc else sqlite3.Error
+
+# Logger propio para las consultas lentas (create_app() le agrega slow_queries.log)
+slow_query_logger = logging.getLogger('slow_queries')
+
+def _current_endpoint():
+    """Endpoint de Flask que originó la consulta, o 'sin_request' fuera de una petición."""
+    if has_request_context():
+        return request.endpoint or request.path
+    return 'sin_request'
+
+class InstrumentedCursor:
+    """Envoltura del cursor de pyodbc que mide cada sentencia.
+
+    Registra la huella de la sentencia, su duración, las filas leídas y el endpoint
+    de origen en db_metrics, y escribe en el log de consultas lentas las que superan
+    SLOW_QUERY_MS. El resto de atributos se delega al cursor original.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._statement = None
+        self._endpoint = None
+
+    def _run(self, method, sql, *params):
+        self._statement = db_metrics.fingerprint(sql)
+        self._endpoint = _current_endpoint()
+        query_budget.count_round_trip()
+        started = time.perf_counter()
+        try:
+            method(sql, *params)
+        except DatabaseError:
+            db_metrics.record_query(self._endpoint, self._statement, (time.perf_counter() - started) * 1000, error=True)
+            raise
+        duration_ms = (time.perf_counter() - started) * 1000
+        slow = duration_ms >= SLOW_QUERY_MS
+        db_metrics.record_query(self._endpoint, self._statement, duration_ms, slow=slow)
+        if slow:
+            slow_query_logger.warning(f"{duration_ms:.1f} ms [{self._endpoint}] {self._statement}")
+        return self
+
+    def execute(self, sql, *params):
+        return self._run(self._cursor.execute, sql, *params)
+
+    def executemany(self, sql, params):
+        return self._run(self._cursor.executemany, sql, params)
+
+    @property
+    def fast_executemany(self):
+        return self._cursor.fast_executemany
+
+    @fast_executemany.setter
+    def fast_executemany(self, value):
+        # Opción del cursor de pyodbc: se fija en el cursor original, no en la envoltura
+        self._cursor.fast_executemany = value
+
+    def _count(self, rows):
+        if self._statement is not None:
+            db_metrics.record_rows(self._endpoint, self._statement, rows)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._count(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+    def fetchval(self):
+        value = self._cursor.fetchval()
+        if value is not None:
+            self._count(1)
+        return value
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._count(1)
+            yield row
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """Envoltura de la conexión que entrega cursores instrumentados."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor())
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def _connect():
+    """Abre la conexión con el motor configurado en DB_BACKEND."""
+    if DB_BACKEND == 'sqlite':
+        import sqlite_backend
+        return sqlite_backend.connect(SQLITE_PATH)
+
+    if USE_WINDOWS_AUTH:
+        connection_string = (
+            f'DRIVER={{ODBC Driver 17 for SQL Server}};'
+            f'SERVER={SERVER};DATABASE={DATABASE};'
+            'Trusted_Connection=yes;'
+        )
+    else:
+        if not USERNAME or not PASSWORD:
+            logging.error("Credenciales de base de datos no configuradas")
+            return None
+            
+        connection_string = (
+            f'DRIVER={{ODBC Driver 17 for SQL Server}};'
+            f'SERVER={SERVER};DATABASE={DATABASE};'
+            f'UID={USERNAME};PWD={PASSWORD}'
+        )
+    
+    return pyodbc.connect(connection_string)
+
+def is_unique_violation(error):
+    """True si el error es una violación de clave o índice único."""
+    # SQL Server: 2627 (restricción UNIQUE / PRIMARY KEY) y 2601 (índice único)
+    message = str(error)
+    return '(2627)' in message or '(2601)' in message or 'UNIQUE constraint failed' in message
 
 # Function to get a database connection
 def get_db_connection():
     try:
-        if USE_WINDOWS_AUTH:
-            connection_string = (
-                f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-                f'SERVER={SERVER};DATABASE={DATABASE};'
-                'Trusted_Connection=yes;'
-            )
-        else:
-            if not USERNAME or not PASSWORD:
-                logging.error("Credenciales de base de datos no configuradas")
-                return None
-                
-            connection_string = (
-                f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-                f'SERVER={SERVER};DATABASE={DATABASE};'
-                f'UID={USERNAME};PWD={PASSWORD}'
-            )
-        
-        conn = pyodbc.connect(connection_string)
-        logging.info("Database connection established successfully")
-        return conn
-    except pyodbc.Error as e:
+        conn = _connect()
+        if not conn:
+            return None
+        # Se abre una conexión por petición: a nivel INFO solo generaba ruido en app.log
+        logging.debug("Database connection established successfully")
+        query_budget.count_connection()
+        if not DB_INSTRUMENTATION:
+            return conn
+        db_metrics.record_connection()
+        return InstrumentedConnection(conn)
+    except DatabaseError as e:
+        db_metrics.record_connection(failed=True)
         logging.error(f"Database connection failed: {str(e)}")
-        return None
\ No newline at end of file
+        return None
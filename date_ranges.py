@@ -0,0 +1,62 @@
+from datetime import date, datetime, timedelta
+
+# Predicados de fecha que SQL Server puede resolver con una búsqueda en el índice.
+#
+# Envolver la columna en una función (CONVERT(date, fecha_cita) = ...,
+# CAST(fecha_creacion AS DATE) BETWEEN ? AND ?) obliga a recorrer la tabla o el
+# índice completo. Aquí la columna queda siempre sola a la izquierda y los
+# rangos son semiabiertos: `columna >= inicio AND columna < fin + 1 día`, que
+# sirve igual para columnas DATE y DATETIME (incluye todo el último día).
+#
+# Las funciones devuelven (sql, parámetros) o solo el SQL cuando el límite lo
+# calcula la base de datos; "hoy" es siempre la fecha del servidor de base de
+# datos, como con el GETDATE() de antes.
+
+# Fecha de hoy como DATE. Comparar con un DATE evita la conversión implícita de
+# columnas DATE a DATETIME que provoca GETDATE() solo.
+TODAY = "CAST(GETDATE() AS DATE)"
+
+
+def parse_date(value):
+    """date, datetime o 'AAAA-MM-DD' -> date. Lanza ValueError si el texto no es una fecha."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
+
+
+def between(column, start, end):
+    """Días start..end inclusive: `column >= start AND column < end + 1`."""
+    return (f"{column} >= ? AND {column} < ?",
+            [parse_date(start), parse_date(end) + timedelta(days=1)])
+
+
+def since(column, start):
+    """Desde el día start inclusive."""
+    return f"{column} >= ?", [parse_date(start)]
+
+
+def until(column, end):
+    """Hasta el día end inclusive."""
+    return f"{column} < ?", [parse_date(end) + timedelta(days=1)]
+
+
+def today(column):
+    """El día de hoy."""
+    return f"{column} >= {TODAY} AND {column} < CAST(DATEADD(day, 1, GETDATE()) AS DATE)"
+
+
+def from_today(column):
+    """Hoy y en adelante."""
+    return f"{column} >= {TODAY}"
+
+
+def last_days(column, days):
+    """Los últimos `days` días contando hoy (7 = hoy y los 6 anteriores)."""
+    return f"{column} >= CAST(DATEADD(day, {1 - int(days)}, GETDATE()) AS DATE)"
+
+
+def this_month(column):
+    """Desde el primer día del mes en curso."""
+    return f"{column} >= DATEADD(month, DATEDIFF(month, 0, GETDATE()), 0)"
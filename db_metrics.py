@@ -0,0 +1,117 @@
+import re
+import threading
+from collections import defaultdict
+
+# Agregados en memoria de las consultas ejecutadas, por endpoint y por sentencia.
+# Se alimentan desde el cursor instrumentado de database.py y se exponen en
+# formato Prometheus desde metrics.py. Son por proceso: con varios workers cada
+# uno reporta sus propios valores.
+
+_lock = threading.Lock()
+_endpoints = defaultdict(lambda: {'queries': 0, 'duration_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow': 0, 'errors': 0})
+_statements = defaultdict(lambda: {'queries': 0, 'duration_ms': 0.0, 'max_ms': 0.0, 'rows': 0})
+_connections = {'opened': 0, 'failed': 0}
+
+# Límite de sentencias distintas que se guardan, para acotar la memoria
+MAX_STATEMENTS = 500
+
+_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Normaliza una sentencia: sin literales y con espacios colapsados."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def record_query(endpoint, statement, duration_ms, slow=False, error=False):
+    with _lock:
+        stats = _endpoints[endpoint]
+        stats['queries'] += 1
+        stats['duration_ms'] += duration_ms
+        stats['max_ms'] = max(stats['max_ms'], duration_ms)
+        if slow:
+            stats['slow'] += 1
+        if error:
+            stats['errors'] += 1
+
+        if statement in _statements or len(_statements) < MAX_STATEMENTS:
+            stmt_stats = _statements[statement]
+            stmt_stats['queries'] += 1
+            stmt_stats['duration_ms'] += duration_ms
+            stmt_stats['max_ms'] = max(stmt_stats['max_ms'], duration_ms)
+
+
+def record_rows(endpoint, statement, rows):
+    with _lock:
+        _endpoints[endpoint]['rows'] += rows
+        if statement in _statements:
+            _statements[statement]['rows'] += rows
+
+
+def record_connection(failed=False):
+    with _lock:
+        _connections['failed' if failed else 'opened'] += 1
+
+
+def snapshot():
+    """Copia de los agregados actuales."""
+    with _lock:
+        return {
+            'endpoints': {name: dict(stats) for name, stats in _endpoints.items()},
+            'statements': {sql: dict(stats) for sql, stats in _statements.items()},
+            'connections': dict(_connections),
+        }
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+        _statements.clear()
+        _connections.update(opened=0, failed=0)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def render_prometheus(top_statements=20):
+    """Genera los agregados en el formato de texto de Prometheus."""
+    data = snapshot()
+    lines = [
+        '# HELP clinica_db_connections_total Conexiones a la base de datos abiertas.',
+        '# TYPE clinica_db_connections_total counter',
+        f"clinica_db_connections_total{{result=\"ok\"}} {data['connections']['opened']}",
+        f"clinica_db_connections_total{{result=\"error\"}} {data['connections']['failed']}",
+    ]
+
+    endpoint_metrics = [
+        ('clinica_db_queries_total', 'counter', 'Consultas ejecutadas por endpoint.', 'queries', 1),
+        ('clinica_db_query_duration_seconds_total', 'counter', 'Tiempo total en consultas por endpoint.', 'duration_ms', 1000),
+        ('clinica_db_query_duration_seconds_max', 'gauge', 'Consulta más lenta por endpoint.', 'max_ms', 1000),
+        ('clinica_db_rows_fetched_total', 'counter', 'Filas leídas por endpoint.', 'rows', 1),
+        ('clinica_db_slow_queries_total', 'counter', 'Consultas sobre el umbral SLOW_QUERY_MS por endpoint.', 'slow', 1),
+        ('clinica_db_query_errors_total', 'counter', 'Consultas con error por endpoint.', 'errors', 1),
+    ]
+    for name, metric_type, help_text, key, divisor in endpoint_metrics:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for endpoint, stats in sorted(data['endpoints'].items()):
+            value = stats[key] / divisor if divisor != 1 else stats[key]
+            lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {value:g}')
+
+    # Solo las sentencias más costosas, para no disparar la cardinalidad
+    top = sorted(data['statements'].items(), key=lambda item: -item[1]['duration_ms'])[:top_statements]
+    lines.append('# HELP clinica_db_statement_duration_seconds_total Tiempo total por sentencia (las más costosas).')
+    lines.append('# TYPE clinica_db_statement_duration_seconds_total counter')
+    for sql, stats in top:
+        lines.append(f'clinica_db_statement_duration_seconds_total{{statement="{_label(sql[:200])}"}} {stats["duration_ms"] / 1000:g}')
+    lines.append('# HELP clinica_db_statement_queries_total Ejecuciones por sentencia (las más costosas).')
+    lines.append('# TYPE clinica_db_statement_queries_total counter')
+    for sql, stats in top:
+        lines.append(f'clinica_db_statement_queries_total{{statement="{_label(sql[:200])}"}} {stats["queries"]}')
+
+    return '\n'.join(lines) + '\n'
@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
-import pyodbc
 import logging
 import re
-from database import get_db_connection
+from database import get_db_connection, DatabaseError
+import identity_index
+import cache
+import activity
+from config import REFERENCE_CACHE_MAX_AGE
 from collections import defaultdict
 from auth_middleware import login_required, role_required
 
@@ -23,14 +26,15 @@ def is_valid_phone(phone):
     cleaned_phone = re.sub(r'[^\d]', '', phone)
     return len(cleaned_phone) >= 10 and len(cleaned_phone) <= 15
 
-# Endpoint para obtener todos los médicos
-@doctors_bp.route('/api/medicos', methods=['GET'])
-@login_required
-def get_medicos(current_user):
+def _load_doctor_reference():
+    """
+    Plantilla de médicos, especialidades y directorio ya agrupados y con su JSON
+    serializado. Son dos consultas; el resto se deriva en memoria.
+    """
     conn = get_db_connection()
     if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
-        
+        return None
+
     try:
         with conn.cursor() as cursor:
             cursor.execute("""
@@ -41,56 +45,84 @@ def get_medicos(current_user):
                 JOIN Usuarios u ON m.id_usuario = u.id_usuario
                 ORDER BY u.nombre_completo
             """)
-            medicos = [{
-                'id_medico': row[0],
-                'nombre_completo': row[1],
-                'especialidad': row[2] or 'No Asignada',
-                'numero_colegiado': row[3],
-                'años_experiencia': row[4],
-                'telefono': row[5],
-                'correo': row[6],
-                'estado': row[7],
-                'id_usuario': row[8]
-            } for row in cursor.fetchall()]
-            
-            return jsonify(medicos)
-    except pyodbc.Error as e:
-        logging.error(f"Error en base de datos: {str(e)}")
-        return jsonify({'error': 'Error al obtener médicos'}), 500
-    finally:
-        conn.close()
-
-# Endpoint para obtener especialidades únicas
-@doctors_bp.route('/api/medicos/especialidades', methods=['GET'])
-def get_especialidades():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
-        
-    try:
-        with conn.cursor() as cursor:
+            doctor_rows = cursor.fetchall()
             cursor.execute("""
                 SELECT id_especialidad, nombre_especialidad, tipo_especialidad
                 FROM Especialidades
                 ORDER BY tipo_especialidad, nombre_especialidad
             """)
-            
-            # Agrupar especialidades por tipo para facilitar su uso en el frontend
-            grouped_specialties = defaultdict(list)
-            for row in cursor.fetchall():
-                category = row.tipo_especialidad or 'General'
-                grouped_specialties[category].append({
-                    'id': row.id_especialidad,
-                    'nombre': row.nombre_especialidad
-                })
-            
-            return jsonify(grouped_specialties)
-    except pyodbc.Error as e:
-        logging.error(f"Error en base de datos: {str(e)}")
-        return jsonify({'error': 'Error al obtener especialidades'}), 500
+            specialty_rows = cursor.fetchall()
+    except DatabaseError as e:
+        logging.error(f"Error en base de datos al cargar médicos y especialidades: {str(e)}")
+        return None
     finally:
         conn.close()
 
+    medicos = tuple({
+        'id_medico': row[0],
+        'nombre_completo': row[1],
+        'especialidad': row[2] or 'No Asignada',
+        'numero_colegiado': row[3],
+        'años_experiencia': row[4],
+        'telefono': row[5],
+        'correo': row[6],
+        'estado': row[7],
+        'id_usuario': row[8]
+    } for row in doctor_rows)
+
+    disponibles = tuple({
+        'id_medico': row[0],
+        'nombre_completo': row[1],
+        'especialidad': row[2]
+    } for row in doctor_rows if row[7] == 'A')
+
+    # Agrupar especialidades por tipo para facilitar su uso en el frontend
+    especialidades = defaultdict(list)
+    for row in specialty_rows:
+        especialidades[row[2] or 'General'].append({'id': row[0], 'nombre': row[1]})
+
+    # Directorio por especialidad; dentro de cada una se mantiene el orden por nombre
+    directorio = defaultdict(list)
+    for row in doctor_rows:
+        if row[7] == 'A' and row[2] is not None:
+            directorio[row[2]].append({
+                'nombre_completo': row[1],
+                'telefono': row[5] or 'No disponible',
+                'correo': row[6] or 'No disponible'
+            })
+
+    return {
+        'medicos': medicos,
+        'json': {
+            'medicos': cache.json_payload(medicos),
+            'disponibles': cache.json_payload(disponibles),
+            'especialidades': cache.json_payload(dict(especialidades)),
+            'directorio': cache.json_payload(dict(directorio)),
+        }
+    }
+
+# Médicos y especialidades cambian pocas veces al mes y varias páginas los piden
+# en cada carga: se sirven desde memoria y las escrituras de este módulo (y de
+# users.py) invalidan la caché.
+doctor_reference = cache.VersionedCache('medicos', _load_doctor_reference, max_age=REFERENCE_CACHE_MAX_AGE)
+
+def _doctor_reference_response(view, error_message):
+    reference = doctor_reference.get()
+    if reference is None:
+        return jsonify({'error': error_message}), 500
+    return cache.json_response(reference['json'][view])
+
+# Endpoint para obtener todos los médicos
+@doctors_bp.route('/api/medicos', methods=['GET'])
+@login_required
+def get_medicos(current_user):
+    return _doctor_reference_response('medicos', 'Error al obtener médicos')
+
+# Endpoint para obtener especialidades únicas
+@doctors_bp.route('/api/medicos/especialidades', methods=['GET'])
+def get_especialidades():
+    return _doctor_reference_response('especialidades', 'Error al obtener especialidades')
+
 # Endpoint para obtener un médico específico
 @doctors_bp.route('/api/medicos/<int:id_medico>', methods=['GET'])
 @login_required
@@ -134,7 +166,7 @@ def get_medico(current_user, id_medico):
                     medico['id_especialidad'] = especialidad_id_row[0]
 
             return jsonify(medico)
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Error en base de datos: {str(e)}")
         return jsonify({'error': 'Error al obtener médico'}), 500
     finally:
@@ -144,31 +176,7 @@ def get_medico(current_user, id_medico):
 @doctors_bp.route('/api/medicos/disponibles', methods=['GET'])
 @login_required
 def get_medicos_disponibles(current_user):
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
-        
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT m.id_medico, u.nombre_completo, m.especialidad
-                FROM Medicos m
-                JOIN Usuarios u ON m.id_usuario = u.id_usuario
-                WHERE m.estado = 'A'
-                ORDER BY u.nombre_completo
-            """)
-            medicos = [{
-                'id_medico': row[0],
-                'nombre_completo': row[1],
-                'especialidad': row[2]
-            } for row in cursor.fetchall()]
-            
-            return jsonify(medicos)
-    except pyodbc.Error as e:
-        logging.error(f"Error en base de datos: {str(e)}")
-        return jsonify({'error': 'Error al obtener médicos disponibles'}), 500
-    finally:
-        conn.close()
+    return _doctor_reference_response('disponibles', 'Error al obtener médicos disponibles')
 
 # Endpoint para crear un nuevo médico
 @doctors_bp.route('/api/medicos', methods=['POST'])
@@ -236,15 +244,17 @@ def create_medico(current_user):
 
             # 5. Actualizar el registro de usuario para reflejar el rol de médico
             cursor.execute("UPDATE Usuarios SET id_rol = 2, tipo_usuario = 'medico' WHERE id_usuario = ?", (data['id_usuario'],))
+            activity.record(cursor, activity.MEDICO, medico_id)
             
             conn.commit()
+            doctor_reference.bump()
             
             return jsonify({
                 'message': 'Perfil de médico creado y asociado al usuario exitosamente',
                 'id_medico': medico_id
             }), 201
             
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error en base de datos: {str(e)}")
         if 'UNIQUE KEY' in str(e):
@@ -349,12 +359,17 @@ def update_medico(current_user, id_medico):
                         fecha_actualizacion = GETDATE()
                     WHERE id_usuario = ?
                 """, user_update_values)
+
+            activity.record(cursor, activity.MEDICO, id_medico, 'actualizado')
                 
             conn.commit()
+            doctor_reference.bump()
+            if 'correo' in data:
+                identity_index.record_changed(gmail=data.get('correo'))
             
             return jsonify({'message': 'Médico actualizado exitosamente'})
             
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error en base de datos: {str(e)}")
         if 'UNIQUE KEY' in str(e):
@@ -390,14 +405,16 @@ def toggle_medico_status(current_user, id_medico):
                     fecha_actualizacion = GETDATE()
                 WHERE id_medico = ?
             """, (new_status, id_medico))
+            activity.record(cursor, activity.MEDICO, id_medico, action_text)
 
             conn.commit()
+            doctor_reference.bump()
 
             return jsonify({
                 'message': f'Médico {action_text} exitosamente',
                 'new_status': new_status
             })
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error en base de datos: {str(e)}")
         return jsonify({'error': 'Error al cambiar estado del médico', 'detalles': str(e)}), 500
@@ -431,7 +448,7 @@ def get_usuarios_para_medico(current_user):
                 'gmail': row[5]
             } for row in cursor.fetchall()]
             return jsonify(users)
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Error en base de datos: {str(e)}")
         return jsonify({'error': 'Error al obtener usuarios para rol de médico'}), 500
     finally:
@@ -442,31 +459,4 @@ def get_usuarios_para_medico(current_user):
 @login_required
 @role_required(1, 3) # Admin y Recepción
 def get_medicos_directorio(current_user):
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
-        
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT u.nombre_completo, m.especialidad, u.telefono, u.gmail
-                FROM Medicos m
-                JOIN Usuarios u ON m.id_usuario = u.id_usuario
-                WHERE m.estado = 'A' AND m.especialidad IS NOT NULL
-                ORDER BY m.especialidad, u.nombre_completo
-            """)
-            
-            directorio = defaultdict(list)
-            for row in cursor.fetchall():
-                directorio[row.especialidad].append({
-                    'nombre_completo': row.nombre_completo,
-                    'telefono': row.telefono or 'No disponible',
-                    'correo': row.gmail or 'No disponible'
-                })
-            
-            return jsonify(dict(directorio))
-    except pyodbc.Error as e:
-        logging.error(f"Error en base de datos al crear directorio: {str(e)}")
-        return jsonify({'error': 'Error al crear el directorio de médicos'}), 500
-    finally:
-        conn.close()
\ No newline at end of file
+    return _doctor_reference_response('directorio', 'Error al crear el directorio de médicos')
@@ -0,0 +1,46 @@
+from flask import Blueprint, jsonify
+import logging
+import time
+from database import get_db_connection, DatabaseError, pyodbc
+from migrations import SCHEMA_VERSION, get_schema_version
+import db_metrics
+
+health_bp = Blueprint('health', __name__)
+
+# Sondas para el balanceador / orquestador. No requieren sesión.
+
+@health_bp.route('/api/health/live', methods=['GET'])
+def liveness():
+    """El proceso responde. No toca la base de datos."""
+    return jsonify({'status': 'ok'})
+
+@health_bp.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """El worker puede atender peticiones: hay conexión a la base de datos y el esquema está al día."""
+    started = time.perf_counter()
+    conn = get_db_connection()
+    connections = db_metrics.snapshot()['connections']
+    pool = {
+        'odbc_pooling': bool(pyodbc and pyodbc.pooling),
+        'connections_opened': connections['opened'],
+        'connections_failed': connections['failed'],
+    }
+    if not conn:
+        return jsonify({'status': 'error', 'error': 'Sin conexión a la base de datos', 'pool': pool}), 503
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            schema_version = get_schema_version(cursor)
+    except DatabaseError as e:
+        logging.error(f"Error en la sonda de disponibilidad: {str(e)}")
+        return jsonify({'status': 'error', 'error': 'La base de datos no responde', 'pool': pool}), 503
+    finally:
+        conn.close()
+
+    pool['check_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    if schema_version != SCHEMA_VERSION:
+        return jsonify({'status': 'error', 'error': 'Esquema desactualizado', 'schema_version': schema_version,
+                        'expected_schema_version': SCHEMA_VERSION, 'pool': pool}), 503
+    return jsonify({'status': 'ok', 'schema_version': schema_version, 'pool': pool})
@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+
+from config import IDENTITY_INDEX_REFRESH, IDENTITY_INDEX_FALSE_POSITIVE
+from database import get_db_connection, DatabaseError
+
+# Índice en memoria de los identificadores de Usuarios (usuario_login, cedula, gmail).
+#
+# Sirve para dos cosas:
+#   - las comprobaciones de disponibilidad del formulario de registro, que se
+#     llaman en cada tecla: un filtro de Bloom por columna responde "no existe"
+#     sin ir a la base de datos y un conjunto exacto confirma los "sí existe".
+#     Solo cuando el Bloom dice que puede existir y el conjunto no lo tiene
+#     (falso positivo o valor que dejó de usarse) se consulta la base de datos.
+#   - el login, para elegir qué columna buscar y hacer una sola búsqueda por
+#     índice en lugar de `usuario_login = ? OR cedula = ? OR gmail = ?`.
+#
+# El índice se construye al arrancar el worker (serve.warm_worker) o en la
+# primera consulta, se actualiza con los usuarios creados en este proceso y se
+# reconstruye cada IDENTITY_INDEX_REFRESH segundos para recoger los cambios de
+# otros workers. Es orientativo: la unicidad la siguen garantizando las
+# restricciones UNIQUE y las comprobaciones de register/create_user.
+
+COLUMNS = ('usuario_login', 'cedula', 'gmail')
+
+# Cédula: V-12345678 (como valida el registro) o solo dígitos
+CEDULA_PATTERN = re.compile(r'^([VEGJ]-?)?\d{5,9}$', re.IGNORECASE)
+
+
+def normalize(value):
+    # SQL Server compara con intercalación insensible a mayúsculas y sin espacios finales
+    return str(value).strip().casefold()
+
+
+def classify(identifier):
+    """Columnas donde buscar un identificador de login, de la más a la menos probable."""
+    value = str(identifier).strip()
+    if '@' in value:
+        return ['gmail', 'usuario_login', 'cedula']
+    if CEDULA_PATTERN.match(value):
+        return ['cedula', 'usuario_login', 'gmail']
+    return ['usuario_login', 'cedula', 'gmail']
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un bytearray con doble hashing (blake2b)."""
+
+    def __init__(self, capacity, false_positive=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(false_positive) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class _Index:
+    def __init__(self, values_by_column):
+        # Margen para los usuarios que se creen antes de la próxima reconstrucción
+        capacity = int(max((len(v) for v in values_by_column.values()), default=0) * 1.25) + 1024
+        self.blooms = {}
+        self.exact = {}
+        for column in COLUMNS:
+            bloom = BloomFilter(capacity, IDENTITY_INDEX_FALSE_POSITIVE)
+            for value in values_by_column[column]:
+                bloom.add(value)
+            self.blooms[column] = bloom
+            self.exact[column] = set(values_by_column[column])
+        self.built_at = time.monotonic()
+        self.stale = False
+        self.refreshing = False
+
+    def add(self, column, value):
+        self.blooms[column].add(value)
+        self.exact[column].add(value)
+
+
+_index = None
+_build_lock = threading.Lock()
+_state_lock = threading.Lock()
+
+
+def _load():
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT usuario_login, cedula, gmail FROM Usuarios")
+            values = {column: [] for column in COLUMNS}
+            for row in cursor.fetchall():
+                for column, value in zip(COLUMNS, row):
+                    if value:
+                        values[column].append(normalize(value))
+            return _Index(values)
+    except DatabaseError as e:
+        logging.error(f"Error al construir el índice de identificadores: {str(e)}")
+        return None
+    finally:
+        conn.close()
+
+
+def warm():
+    """Construye (o reconstruye) el índice. Devuelve False si no hay base de datos."""
+    global _index
+    with _build_lock:
+        index = _load()
+        if index is not None:
+            _index = index
+            logging.info(f"Índice de identificadores construido con {len(index.exact['usuario_login'])} usuarios")
+        elif _index is not None:
+            # Se sigue con el índice anterior y se reintenta tras otro intervalo
+            with _state_lock:
+                _index.refreshing = False
+                _index.built_at = time.monotonic()
+    return index is not None
+
+
+def _current():
+    index = _index
+    if index is None:
+        # Primera consulta del proceso: se espera a la construcción
+        warm()
+        return _index
+    if index.stale or time.monotonic() - index.built_at > IDENTITY_INDEX_REFRESH:
+        # Se reconstruye en segundo plano; mientras tanto se responde con el índice actual
+        with _state_lock:
+            start = not index.refreshing
+            index.refreshing = True
+        if start:
+            threading.Thread(target=warm, name='identity-index', daemon=True).start()
+    return index
+
+
+def contains(column, value):
+    """
+    True/False si el índice puede responder sin la base de datos, None si no:
+    índice no disponible o valor que el Bloom acepta pero el conjunto exacto no tiene.
+    """
+    index = _current()
+    if index is None:
+        return None
+    value = normalize(value)
+    if value not in index.blooms[column]:
+        return False
+    if value in index.exact[column]:
+        return True
+    return None
+
+
+def lookup_columns(identifier):
+    """
+    Orden de columnas para resolver un identificador de login: primero las que
+    el índice sabe que lo contienen, después el resto según su formato.
+    """
+    columns = classify(identifier)
+    index = _index
+    if index is None:
+        return columns
+    value = normalize(identifier)
+    known = [column for column in columns if value in index.exact[column]]
+    return known + [column for column in columns if column not in known]
+
+
+def record_created(**values):
+    """Registra los identificadores de un usuario recién creado en este proceso."""
+    index = _index
+    if index is None:
+        return
+    for column, value in values.items():
+        if value:
+            index.add(column, normalize(value))
+
+
+def record_changed(**values):
+    """
+    Tras cambiar identificadores de un usuario existente. Los valores nuevos se
+    añaden ya; los anteriores no se pueden quitar del Bloom, así que el índice
+    se reconstruye en la próxima consulta.
+    """
+    record_created(**values)
+    index = _index
+    if index is not None:
+        index.stale = True
@@ -0,0 +1,146 @@
+# json_provider.py
+"""
+Serialización JSON de la API.
+
+ClinicJSONProvider reemplaza al proveedor por defecto de Flask: usa orjson
+cuando está instalado y, si no, el módulo json estándar. En ambos casos las
+fechas y horas se codifican directamente con los formatos que ya usa el
+frontend, así que los handlers pueden devolver los valores tal como vienen
+de la base de datos sin llamar a strftime por cada fila:
+
+    date      -> 'YYYY-MM-DD'
+    time      -> 'HH:MM'
+    datetime  -> 'YYYY-MM-DD HH:MM:SS'
+
+Para listados grandes, rows_response() codifica las tuplas del cursor sin
+construir antes un dict por fila en el handler.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+import json
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+if orjson:
+    # Las fechas pasan por _default para respetar los formatos de arriba
+    # (orjson usaría ISO 8601 con 'T' y segundos en las horas).
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _default(value):
+    """Codifica los tipos que no son nativos de JSON."""
+    # datetime es subclase de date: se comprueba primero
+    # isoformat() produce los mismos textos que strftime y es bastante más rápido
+    if isinstance(value, datetime):
+        return value.isoformat(' ', 'seconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, time):
+        return value.isoformat('minutes')
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, tuple):
+        # pyodbc.Row y sqlite_backend.Row
+        return list(value)
+    if hasattr(value, 'cursor_description'):
+        return list(value)
+    # dataclasses, UUID, Markup...: mismo comportamiento que Flask
+    return DefaultJSONProvider.default(value)
+
+
+class ClinicJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de la aplicación (app.json)."""
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson and not kwargs:
+            options = ORJSON_OPTIONS
+            if self.sort_keys:
+                options |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=_default, option=options).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson:
+            options = ORJSON_OPTIONS
+            if self.sort_keys:
+                options |= orjson.OPT_SORT_KEYS
+            if self.compact is False or (self.compact is None and self._app.debug):
+                options |= orjson.OPT_INDENT_2
+            body = orjson.dumps(obj, default=_default, option=options)
+            return self._app.response_class(body, mimetype=self.mimetype)
+        return super().response(*args, **kwargs)
+
+
+def rows_as_dicts(cursor):
+    """Convierte el resultado del cursor en una lista de dicts (columna -> valor)."""
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+def _encode_value(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return _encode_str(value)
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return json.dumps(value)
+    encoded = _default(value)
+    return _encode_str(encoded) if isinstance(encoded, str) else json.dumps(encoded, default=_default)
+
+
+def encode_rows(columns, rows):
+    """
+    Codifica una lista de filas como un array JSON de objetos.
+
+    Las claves se codifican una sola vez y las partes de cada fila se
+    escriben en una lista de tamaño fijo que se une al final.
+    """
+    if orjson:
+        return orjson.dumps([dict(zip(columns, row)) for row in rows],
+                            default=_default, option=ORJSON_OPTIONS)
+
+    prefixes = ['{' + _encode_str(columns[0]) + ':']
+    prefixes += [',' + _encode_str(column) + ':' for column in columns[1:]]
+    width = len(columns) * 2 + 1
+    parts = [None] * (len(rows) * width)
+    position = 0
+    for row in rows:
+        for prefix, value in zip(prefixes, row):
+            parts[position] = prefix
+            parts[position + 1] = _encode_value(value)
+            position += 2
+        parts[position] = '},'
+        position += 1
+    if parts:
+        parts[-1] = '}'
+    return ('[' + ''.join(parts) + ']').encode('utf-8')
+
+
+def rows_response(cursor, status=200):
+    """Respuesta JSON con todas las filas del cursor, usando los nombres de columna como claves."""
+    columns = [column[0] for column in cursor.description]
+    body = encode_rows(columns, cursor.fetchall())
+    return current_app.response_class(body, status=status, mimetype='application/json')
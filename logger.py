@@ -1,6 +1,214 @@
+import atexit
+import itertools
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
 
-# La configuración del logging (basicConfig) se realiza una sola vez en app.py.
-# Los otros módulos, como 'patients.py', ya obtienen su logger correctamente
-# con `logging.getLogger(__name__)`, por lo que este archivo es redundante.
-# Lo dejamos vacío para evitar problemas, pero podría ser eliminado si no se importa en ningún otro lugar.
+from flask import g, has_request_context, request
+
+from config import (LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_FILE_MODE,
+                    LOG_SAMPLE_RATES, LOG_SLOW_REQUEST_MS)
+
+# Configuración del logging de la aplicación (se llama una vez desde create_app).
+#
+# Los handlers de la aplicación no escriben en disco: ponen el registro en una
+# cola y un QueueListener en un hilo aparte lo escribe en app.log (con rotación
+# por tamaño) y en consola. Cada registro lleva el id de la petición en curso.
+# Los mensajes INFO/DEBUG de los loggers de LOG_SAMPLE_RATES se muestrean
+# (1 de cada N); WARNING y superiores se escriben siempre.
+#
+# RotatingFileHandler solo es seguro con un proceso: con varios workers cada uno
+# renombraría el archivo por debajo de los demás. Por eso con LOG_FILE_MODE
+# 'watched' se usa WatchedFileHandler (cada proceso escribe en modo append y
+# reabre el archivo cuando logrotate lo mueve) y con 'stdout' no se escriben
+# archivos. Las consultas lentas van solo a slow_queries.log, no a app.log.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_FILE = os.path.join(BASE_DIR, 'app.log')
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'slow_queries.log')
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+access_logger = logging.getLogger('clinica.access')
+
+FILE_MODES = ('rotate', 'watched', 'stdout')
+
+_listener = None
+_setup_lock = threading.Lock()
+_file_mode = LOG_FILE_MODE if LOG_FILE_MODE in FILE_MODES else 'rotate'
+
+
+class RequestContextFilter(logging.Filter):
+    """Añade request_id al registro; se ejecuta en el hilo de la petición, antes de encolar."""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Deja pasar 1 de cada N registros por debajo de WARNING de los loggers configurados."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self._rates = rates
+        self._counters = {name: itertools.count() for name in rates}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rates.get(record.name)
+        if not rate or rate <= 1:
+            return True
+        # next() sobre itertools.count es atómico con el GIL
+        return next(self._counters[record.name]) % rate == 0
+
+
+class LoggerNameFilter(logging.Filter):
+    """Solo los registros de un logger concreto (logging.Filter también acepta sus hijos)."""
+
+    def filter(self, record):
+        return record.name == self.name
+
+
+class ExcludeLoggerFilter(logging.Filter):
+    """Todos los registros salvo los de un logger concreto."""
+
+    def filter(self, record):
+        return record.name != self.name
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea."""
+
+    EXTRA_FIELDS = ('request_id', 'method', 'path', 'status', 'latency_ms')
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _file_formatter():
+    if LOG_FORMAT == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def _file_handler(path):
+    if _file_mode == 'watched':
+        return logging.handlers.WatchedFileHandler(path, encoding='utf-8')
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+
+
+def use_file_mode(mode):
+    """Cambia LOG_FILE_MODE; debe llamarse antes de create_app() (ver serve.py)."""
+    global _file_mode
+    if mode not in FILE_MODES:
+        raise ValueError(mode)
+    _file_mode = mode
+
+
+def file_mode():
+    return _file_mode
+
+
+def _start_listener():
+    """Configura la cola y el hilo escritor. Idempotente: create_app puede llamarse varias veces."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+        queue_handler.addFilter(RequestContextFilter())
+
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers = [console_handler]
+
+        if _file_mode != 'stdout':
+            file_handler = _file_handler(LOG_FILE)
+            file_handler.setFormatter(_file_formatter())
+            file_handler.addFilter(ExcludeLoggerFilter('slow_queries'))
+
+            # Consultas que superan SLOW_QUERY_MS (ver database.py)
+            slow_query_handler = _file_handler(SLOW_QUERY_LOG_FILE)
+            slow_query_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            slow_query_handler.addFilter(LoggerNameFilter('slow_queries'))
+            handlers += [file_handler, slow_query_handler]
+
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop)
+
+
+def stop():
+    """Vacía la cola y detiene el hilo escritor."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def restart_after_fork():
+    """
+    En un worker creado con fork() (gunicorn con preload_app) el hilo escritor
+    del proceso padre no existe: se descarta y se arranca uno propio.
+    """
+    global _listener
+    _listener = None
+    _start_listener()
+
+
+def _start_request():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    g.request_started = time.perf_counter()
+
+
+def _log_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    response.headers['X-Request-ID'] = g.request_id
+    level = logging.WARNING if latency_ms >= LOG_SLOW_REQUEST_MS else logging.INFO
+    access_logger.log(level, f"{request.method} {request.path} {response.status_code} {latency_ms} ms", extra={
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'latency_ms': latency_ms,
+    })
+    return response
+
+
+def init_app(app):
+    _start_listener()
+    app.before_request(_start_request)
+    app.after_request(_log_request)
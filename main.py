@@ -1,3 +1,6 @@
+import time
+_process_started = time.perf_counter()
+
 from app import create_app
 from init_database import init_database
 
@@ -8,8 +11,12 @@ if __name__ == '__main__':
     # y no en el proceso del recargador
     import os
     if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        init_started = time.perf_counter()
         init_database()
+        app.config['STARTUP_TIMINGS']['init_database_ms'] = round((time.perf_counter() - init_started) * 1000, 2)
 
     # El logging se configura dentro de create_app(), por lo que usamos el logger de la app
+    app.config['STARTUP_TIMINGS']['cold_start_ms'] = round((time.perf_counter() - _process_started) * 1000, 2)
+    app.logger.info(f"Tiempos de arranque: {app.config['STARTUP_TIMINGS']}")
     app.logger.info("Iniciando aplicación Flask...")
     app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=True)
\ No newline at end of file
@@ -0,0 +1,22 @@
+from flask import Blueprint, Response, jsonify
+from auth_middleware import login_required, role_required
+import cache
+import compression
+import db_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/api/admin/metrics', methods=['GET'])
+@login_required
+@role_required(1) # Solo Admin
+def get_metrics(current_user):
+    """Métricas de base de datos, compresión y cachés en formato de texto de Prometheus."""
+    body = db_metrics.render_prometheus() + compression.render_prometheus() + cache.render_prometheus()
+    return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@metrics_bp.route('/api/admin/metrics/queries', methods=['GET'])
+@login_required
+@role_required(1) # Solo Admin
+def get_query_metrics(current_user):
+    """Agregados por endpoint y por sentencia en JSON, para inspección manual."""
+    return jsonify(db_metrics.snapshot())
@@ -0,0 +1,948 @@
+import logging
+import re
+import unicodedata
+from database import get_db_connection, DatabaseError
+from config import DB_BACKEND, DAY_NAMES
+
+# Migraciones del esquema de la base de datos.
+#
+# Cada migración es una tupla (versión, descripción, pasos). Los pasos pueden ser
+# sentencias SQL o funciones que reciben el cursor. Todas deben ser idempotentes:
+# una migración interrumpida a medias se vuelve a ejecutar completa en el siguiente
+# arranque. Las versiones aplicadas se registran en la tabla Schema_version.
+# Para cambiar el esquema se agrega una migración nueva al final de MIGRATIONS;
+# nunca se modifica una que ya fue aplicada.
+#
+# Un paso también puede ser un diccionario {'mssql': ..., 'sqlite': ...} cuando la
+# sentencia depende del motor (DB_BACKEND), con None si no aplica a uno de ellos;
+# el backend SQLite solo se usa para pruebas locales y benchmarks.
+
+
+class MigrationError(Exception):
+    """Una migración no puede aplicarse sin intervención manual sobre los datos."""
+
+
+def create_index(name, table, definition):
+    """Devuelve las sentencias para crear un índice solo si aún no existe."""
+    # SQLite no soporta columnas incluidas: el índice queda solo con las claves
+    columns = re.sub(r'\s+INCLUDE\s*\(.*\)$', '', definition)
+    return {
+        'mssql': (
+            f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}')) "
+            f"CREATE NONCLUSTERED INDEX {name} ON {table} {definition}"
+        ),
+        'sqlite': f"CREATE INDEX IF NOT EXISTS {name} ON {table} {columns}",
+    }
+
+SPECIALTIES = [
+    # 1. Especialidades Clínicas (Principales)
+    ("Medicina Familiar y Comunitaria", "Especialidades Clínicas"),
+    ("Medicina Interna", "Especialidades Clínicas"),
+    ("Pediatría", "Especialidades Clínicas"),
+    ("Ginecología y Obstetricia", "Especialidades Clínicas"),
+    ("Psiquiatría", "Especialidades Clínicas"),
+    ("Dermatología", "Especialidades Clínicas"),
+    # 2. Especialidades Quirúrgicas
+    ("Cirugía General y del Aparato Digestivo", "Especialidades Quirúrgicas"),
+    ("Cirugía Ortopédica y Traumatología", "Especialidades Quirúrgicas"),
+    ("Neurocirugía", "Especialidades Quirúrgicas"),
+    ("Cirugía Plástica, Estética y Reparadora", "Especialidades Quirúrgicas"),
+    ("Cirugía Torácica", "Especialidades Quirúrgicas"),
+    ("Cirugía Cardiovascular", "Especialidades Quirúrgicas"),
+    ("Cirugía Pediátrica", "Especialidades Quirúrgicas"),
+    ("Cirugía Maxilofacial", "Especialidades Quirúrgicas"),
+    # 3. Especialidades por Sistemas y Órganos
+    ("Cardiología", "Especialidades por Sistemas y Órganos"),
+    ("Neumología", "Especialidades por Sistemas y Órganos"),
+    ("Gastroenterología", "Especialidades por Sistemas y Órganos"),
+    ("Nefrología", "Especialidades por Sistemas y Órganos"),
+    ("Neurología", "Especialidades por Sistemas y Órganos"),
+    ("Endocrinología y Nutrición", "Especialidades por Sistemas y Órganos"),
+    ("Urología", "Especialidades por Sistemas y Órganos"),
+    ("Oftalmología", "Especialidades por Sistemas y Órganos"),
+    ("Otorrinolaringología (ORL)", "Especialidades por Sistemas y Órganos"),
+    # 4. Especialidades Diagnósticas y de Apoyo
+    ("Anatomía Patológica", "Especialidades Diagnósticas y de Apoyo"),
+    ("Radiología y Medicina Física", "Especialidades Diagnósticas y de Apoyo"),
+    ("Medicina Nuclear", "Especialidades Diagnósticas y de Apoyo"),
+    ("Análisis Clínicos / Bioquímica Clínica", "Especialidades Diagnósticas y de Apoyo"),
+    ("Farmacología Clínica", "Especialidades Diagnósticas y de Apoyo"),
+    ("Inmunología", "Especialidades Diagnósticas y de Apoyo"),
+    # 5. Otras Especialidades Importantes
+    ("Oncología Médica", "Otras Especialidades Importantes"),
+    ("Oncología Radioterápica", "Otras Especialidades Importantes"),
+    ("Medicina Intensiva", "Otras Especialidades Importantes"),
+    ("Medicina Preventiva y Salud Pública", "Otras Especialidades Importantes"),
+    ("Medicina del Trabajo", "Otras Especialidades Importantes"),
+    ("Medicina de Urgencias", "Otras Especialidades Importantes"),
+    ("Medicina Física y Rehabilitación (Fisiatría)", "Otras Especialidades Importantes"),
+    ("Alergología", "Otras Especialidades Importantes"),
+    ("Genética Médica", "Otras Especialidades Importantes"),
+    ("Medicina del Deporte", "Otras Especialidades Importantes"),
+    ("Paliativos", "Otras Especialidades Importantes"),
+    # 6. Subespecialidades (Fellowships)
+    ("Hepatología", "Subespecialidades"),
+    ("Cardiología Intervencionista", "Subespecialidades"),
+    ("Electrofisiología", "Subespecialidades"),
+    ("Reumatología", "Subespecialidades"),
+    ("Infectología", "Subespecialidades"),
+    ("Hemato-Oncología", "Subespecialidades"),
+    ("Neonatología", "Subespecialidades"),
+    ("Cirugía de Mano", "Subespecialidades"),
+]
+
+
+
+def create_base_schema(cursor):
+    """Migración 1: tablas, relaciones y datos básicos del sistema."""
+    # 1. Tabla de Roles
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Roles' AND xtype='U')
+        BEGIN
+            CREATE TABLE Roles(
+                id_rol INT IDENTITY(1,1) PRIMARY KEY,
+                nombre_rol NVARCHAR(50) NOT NULL UNIQUE,
+                descripcion NVARCHAR(255) NULL,
+                permisos NVARCHAR(MAX) NULL
+            )
+        END
+    """)
+    
+    # 2. Tabla de Usuarios
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Usuarios' AND xtype='U')
+        BEGIN
+            CREATE TABLE Usuarios(
+                id_usuario INT IDENTITY(1,1) PRIMARY KEY,
+                nombre_completo NVARCHAR(100) NOT NULL,
+                usuario_login NVARCHAR(50) NOT NULL UNIQUE,
+                contraseña NVARCHAR(255) NOT NULL,
+                id_rol INT NOT NULL,
+                cedula NVARCHAR(20) NULL UNIQUE,
+                telefono NVARCHAR(20) NULL,
+                gmail NVARCHAR(100) NULL UNIQUE,
+                tipo_usuario NVARCHAR(20) NULL CHECK (tipo_usuario IN ('admin', 'medico', 'recepcion', 'paciente')),
+                activo BIT DEFAULT 1,
+                fecha_creacion DATETIME DEFAULT GETDATE(),
+                fecha_actualizacion DATETIME NULL,
+                foto_perfil NVARCHAR(255) NULL
+            )
+        END
+    """)
+    
+    # 3. Tabla de Especialidades
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Especialidades' AND xtype='U')
+        BEGIN
+            CREATE TABLE Especialidades(
+                id_especialidad INT IDENTITY(1,1) PRIMARY KEY,
+                nombre_especialidad NVARCHAR(100) NOT NULL UNIQUE,
+                tipo_especialidad NVARCHAR(50) NULL
+            )
+        END
+    """)
+    
+    # 4. Tabla de Médicos
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Medicos' AND xtype='U')
+        BEGIN
+            CREATE TABLE Medicos(
+                id_medico INT IDENTITY(1,1) PRIMARY KEY,
+                id_usuario INT NOT NULL UNIQUE,
+                especialidad NVARCHAR(100) NULL,
+                numero_colegiado NVARCHAR(50) NULL UNIQUE,
+                años_experiencia INT NULL,
+                estado NVARCHAR(1) DEFAULT 'A' CHECK (estado IN ('I', 'A')),
+                fecha_creacion DATETIME DEFAULT GETDATE(),
+                fecha_actualizacion DATETIME NULL
+            )
+        END
+    """)
+    
+    # 5. Tabla de Pacientes
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Pacientes' AND xtype='U')
+        BEGIN
+            CREATE TABLE Pacientes(
+                id_paciente INT IDENTITY(1,1) PRIMARY KEY,
+                id_usuario INT NOT NULL UNIQUE,
+                fecha_nacimiento DATE NULL,
+                genero NVARCHAR(10) NULL,
+                tipo_sangre NVARCHAR(5) NULL,
+                alergias NVARCHAR(500) NULL,
+                enfermedades_cronicas NVARCHAR(500) NULL,
+                contacto_emergencia NVARCHAR(100) NULL,
+                telefono_emergencia NVARCHAR(20) NULL,
+                estado NVARCHAR(1) DEFAULT 'A' CHECK (estado IN ('I', 'A')),
+                fecha_creacion DATETIME DEFAULT GETDATE(),
+                fecha_actualizacion DATETIME NULL
+            )
+        END
+    """)
+    
+    # 6. Tabla de Citas
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Citas' AND xtype='U')
+        BEGIN
+            CREATE TABLE Citas(
+                id_cita INT IDENTITY(1,1) PRIMARY KEY,
+                id_medico INT NOT NULL,
+                id_paciente INT NOT NULL,
+                fecha_cita DATE NOT NULL,
+                hora_cita TIME(7) NOT NULL,
+                motivo_consulta VARCHAR(255) NULL,
+                fecha_creacion DATETIME DEFAULT GETDATE(),
+                fecha_actualizacion DATETIME NULL,
+                estado VARCHAR(20) DEFAULT 'pendiente' NULL,
+                notas TEXT NULL
+            )
+        END
+    """)
+
+    # 7. Tabla de Horarios Disponibles
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Horarios_disponibles' AND xtype='U')
+        BEGIN
+            CREATE TABLE Horarios_disponibles(
+                id_horario INT IDENTITY(1,1) PRIMARY KEY,
+                id_medico INT NOT NULL,
+                dia_semana NVARCHAR(20) NOT NULL,
+                hora_inicio TIME(7) NOT NULL,
+                hora_fin TIME(7) NOT NULL
+            )
+        END
+    """)
+
+    # 8. Tabla de Password Reset Tokens
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Password_reset_tokens' AND xtype='U')
+        BEGIN
+            CREATE TABLE Password_reset_tokens(
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                id_usuario INT NOT NULL,
+                token NVARCHAR(100) NOT NULL,
+                expiration DATETIME NOT NULL,
+                used BIT DEFAULT 0,
+                created_at DATETIME DEFAULT GETDATE()
+            )
+        END
+    """)
+
+    # 9. Crear relaciones FOREIGN KEY
+    foreign_keys = [
+        "ALTER TABLE Medicos ADD CONSTRAINT FK_Medicos_Usuarios FOREIGN KEY(id_usuario) REFERENCES Usuarios(id_usuario)",
+        "ALTER TABLE Pacientes ADD CONSTRAINT FK_Pacientes_Usuarios FOREIGN KEY(id_usuario) REFERENCES Usuarios(id_usuario)",
+        "ALTER TABLE Usuarios ADD CONSTRAINT FK_Usuarios_Roles FOREIGN KEY(id_rol) REFERENCES Roles(id_rol)",
+        "ALTER TABLE Citas ADD CONSTRAINT FK_Citas_Medicos FOREIGN KEY(id_medico) REFERENCES Medicos(id_medico)",
+        "ALTER TABLE Citas ADD CONSTRAINT FK_Citas_Pacientes FOREIGN KEY(id_paciente) REFERENCES Pacientes(id_paciente)",
+        "ALTER TABLE Horarios_disponibles ADD CONSTRAINT FK_Horarios_Medicos FOREIGN KEY(id_medico) REFERENCES Medicos(id_medico)",
+        "ALTER TABLE Password_reset_tokens ADD CONSTRAINT FK_Tokens_Usuarios FOREIGN KEY(id_usuario) REFERENCES Usuarios(id_usuario)"
+    ]
+    
+    for fk_sql in foreign_keys:
+        fk_name = fk_sql.split(" ")[5]
+        check_sql = f"IF NOT EXISTS (SELECT * FROM sys.foreign_keys WHERE name = '{fk_name}') BEGIN {fk_sql} END"
+        cursor.execute(check_sql)
+
+    # Insertar datos básicos
+    logging.info("Insertando datos básicos (roles, admin)...")
+    cursor.execute("""
+        IF NOT EXISTS (SELECT 1 FROM Roles WHERE nombre_rol = 'Administrador')
+            INSERT INTO Roles (nombre_rol, descripcion) VALUES ('Administrador', 'Acceso completo al sistema');
+        IF NOT EXISTS (SELECT 1 FROM Roles WHERE nombre_rol = 'Médico')
+            INSERT INTO Roles (nombre_rol, descripcion) VALUES ('Médico', 'Personal médico');
+        IF NOT EXISTS (SELECT 1 FROM Roles WHERE nombre_rol = 'Recepcionista')
+            INSERT INTO Roles (nombre_rol, descripcion) VALUES ('Recepcionista', 'Personal de recepción');
+        IF NOT EXISTS (SELECT 1 FROM Roles WHERE nombre_rol = 'Paciente')
+            INSERT INTO Roles (nombre_rol, descripcion) VALUES ('Paciente', 'Paciente del sistema');
+    """)
+
+    cursor.execute("""
+        IF NOT EXISTS (SELECT 1 FROM Usuarios WHERE usuario_login = 'admin')
+        BEGIN
+            DECLARE @admin_rol_id INT = (SELECT id_rol FROM Roles WHERE nombre_rol = 'Administrador');
+            INSERT INTO Usuarios (nombre_completo, usuario_login, contraseña, id_rol, tipo_usuario, activo)
+            VALUES ('Administrador Principal', 'admin', 'pbkdf2:sha256:600000$zY8vEw2aJq3nB4cR$c9a396e214c4bb3e3f3c8c3feb2f75c44583f5f8a4051151978182e5f034b631', @admin_rol_id, 'admin', 1);
+        END
+    """)
+    
+    logging.info("Insertando especialidades médicas si no existen...")
+    for name, specialty_type in SPECIALTIES:
+        cursor.execute("IF NOT EXISTS (SELECT 1 FROM Especialidades WHERE nombre_especialidad = ?) INSERT INTO Especialidades (nombre_especialidad, tipo_especialidad) VALUES (?, ?)", (name, name, specialty_type))
+
+
+def create_base_schema_sqlite(cursor):
+    """Migración 1 para SQLite: mismas tablas, relaciones y datos básicos que create_base_schema."""
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS Roles(
+            id_rol INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_rol NVARCHAR(50) NOT NULL UNIQUE,
+            descripcion NVARCHAR(255) NULL,
+            permisos NVARCHAR(4000) NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Usuarios(
+            id_usuario INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_completo NVARCHAR(100) NOT NULL,
+            usuario_login NVARCHAR(50) NOT NULL UNIQUE,
+            contraseña NVARCHAR(255) NOT NULL,
+            id_rol INT NOT NULL REFERENCES Roles(id_rol),
+            cedula NVARCHAR(20) NULL UNIQUE,
+            telefono NVARCHAR(20) NULL,
+            gmail NVARCHAR(100) NULL UNIQUE,
+            tipo_usuario NVARCHAR(20) NULL CHECK (tipo_usuario IN ('admin', 'medico', 'recepcion', 'paciente')),
+            activo BIT DEFAULT 1,
+            fecha_creacion DATETIME DEFAULT (datetime('now', 'localtime')),
+            fecha_actualizacion DATETIME NULL,
+            foto_perfil NVARCHAR(255) NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Especialidades(
+            id_especialidad INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_especialidad NVARCHAR(100) NOT NULL UNIQUE,
+            tipo_especialidad NVARCHAR(50) NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Medicos(
+            id_medico INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_usuario INT NOT NULL UNIQUE REFERENCES Usuarios(id_usuario),
+            especialidad NVARCHAR(100) NULL,
+            numero_colegiado NVARCHAR(50) NULL UNIQUE,
+            años_experiencia INT NULL,
+            estado NVARCHAR(1) DEFAULT 'A' CHECK (estado IN ('I', 'A')),
+            fecha_creacion DATETIME DEFAULT (datetime('now', 'localtime')),
+            fecha_actualizacion DATETIME NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Pacientes(
+            id_paciente INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_usuario INT NOT NULL UNIQUE REFERENCES Usuarios(id_usuario),
+            fecha_nacimiento DATE NULL,
+            genero NVARCHAR(10) NULL,
+            tipo_sangre NVARCHAR(5) NULL,
+            alergias NVARCHAR(500) NULL,
+            enfermedades_cronicas NVARCHAR(500) NULL,
+            contacto_emergencia NVARCHAR(100) NULL,
+            telefono_emergencia NVARCHAR(20) NULL,
+            estado NVARCHAR(1) DEFAULT 'A' CHECK (estado IN ('I', 'A')),
+            fecha_creacion DATETIME DEFAULT (datetime('now', 'localtime')),
+            fecha_actualizacion DATETIME NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Citas(
+            id_cita INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_medico INT NOT NULL REFERENCES Medicos(id_medico),
+            id_paciente INT NOT NULL REFERENCES Pacientes(id_paciente),
+            fecha_cita DATE NOT NULL,
+            hora_cita TIME NOT NULL,
+            motivo_consulta VARCHAR(255) NULL,
+            fecha_creacion DATETIME DEFAULT (datetime('now', 'localtime')),
+            fecha_actualizacion DATETIME NULL,
+            estado VARCHAR(20) DEFAULT 'pendiente' NULL,
+            notas TEXT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Horarios_disponibles(
+            id_horario INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_medico INT NOT NULL REFERENCES Medicos(id_medico),
+            dia_semana NVARCHAR(20) NOT NULL,
+            hora_inicio TIME NOT NULL,
+            hora_fin TIME NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Password_reset_tokens(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_usuario INT NOT NULL REFERENCES Usuarios(id_usuario),
+            token NVARCHAR(100) NOT NULL,
+            expiration DATETIME NOT NULL,
+            used BIT DEFAULT 0,
+            created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+        )
+        """,
+    ]
+    for statement in statements:
+        cursor.execute(statement)
+
+    # Datos básicos: las columnas UNIQUE hacen que INSERT OR IGNORE sea idempotente
+    roles = [
+        ('Administrador', 'Acceso completo al sistema'),
+        ('Médico', 'Personal médico'),
+        ('Recepcionista', 'Personal de recepción'),
+        ('Paciente', 'Paciente del sistema'),
+    ]
+    cursor.executemany("INSERT OR IGNORE INTO Roles (nombre_rol, descripcion) VALUES (?, ?)", roles)
+    cursor.execute("""
+        INSERT OR IGNORE INTO Usuarios (nombre_completo, usuario_login, contraseña, id_rol, tipo_usuario, activo)
+        SELECT 'Administrador Principal', 'admin', 'pbkdf2:sha256:600000$zY8vEw2aJq3nB4cR$c9a396e214c4bb3e3f3c8c3feb2f75c44583f5f8a4051151978182e5f034b631', id_rol, 'admin', 1
+        FROM Roles WHERE nombre_rol = 'Administrador'
+    """)
+    cursor.executemany("INSERT OR IGNORE INTO Especialidades (nombre_especialidad, tipo_especialidad) VALUES (?, ?)", SPECIALTIES)
+
+
+# Migración 2: índices para los predicados de appointments.py, dashboard.py y reports.py.
+# Medicos(id_usuario) y Pacientes(id_usuario) ya quedan indexados por sus restricciones UNIQUE.
+HOT_PATH_INDEXES = [
+    # Disponibilidad, conflictos de horario y agenda del médico (WHERE id_medico = ? AND fecha_cita = ? [AND hora_cita = ?])
+    create_index('IX_Citas_Medico_Fecha_Hora', 'Citas', '(id_medico, fecha_cita, hora_cita) INCLUDE (estado, id_paciente)'),
+    # Citas de hoy, reportes por rango de fechas y gráficas del dashboard (WHERE fecha_cita BETWEEN ? AND ?)
+    create_index('IX_Citas_Fecha_Estado', 'Citas', '(fecha_cita, estado) INCLUDE (hora_cita, id_medico, id_paciente)'),
+    # Contadores por estado (WHERE estado = 'pendiente', GROUP BY estado)
+    create_index('IX_Citas_Estado_Fecha', 'Citas', '(estado, fecha_cita)'),
+    # Citas del paciente
+    create_index('IX_Citas_Paciente_Fecha', 'Citas', '(id_paciente, fecha_cita, hora_cita) INCLUDE (estado, id_medico)'),
+    # Actividad reciente (ORDER BY fecha_creacion DESC)
+    create_index('IX_Citas_FechaCreacion', 'Citas', '(fecha_creacion DESC)'),
+    # Validación de horario al crear o reprogramar citas
+    create_index('IX_Horarios_Medico_Dia', 'Horarios_disponibles', '(id_medico, dia_semana) INCLUDE (hora_inicio, hora_fin)'),
+    # Médicos y pacientes activos más recientes del dashboard
+    create_index('IX_Medicos_Estado_Fecha', 'Medicos', '(estado, fecha_creacion DESC)'),
+    create_index('IX_Pacientes_Estado_Fecha', 'Pacientes', '(estado, fecha_creacion DESC)'),
+    # Reportes de pacientes (WHERE tipo_usuario = 'paciente' AND fecha_creacion BETWEEN ? AND ?)
+    create_index('IX_Usuarios_Tipo_Fecha', 'Usuarios', '(tipo_usuario, fecha_creacion)'),
+    # Recuperación de contraseña (WHERE token = ?)
+    create_index('IX_Password_reset_tokens_Token', 'Password_reset_tokens', '(token) INCLUDE (id_usuario, expiration, used)'),
+]
+
+# Migración 3: tabla de asistencias de médicos. asistencia.py la usa, pero hasta ahora
+# solo existía en las bases restauradas desde respaldo/, no en una instalación nueva.
+ASISTENCIAS_TABLE = [
+    {
+        'mssql': """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Asistencias' AND xtype='U')
+            BEGIN
+                CREATE TABLE Asistencias(
+                    id_asistencia INT IDENTITY(1,1) PRIMARY KEY,
+                    id_medico INT NOT NULL,
+                    fecha DATE NOT NULL,
+                    hora_entrada TIME(7) NULL,
+                    hora_salida TIME(7) NULL,
+                    estado_asistencia NVARCHAR(20) NOT NULL CHECK (estado_asistencia IN ('Tarde', 'Ausente', 'Asistió')),
+                    CONSTRAINT FK_Asistencias_Medicos FOREIGN KEY(id_medico) REFERENCES Medicos(id_medico)
+                )
+            END
+        """,
+        'sqlite': """
+            CREATE TABLE IF NOT EXISTS Asistencias(
+                id_asistencia INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_medico INT NOT NULL REFERENCES Medicos(id_medico),
+                fecha DATE NOT NULL,
+                hora_entrada TIME NULL,
+                hora_salida TIME NULL,
+                estado_asistencia NVARCHAR(20) NOT NULL CHECK (estado_asistencia IN ('Tarde', 'Ausente', 'Asistió'))
+            )
+        """,
+    },
+    create_index('IX_Asistencias_Medico_Fecha', 'Asistencias', '(id_medico, fecha) INCLUDE (estado_asistencia)'),
+]
+
+def add_computed_date_column(table, column, source):
+    """Columna calculada con el día de una columna DATETIME, solo si aún no existe."""
+    def add_sqlite(cursor):
+        cursor.execute(f"PRAGMA table_xinfo({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            # SQLite solo admite columnas generadas VIRTUAL en ALTER TABLE; se pueden indexar igual
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} DATE GENERATED ALWAYS AS (date({source})) VIRTUAL")
+
+    return {
+        'mssql': (
+            f"IF COL_LENGTH('{table}', '{column}') IS NULL "
+            f"ALTER TABLE {table} ADD {column} AS CAST({source} AS DATE) PERSISTED"
+        ),
+        'sqlite': add_sqlite,
+    }
+
+# Migración 4: filtros y agrupaciones por día de alta (ver date_ranges.py). Los filtros
+# usan rangos semiabiertos sobre fecha_creacion; las series por día agrupan por la
+# columna calculada fecha_creacion_dia en lugar de CAST(fecha_creacion AS DATE).
+CREATION_DATE_KEYS = [
+    add_computed_date_column('Usuarios', 'fecha_creacion_dia', 'fecha_creacion'),
+    add_computed_date_column('Pacientes', 'fecha_creacion_dia', 'fecha_creacion'),
+    # Serie diaria del reporte de nuevos pacientes (WHERE tipo_usuario = 'paciente' GROUP BY fecha_creacion_dia)
+    create_index('IX_Usuarios_Tipo_FechaDia', 'Usuarios', '(tipo_usuario, fecha_creacion_dia)'),
+    create_index('IX_Pacientes_FechaDia', 'Pacientes', '(fecha_creacion_dia)'),
+    # Pacientes por fecha de alta sin filtrar por estado (listado detallado, nuevos del mes)
+    create_index('IX_Pacientes_FechaCreacion', 'Pacientes', '(fecha_creacion) INCLUDE (estado, id_usuario)'),
+]
+
+def backfill_activity_events(cursor):
+    """
+    Carga en Eventos_actividad las altas más recientes que ya existían, para que
+    el feed no arranque vacío. Solo si la tabla está vacía.
+    """
+    cursor.execute("SELECT TOP 1 1 FROM Eventos_actividad")
+    if cursor.fetchone():
+        return
+
+    # Las mismas altas que mostraba el feed anterior (médicos y pacientes activos, últimas citas)
+    cursor.execute("""
+        SELECT TOP 50 'Médico', 'creado', m.id_medico, u.nombre_completo, m.especialidad, m.estado, m.fecha_creacion
+        FROM Medicos m
+        JOIN Usuarios u ON m.id_usuario = u.id_usuario
+        WHERE m.estado = 'A'
+        ORDER BY m.fecha_creacion DESC
+    """)
+    events = cursor.fetchall()
+    cursor.execute("""
+        SELECT TOP 50 'Paciente', 'creado', p.id_paciente, u.nombre_completo, NULL, p.estado, p.fecha_creacion
+        FROM Pacientes p
+        JOIN Usuarios u ON p.id_usuario = u.id_usuario
+        WHERE p.estado = 'A'
+        ORDER BY p.fecha_creacion DESC
+    """)
+    events += cursor.fetchall()
+    cursor.execute("""
+        SELECT TOP 50 'Cita', 'creada', c.id_cita, up.nombre_completo, um.nombre_completo, c.estado, c.fecha_creacion
+        FROM Citas c
+        JOIN Pacientes p ON c.id_paciente = p.id_paciente
+        JOIN Usuarios up ON p.id_usuario = up.id_usuario
+        JOIN Medicos m ON c.id_medico = m.id_medico
+        JOIN Usuarios um ON m.id_usuario = um.id_usuario
+        ORDER BY c.fecha_creacion DESC
+    """)
+    events += cursor.fetchall()
+
+    # En orden cronológico, para que id_evento siga el orden de las altas
+    events = sorted((tuple(row) for row in events if row[6] is not None), key=lambda row: str(row[6]))
+    if events:
+        cursor.executemany("""
+            INSERT INTO Eventos_actividad (tipo, accion, id_entidad, nombre, detalle, estado, fecha_evento)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, events)
+
+
+# Migración 5: registro de actividad del dashboard (ver activity.py). La clave primaria
+# agrupada sobre id_evento ya ordena el feed; no hace falta otro índice.
+ACTIVITY_EVENTS_TABLE = [
+    {
+        'mssql': """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Eventos_actividad' AND xtype='U')
+            BEGIN
+                CREATE TABLE Eventos_actividad(
+                    id_evento BIGINT IDENTITY(1,1) PRIMARY KEY,
+                    fecha_evento DATETIME NOT NULL DEFAULT GETDATE(),
+                    tipo NVARCHAR(20) NOT NULL,
+                    accion NVARCHAR(20) NOT NULL,
+                    id_entidad INT NOT NULL,
+                    nombre NVARCHAR(100) NULL,
+                    detalle NVARCHAR(100) NULL,
+                    estado NVARCHAR(20) NULL
+                )
+            END
+        """,
+        'sqlite': """
+            CREATE TABLE IF NOT EXISTS Eventos_actividad(
+                id_evento INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha_evento DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+                tipo NVARCHAR(20) NOT NULL,
+                accion NVARCHAR(20) NOT NULL,
+                id_entidad INT NOT NULL,
+                nombre NVARCHAR(100) NULL,
+                detalle NVARCHAR(100) NULL,
+                estado NVARCHAR(20) NULL
+            )
+        """,
+    },
+    backfill_activity_events,
+]
+
+# Registros de un médico en un día que ya tiene otro registro
+_DUPLICATE_ATTENDANCE = """
+    SELECT a.id_medico, a.fecha, a.id_asistencia
+    FROM Asistencias a
+    WHERE EXISTS (
+        SELECT 1 FROM Asistencias b
+        WHERE b.id_medico = a.id_medico AND b.fecha = a.fecha AND b.id_asistencia <> a.id_asistencia
+    )
+    ORDER BY a.id_medico, a.fecha, a.id_asistencia
+"""
+
+# Grupos que se listan en el mensaje de error; el resto solo en el log
+DUPLICATE_GROUPS_IN_MESSAGE = 20
+
+def check_duplicate_attendance(cursor):
+    """
+    La restricción única necesita un solo registro por médico y día. Si hay
+    repetidos la migración se detiene (y se deshace) indicando cuáles: son datos
+    clínicos y hay que unificarlos a mano antes de volver a ejecutarla.
+    """
+    cursor.execute(_DUPLICATE_ATTENDANCE)
+    groups = {}
+    for id_medico, fecha, id_asistencia in cursor.fetchall():
+        groups.setdefault((id_medico, str(fecha)[:10]), []).append(id_asistencia)
+    if not groups:
+        return
+    details = [f"médico {id_medico}, fecha {fecha}: id_asistencia {', '.join(map(str, ids))}"
+               for (id_medico, fecha), ids in groups.items()]
+    for detail in details:
+        logging.error(f"Asistencia duplicada: {detail}")
+    shown = '; '.join(details[:DUPLICATE_GROUPS_IN_MESSAGE])
+    if len(details) > DUPLICATE_GROUPS_IN_MESSAGE:
+        shown += f"; ... y {len(details) - DUPLICATE_GROUPS_IN_MESSAGE} más (ver el log)"
+    raise MigrationError(f"Asistencias tiene {len(details)} pares de médico y fecha con más de un registro: {shown}. "
+                         f"Unifíquelos (un registro por médico y día) y vuelva a ejecutar init_database.py")
+
+# Migración 6: una asistencia por médico y día garantizada por la base de datos (el registro
+# por lotes de asistencia.py inserta sin comprobar antes) e índice por fecha para el resumen mensual.
+# La restricción única reemplaza a IX_Asistencias_Medico_Fecha.
+ATTENDANCE_UNIQUE_DAY = [
+    check_duplicate_attendance,
+    {
+        'mssql': (
+            "IF OBJECT_ID('UQ_Asistencias_Medico_Fecha', 'UQ') IS NULL "
+            "ALTER TABLE Asistencias ADD CONSTRAINT UQ_Asistencias_Medico_Fecha UNIQUE (id_medico, fecha)"
+        ),
+        'sqlite': "CREATE UNIQUE INDEX IF NOT EXISTS UQ_Asistencias_Medico_Fecha ON Asistencias (id_medico, fecha)",
+    },
+    {
+        'mssql': (
+            "IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Asistencias_Medico_Fecha' AND object_id = OBJECT_ID('Asistencias')) "
+            "DROP INDEX IX_Asistencias_Medico_Fecha ON Asistencias"
+        ),
+        'sqlite': "DROP INDEX IF EXISTS IX_Asistencias_Medico_Fecha",
+    },
+    create_index('IX_Asistencias_Fecha', 'Asistencias', '(fecha) INCLUDE (id_medico, estado_asistencia, hora_entrada, hora_salida)'),
+]
+
+def _fold(text):
+    """Sin acentos, espacios ni mayúsculas."""
+    text = unicodedata.normalize('NFKD', text.strip())
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+
+
+_FOLDED_DAYS = {_fold(name): number for number, name in DAY_NAMES.items()}
+
+
+def _weekday_number(value):
+    """
+    Número de día (1-7) de un dia_semana guardado como texto, o None. Acepta
+    'Miercoles', 'SÁBADO', el número como texto y los nombres que quedaron mal
+    codificados ('MiÃ©rcoles', 'S?bado').
+    """
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text) if 1 <= int(text) <= 7 else None
+    try:
+        # UTF-8 leído como Latin-1
+        text = text.encode('latin-1').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        pass
+    folded = _fold(text)
+    if folded in _FOLDED_DAYS:
+        return _FOLDED_DAYS[folded]
+    # Acento perdido al convertir de página de códigos: '?' o '\ufffd' en su lugar
+    for name, number in _FOLDED_DAYS.items():
+        if len(name) == len(folded) and all(a == b or b in '?\ufffd' for a, b in zip(name, folded)):
+            return number
+    return None
+
+
+def backfill_weekday_numbers(cursor):
+    """
+    Llena dia_semana_num a partir del nombre del día. Si algún bloque tiene un
+    día irreconocible la migración se detiene (y se deshace) indicando cuáles:
+    hay que corregirlos a mano antes de volver a ejecutarla.
+    """
+    cursor.execute("SELECT id_horario, dia_semana FROM Horarios_disponibles WHERE dia_semana_num IS NULL")
+    unknown = {}
+    for id_horario, name in cursor.fetchall():
+        if _weekday_number(name) is None:
+            unknown.setdefault(name, []).append(id_horario)
+    if unknown:
+        detail = '; '.join(f"{name!r} (id_horario {', '.join(map(str, ids))})" for name, ids in unknown.items())
+        raise MigrationError(f"Horarios_disponibles tiene días de la semana no reconocidos: {detail}. "
+                             f"Corríjalos (p. ej. 'Lunes') y vuelva a ejecutar init_database.py")
+
+    cursor.execute("SELECT DISTINCT dia_semana FROM Horarios_disponibles WHERE dia_semana_num IS NULL")
+    for (name,) in cursor.fetchall():
+        cursor.execute(
+            "UPDATE Horarios_disponibles SET dia_semana_num = ? WHERE dia_semana_num IS NULL AND dia_semana = ?",
+            (_weekday_number(name), name),
+        )
+
+
+def _drop_sqlite_column(table, column):
+    """Elimina una columna normal (no generada) si existe."""
+    def drop(cursor):
+        cursor.execute(f"PRAGMA table_xinfo({table})")
+        # hidden: 0 columna normal, 2 y 3 columnas generadas
+        if any(row[1] == column and row[6] == 0 for row in cursor.fetchall()):
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+    return drop
+
+
+def _add_sqlite_column(table, column, definition):
+    def add(cursor):
+        cursor.execute(f"PRAGMA table_xinfo({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return add
+
+
+# Nombre del día a partir del número, para la columna calculada dia_semana
+WEEKDAY_NAME_SQL = "CASE dia_semana_num " + " ".join(
+    f"WHEN {number} THEN N'{name}'" for number, name in DAY_NAMES.items()) + " END"
+
+# Migración 7: Horarios_disponibles guarda el día como número (1 = Lunes ... 7 = Domingo).
+# Las búsquedas y el orden pasan a ser comparaciones de enteros y la búsqueda de bloques
+# de un médico y día es una búsqueda en IX_Horarios_Medico_DiaNum. dia_semana queda
+# como columna calculada con el nombre, para las consultas y respaldos que aún la leen;
+# ya no se puede escribir.
+WEEKDAY_NUMBER = [
+    {
+        'mssql': (
+            "IF COL_LENGTH('Horarios_disponibles', 'dia_semana_num') IS NULL "
+            "ALTER TABLE Horarios_disponibles ADD dia_semana_num TINYINT NULL"
+        ),
+        'sqlite': _add_sqlite_column('Horarios_disponibles', 'dia_semana_num',
+                                     'INTEGER NULL CHECK (dia_semana_num BETWEEN 1 AND 7)'),
+    },
+    backfill_weekday_numbers,
+    {
+        'mssql': (
+            "IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Horarios_Medico_Dia' AND object_id = OBJECT_ID('Horarios_disponibles')) "
+            "DROP INDEX IX_Horarios_Medico_Dia ON Horarios_disponibles"
+        ),
+        'sqlite': "DROP INDEX IF EXISTS IX_Horarios_Medico_Dia",
+    },
+    {
+        'mssql': (
+            "IF COLUMNPROPERTY(OBJECT_ID('Horarios_disponibles'), 'dia_semana', 'IsComputed') = 0 "
+            "ALTER TABLE Horarios_disponibles DROP COLUMN dia_semana"
+        ),
+        'sqlite': _drop_sqlite_column('Horarios_disponibles', 'dia_semana'),
+    },
+    # SQLite no puede cambiar la nulabilidad ni agregar restricciones con ALTER TABLE;
+    # ahí el CHECK quedó en la definición de la columna
+    {
+        'mssql': (
+            "IF COLUMNPROPERTY(OBJECT_ID('Horarios_disponibles'), 'dia_semana_num', 'AllowsNull') = 1 "
+            "ALTER TABLE Horarios_disponibles ALTER COLUMN dia_semana_num TINYINT NOT NULL"
+        ),
+        'sqlite': None,
+    },
+    {
+        'mssql': (
+            "IF OBJECT_ID('CK_Horarios_DiaSemanaNum', 'C') IS NULL "
+            "ALTER TABLE Horarios_disponibles ADD CONSTRAINT CK_Horarios_DiaSemanaNum CHECK (dia_semana_num BETWEEN 1 AND 7)"
+        ),
+        'sqlite': None,
+    },
+    {
+        'mssql': (
+            "IF COL_LENGTH('Horarios_disponibles', 'dia_semana') IS NULL "
+            f"ALTER TABLE Horarios_disponibles ADD dia_semana AS ({WEEKDAY_NAME_SQL})"
+        ),
+        'sqlite': _add_sqlite_column('Horarios_disponibles', 'dia_semana',
+                                     f"NVARCHAR(20) GENERATED ALWAYS AS ({WEEKDAY_NAME_SQL}) VIRTUAL"),
+    },
+    create_index('IX_Horarios_Medico_DiaNum', 'Horarios_disponibles', '(id_medico, dia_semana_num, hora_inicio) INCLUDE (hora_fin)'),
+]
+
+# Importaciones de pacientes en segundo plano (ver patient_import.py): el avance se
+# actualiza con cada lote confirmado y el reporte final queda en JSON
+PATIENT_IMPORTS_TABLE = [
+    {
+        'mssql': """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Importaciones_pacientes' AND xtype='U')
+            BEGIN
+                CREATE TABLE Importaciones_pacientes(
+                    id_importacion INT IDENTITY(1,1) PRIMARY KEY,
+                    id_usuario INT NULL REFERENCES Usuarios(id_usuario),
+                    estado NVARCHAR(20) NOT NULL DEFAULT 'en_curso'
+                        CHECK (estado IN ('en_curso', 'completada', 'error')),
+                    fecha_inicio DATETIME NOT NULL DEFAULT GETDATE(),
+                    fecha_actualizacion DATETIME NOT NULL DEFAULT GETDATE(),
+                    filas INT NOT NULL DEFAULT 0,
+                    importados INT NOT NULL DEFAULT 0,
+                    rechazadas INT NOT NULL DEFAULT 0,
+                    reporte NVARCHAR(MAX) NULL
+                )
+            END
+        """,
+        'sqlite': """
+            CREATE TABLE IF NOT EXISTS Importaciones_pacientes(
+                id_importacion INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_usuario INT NULL REFERENCES Usuarios(id_usuario),
+                estado NVARCHAR(20) NOT NULL DEFAULT 'en_curso'
+                    CHECK (estado IN ('en_curso', 'completada', 'error')),
+                fecha_inicio DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+                fecha_actualizacion DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+                filas INT NOT NULL DEFAULT 0,
+                importados INT NOT NULL DEFAULT 0,
+                rechazadas INT NOT NULL DEFAULT 0,
+                reporte TEXT NULL
+            )
+        """,
+    },
+]
+
+# Usuarios.gmail es opcional, pero en SQL Server una restricción UNIQUE admite un
+# solo NULL: el segundo usuario sin correo (importación de pacientes, alta por el
+# administrador) fallaba con 2627. Se reemplaza por un índice único filtrado.
+# SQLite ya admite varios NULL en una columna UNIQUE.
+OPTIONAL_UNIQUE_GMAIL = [
+    {
+        'mssql': """
+            DECLARE @constraint NVARCHAR(128), @sql NVARCHAR(400);
+            SELECT @constraint = kc.name
+            FROM sys.key_constraints kc
+            JOIN sys.index_columns ic ON ic.object_id = kc.parent_object_id AND ic.index_id = kc.unique_index_id
+            JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+            WHERE kc.parent_object_id = OBJECT_ID('Usuarios') AND kc.type = 'UQ' AND c.name = 'gmail';
+            IF @constraint IS NOT NULL
+            BEGIN
+                SET @sql = N'ALTER TABLE Usuarios DROP CONSTRAINT ' + QUOTENAME(@constraint);
+                EXEC sp_executesql @sql;
+            END
+        """,
+        'sqlite': None,
+    },
+    {
+        'mssql': (
+            "IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_Usuarios_Gmail' AND object_id = OBJECT_ID('Usuarios')) "
+            "CREATE UNIQUE NONCLUSTERED INDEX UX_Usuarios_Gmail ON Usuarios (gmail) WHERE gmail IS NOT NULL"
+        ),
+        'sqlite': None,
+    },
+]
+
+# Una sola importación de pacientes en curso en toda la aplicación (varios workers
+# de gunicorn o el CLI): una segunda fila 'en_curso' viola el índice. Las filas
+# 'en_curso' repetidas que dejaron workers terminados se cierran antes, salvo la última.
+SINGLE_RUNNING_PATIENT_IMPORT = [
+    """
+        UPDATE Importaciones_pacientes
+        SET estado = 'error',
+            reporte = '{"error": "La importación se interrumpió (el proceso terminó o dejó de responder)"}'
+        WHERE estado = 'en_curso'
+          AND id_importacion < (SELECT MAX(id_importacion) FROM Importaciones_pacientes WHERE estado = 'en_curso')
+    """,
+    {
+        'mssql': (
+            "IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_Importaciones_EnCurso' AND object_id = OBJECT_ID('Importaciones_pacientes')) "
+            "CREATE UNIQUE NONCLUSTERED INDEX UX_Importaciones_EnCurso ON Importaciones_pacientes (estado) WHERE estado = 'en_curso'"
+        ),
+        'sqlite': "CREATE UNIQUE INDEX IF NOT EXISTS UX_Importaciones_EnCurso ON Importaciones_pacientes (estado) WHERE estado = 'en_curso'",
+    },
+]
+
+MIGRATIONS = [
+    (1, 'Esquema base', [{'mssql': create_base_schema, 'sqlite': create_base_schema_sqlite}]),
+    (2, 'Índices para las consultas frecuentes', HOT_PATH_INDEXES),
+    (3, 'Tabla de asistencias', ASISTENCIAS_TABLE),
+    (4, 'Columnas calculadas e índices por fecha de alta', CREATION_DATE_KEYS),
+    (5, 'Registro de actividad del dashboard', ACTIVITY_EVENTS_TABLE),
+    (6, 'Asistencia única por médico y día', ATTENDANCE_UNIQUE_DAY),
+    (7, 'Día de la semana numérico en Horarios_disponibles', WEEKDAY_NUMBER),
+    (8, 'Importaciones de pacientes en segundo plano', PATIENT_IMPORTS_TABLE),
+    (9, 'Correo único solo cuando se indica', OPTIONAL_UNIQUE_GMAIL),
+    (10, 'Una importación de pacientes en curso a la vez', SINGLE_RUNNING_PATIENT_IMPORT),
+]
+
+# Versión más reciente del esquema
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def ensure_version_table(cursor):
+    """Crea la tabla Schema_version si no existe."""
+    if DB_BACKEND == 'sqlite':
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Schema_version(
+                version INT NOT NULL PRIMARY KEY,
+                fecha_aplicacion DATETIME DEFAULT (datetime('now', 'localtime')),
+                descripcion NVARCHAR(255) NULL
+            )
+        """)
+        return
+
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Schema_version' AND xtype='U')
+        BEGIN
+            CREATE TABLE Schema_version(
+                version INT NOT NULL PRIMARY KEY,
+                fecha_aplicacion DATETIME DEFAULT GETDATE()
+            )
+        END
+    """)
+    cursor.execute("""
+        IF COL_LENGTH('Schema_version', 'descripcion') IS NULL
+            ALTER TABLE Schema_version ADD descripcion NVARCHAR(255) NULL
+    """)
+
+
+def get_schema_version(cursor):
+    """Devuelve la versión de esquema registrada, o None si aún no existe."""
+    if DB_BACKEND == 'sqlite':
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name='Schema_version' AND type='table'")
+    else:
+        cursor.execute("SELECT 1 FROM sysobjects WHERE name='Schema_version' AND xtype='U'")
+    if not cursor.fetchone():
+        return None
+    cursor.execute("SELECT MAX(version) FROM Schema_version")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def run_migrations(force=False):
+    """Aplica en orden las migraciones pendientes.
+
+    Cada migración se confirma por separado junto con su registro en Schema_version.
+    Con force=True se vuelven a ejecutar todas (son idempotentes).
+    """
+    conn = get_db_connection()
+    if not conn:
+        logging.error("No se pudo conectar a la base de datos")
+        return False
+
+    try:
+        with conn.cursor() as cursor:
+            current_version = get_schema_version(cursor)
+            if current_version == SCHEMA_VERSION and not force:
+                logging.info(f"Esquema en la versión {SCHEMA_VERSION}, no hay migraciones pendientes.")
+                return True
+
+            ensure_version_table(cursor)
+            conn.commit()
+
+            for version, description, steps in MIGRATIONS:
+                if not force and current_version is not None and version <= current_version:
+                    continue
+
+                logging.info(f"Aplicando migración {version}: {description}")
+                for step in steps:
+                    if isinstance(step, dict):
+                        step = step[DB_BACKEND]
+                    if step is None:
+                        continue
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute("""
+                    INSERT INTO Schema_version (version, descripcion)
+                    SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM Schema_version WHERE version = ?)
+                """, (version, description, version))
+                conn.commit()
+
+            logging.info(f"Esquema actualizado a la versión {SCHEMA_VERSION}.")
+            return True
+
+    except (DatabaseError, MigrationError) as e:
+        conn.rollback()
+        logging.error(f"Error aplicando migraciones: {str(e)}")
+        return False
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    run_migrations(force='--force' in sys.argv)
@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import os
+import threading
+
+from flask import current_app, render_template, request
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from config import JINJA_CACHE_DIR
+
+# Caché de renderizado de las páginas HTML:
+#   - bytecode de las plantillas en disco (JINJA_CACHE_DIR), para que un worker
+#     nuevo no tenga que recompilarlas
+#   - respuesta completa, con su variante gzip ya generada, para las páginas
+#     públicas que no dependen de la sesión (render_cached_page)
+#   - fragmentos {% cache %} para las partes de los dashboards que solo
+#     dependen del rol
+# Con TEMPLATES_AUTO_RELOAD (modo debug) no se cachea nada en memoria.
+
+_lock = threading.Lock()
+_pages = {}
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache 'nombre', clave... %}...{% endcache %}
+
+    Guarda el HTML del bloque por plantilla, nombre y claves (por ejemplo el
+    rol de la sesión). El contenido no debe depender de nada más.
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache={})
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached_fragment', [nodes.List(args)]), [], [], body).set_lineno(lineno)
+
+    def _cached_fragment(self, key, caller):
+        if self.environment.auto_reload:
+            return caller()
+        key = tuple(key)
+        fragment = self.environment.fragment_cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            self.environment.fragment_cache[key] = fragment
+        return fragment
+
+
+def render_cached_page(template_name):
+    """Respuesta de una página sin datos de sesión, renderizada una sola vez por proceso."""
+    if current_app.jinja_env.auto_reload:
+        return render_template(template_name)
+
+    page = _pages.get(template_name)
+    if page is None:
+        html = render_template(template_name).encode('utf-8')
+        etag = hashlib.sha1(html).hexdigest()[:20]
+        page = (html, gzip.compress(html, compresslevel=9, mtime=0), etag)
+        with _lock:
+            _pages[template_name] = page
+    html, gzipped, etag = page
+
+    use_gzip = bool(request.accept_encodings['gzip'])
+    response = current_app.response_class(gzipped if use_gzip else html, mimetype='text/html')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+        etag += '-gz'
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
+
+
+def clear():
+    """Vacía las páginas y fragmentos cacheados en memoria."""
+    with _lock:
+        _pages.clear()
+    current_app.jinja_env.fragment_cache.clear()
+
+
+def init_app(app):
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+    app.jinja_env.add_extension(FragmentCacheExtension)
@@ -0,0 +1,210 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import (PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH, PASSWORD_HASH_WORKERS,
+                    PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_TIMEOUT,
+                    LOGIN_RATE_IDENTIFIER, LOGIN_RATE_IP)
+
+# Hash y verificación de contraseñas fuera de los hilos de las peticiones.
+#
+# PBKDF2 es costoso a propósito (decenas de ms por operación). Se ejecuta en un
+# pool de hilos acotado: hashlib libera el GIL mientras calcula, así que el
+# resto de peticiones sigue avanzando, y como mucho PASSWORD_HASH_WORKERS
+# núcleos se dedican a contraseñas. Si hay más de PASSWORD_HASH_MAX_PENDING
+# operaciones en curso o en cola se responde 503 en lugar de acumular espera.
+#
+# El login además pasa por dos limitadores token bucket (por identificador y
+# por IP) antes de llegar al hash.
+
+
+class PasswordServiceBusy(Exception):
+    """El pool de hash está saturado; la petición debe reintentarse."""
+
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password')
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise PasswordServiceBusy()
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        raise PasswordServiceBusy()
+
+
+def _hash(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD, salt_length=PASSWORD_SALT_LENGTH)
+
+
+def _verify(stored_hash, password):
+    try:
+        return check_password_hash(stored_hash, password)
+    except (ValueError, TypeError) as e:
+        # Hash corrupto o nulo en la base de datos
+        logging.error(f"Hash de contraseña inválido: {e}")
+        return False
+
+
+# Valor de contraseña que no coincide con ninguna: check_password_hash no puede
+# separar método, sal y hash y devuelve False. Lo usan las altas sin contraseña
+# (importación de pacientes) hasta que el usuario la define por recuperación.
+UNUSABLE_PASSWORD = '!'
+
+
+def hash_password(password):
+    """Hash con el método configurado (PASSWORD_HASH_METHOD)."""
+    return _run(_hash, password)
+
+
+def verify_password(stored_hash, password):
+    if not stored_hash or stored_hash == UNUSABLE_PASSWORD:
+        return False
+    return _run(_verify, stored_hash, password)
+
+
+def bulk_executor(workers):
+    """
+    Pool propio para hashes en lote (importación de pacientes): miles de hashes
+    en cola no ocupan los huecos de PASSWORD_HASH_MAX_PENDING que usa el login.
+    """
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-bulk')
+
+
+def submit_hash(executor, password):
+    """Future con el hash de `password` calculado en `executor` (ver bulk_executor)."""
+    return executor.submit(_hash, password)
+
+
+def _iterations(method):
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        # Werkzeug usa 600000 cuando el método no indica las iteraciones
+        return int(parts[2]) if len(parts) > 2 else 600000
+    return None
+
+
+def needs_rehash(stored_hash):
+    """True si el hash usa otro algoritmo o menos iteraciones que PASSWORD_HASH_METHOD."""
+    if not stored_hash or stored_hash.count('$') != 2:
+        return True
+    method = stored_hash.split('$', 1)[0]
+    wanted = PASSWORD_HASH_METHOD.split(':')
+    current = method.split(':')
+    if current[:2] != wanted[:2]:
+        return True
+    return (_iterations(method) or 0) < (_iterations(PASSWORD_HASH_METHOD) or 0)
+
+
+def _rehash(id_usuario, password):
+    from database import get_db_connection, DatabaseError
+
+    new_hash = _hash(password)
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("UPDATE Usuarios SET contraseña = ? WHERE id_usuario = ?", (new_hash, id_usuario))
+        conn.commit()
+        logging.info(f"Contraseña del usuario {id_usuario} actualizada a {PASSWORD_HASH_METHOD}")
+    except DatabaseError as e:
+        logging.error(f"Error al actualizar el hash del usuario {id_usuario}: {str(e)}")
+    finally:
+        conn.close()
+
+
+def rehash_in_background(id_usuario, password):
+    """Recalcula y guarda el hash tras un login correcto, sin hacer esperar la respuesta."""
+    if not _slots.acquire(blocking=False):
+        # Pool saturado: se intentará en el próximo login
+        return
+    future = _executor.submit(_rehash, id_usuario, password)
+    future.add_done_callback(lambda _: _slots.release())
+
+
+class TokenBucketLimiter:
+    """
+    Limitador token bucket por clave: hasta `capacity` intentos seguidos y
+    `capacity` nuevos cada `period` segundos.
+    """
+
+    def __init__(self, capacity, period, max_keys=10000):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Consume un token. Devuelve 0 si se permite o los segundos hasta el próximo token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now):
+        # Los buckets que ya se habrían llenado de nuevo equivalen a no tener entrada
+        full_after = self.capacity / self.rate
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[key]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+def _parse_rate(value):
+    """'5/60' -> (5, 60.0): 5 intentos por cada 60 segundos."""
+    capacity, period = value.split('/')
+    return int(capacity), float(period)
+
+
+identifier_limiter = TokenBucketLimiter(*_parse_rate(LOGIN_RATE_IDENTIFIER))
+ip_limiter = TokenBucketLimiter(*_parse_rate(LOGIN_RATE_IP))
+
+
+def check_login_rate(identifier, ip):
+    """Segundos que debe esperar el cliente, o 0 si el intento se permite."""
+    wait = ip_limiter.acquire(ip or 'desconocida')
+    if wait:
+        return wait
+    return identifier_limiter.acquire(str(identifier).strip().lower())
+
+
+def too_many_attempts_response(wait):
+    response = jsonify({'error': 'Demasiados intentos de inicio de sesión. Intente de nuevo en unos segundos.'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, round(wait)))
+    return response
+
+
+def busy_response():
+    response = jsonify({'error': 'El servidor está ocupado. Intente de nuevo.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def init_app(app):
+    app.register_error_handler(PasswordServiceBusy, lambda e: busy_response())
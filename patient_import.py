@@ -0,0 +1,621 @@
+"""Importación masiva de pacientes desde un CSV (planillas de sucursales nuevas).
+
+Cada fila crea un usuario con rol de paciente y su registro en Pacientes, como
+auth.register y patients.create_paciente, pero por lotes:
+
+  1. El archivo se lee en streaming, PATIENT_IMPORT_BATCH_SIZE filas a la vez,
+     y cada fila se valida con las reglas del alta individual
+     (users.validate_user_data y el formato de cédula y correo del registro).
+  2. Usuario, cédula y correo repetidos se detectan contra conjuntos en memoria
+     cargados de Usuarios una sola vez; las filas aceptadas se agregan a esos
+     conjuntos, así que también se detectan los repetidos dentro del archivo.
+  3. Los hashes de contraseña de un lote se calculan en un pool propio
+     (password_service.bulk_executor) mientras se inserta el lote anterior.
+  4. Cada lote son cinco sentencias: usuarios y pacientes con executemany
+     (fast_executemany en pyodbc: todas las filas en un solo envío), la lectura
+     de los ids generados y los eventos de actividad. El lote se escribe cuando
+     sus hashes ya están calculados y se confirma enseguida: ninguna transacción
+     queda abierta mientras se espera a PBKDF2, que bloquearía Usuarios (y la
+     bitácora del log de transacciones) durante minutos en un archivo grande.
+
+Las filas inválidas o repetidas se informan y no impiden importar las demás. Un
+error de base de datos deshace solo el lote en curso y detiene la importación;
+los lotes anteriores quedan importados y el reporte lo indica en 'error'.
+
+Cada importación (salvo las simulaciones) se registra en Importaciones_pacientes,
+que se actualiza con cada lote. Un índice único sobre las filas 'en_curso' deja
+una sola importación a la vez en toda la aplicación, aunque haya varios workers
+de gunicorn o se use el CLI. Si el proceso que la ejecutaba termina (reinicio del
+worker, despliegue), su fila se marca como 'error' cuando lleva
+PATIENT_IMPORT_STALE_MINUTES sin avanzar, al consultarla o al iniciar otra.
+
+El endpoint ejecuta las importaciones en segundo plano (start_import) y responde
+de inmediato con el id para consultar el avance.
+
+Columnas obligatorias: nombre_completo y cedula. Opcionales: usuario_login (por
+defecto la cédula), contraseña (si falta la cuenta queda sin contraseña válida,
+password_service.UNUSABLE_PASSWORD, y el paciente la define con la recuperación
+de contraseña), gmail, telefono,
+fecha_nacimiento, genero, tipo_sangre, alergias, enfermedades_cronicas,
+contacto_emergencia y telefono_emergencia. El separador puede ser ',' o ';'.
+
+Uso:
+    python patient_import.py pacientes.csv
+    python patient_import.py pacientes.csv --dry-run              # solo valida
+    python patient_import.py pacientes.csv --errores errores.csv  # filas rechazadas a un CSV
+"""
+import argparse
+import codecs
+import csv
+import itertools
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from datetime import date, datetime
+
+from config import (PATIENT_IMPORT_BATCH_SIZE, PATIENT_IMPORT_HASH_WORKERS, PATIENT_IMPORT_MAX_ERRORS,
+                    PATIENT_IMPORT_STALE_MINUTES)
+from database import get_db_connection, is_unique_violation, DatabaseError
+import activity
+import identity_index
+import password_service
+from users import validate_user_data
+from validators import is_valid_cedula, is_valid_email
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('nombre_completo', 'cedula', 'usuario_login', 'contraseña', 'gmail', 'telefono',
+           'fecha_nacimiento', 'genero', 'tipo_sangre', 'alergias', 'enfermedades_cronicas',
+           'contacto_emergencia', 'telefono_emergencia')
+REQUIRED_COLUMNS = ('nombre_completo', 'cedula')
+# Encabezados habituales en las planillas
+COLUMN_ALIASES = {
+    'nombre': 'nombre_completo',
+    'usuario': 'usuario_login',
+    'contrasena': 'contraseña',
+    'password': 'contraseña',
+    'email': 'gmail',
+    'correo': 'gmail',
+}
+
+GENEROS = ('M', 'F', 'O')
+TIPOS_SANGRE = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+# Tamaño de las columnas de texto de Pacientes
+PATIENT_TEXT_LIMITS = {'alergias': 500, 'enfermedades_cronicas': 500,
+                       'contacto_emergencia': 100, 'telefono_emergencia': 20}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+PHONE_SEPARATORS = str.maketrans('', '', ' -().')
+
+# Nombre de cada identificador en los mensajes de duplicados
+IDENTIFIER_LABELS = {'cedula': 'La cédula', 'gmail': 'El correo', 'usuario_login': 'El usuario'}
+
+# Una importación a la vez por proceso: cada una ocupa PATIENT_IMPORT_HASH_WORKERS núcleos
+_lock = threading.Lock()
+
+
+class ImportFileError(ValueError):
+    """El archivo no se puede importar (encabezado o codificación)."""
+
+
+class ImportBusy(Exception):
+    """Ya hay una importación en curso (en este proceso o en otro)."""
+
+
+class ImportExpired(Exception):
+    """La importación se dio por interrumpida (sin avance) mientras seguía en curso."""
+
+
+def _column(name):
+    # 'Cédula', 'Fecha Nacimiento', 'Contraseña' -> cedula, fecha_nacimiento, contraseña
+    column = unicodedata.normalize('NFKD', (name or '').strip().lower())
+    column = ''.join(ch for ch in column if not unicodedata.combining(ch)).replace(' ', '_')
+    return COLUMN_ALIASES.get(column, column)
+
+
+def _normalize_cedula(value):
+    """'12.345.678', 'v12345678' o 'V-12345678' -> 'V-12345678'."""
+    cedula = value.upper().replace('.', '').replace(' ', '')
+    if cedula.isdigit():
+        return 'V-' + cedula
+    if len(cedula) > 1 and cedula[0] in 'VEGJ' and cedula[1:].isdigit():
+        return f'{cedula[0]}-{cedula[1:]}'
+    return cedula
+
+
+def _parse_birth_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def prepare_row(record):
+    """Fila del CSV ({columna: texto}) -> (datos, None) o (None, mensaje de error)."""
+    data = {column: (record.get(column) or '').strip() for column in COLUMNS}
+    data['cedula'] = _normalize_cedula(data['cedula'])
+    data['usuario_login'] = data['usuario_login'] or data['cedula']
+    data['telefono'] = data['telefono'].translate(PHONE_SEPARATORS)
+    data['telefono_emergencia'] = data['telefono_emergencia'].translate(PHONE_SEPARATORS)
+
+    # Como una edición: la contraseña es opcional y se valida aparte
+    error = validate_user_data({**data, 'id_rol': 4}, is_update=True)
+    if error:
+        return None, error[0]['error']
+    if data['contraseña'] and len(data['contraseña']) < 8:
+        return None, 'La contraseña debe tener al menos 8 caracteres'
+    if not is_valid_cedula(data['cedula']):
+        return None, 'Formato de cédula inválido. Use V-12345678'
+    if data['gmail'] and not is_valid_email(data['gmail']):
+        return None, 'Formato de email inválido'
+
+    if data['fecha_nacimiento']:
+        try:
+            data['fecha_nacimiento'] = _parse_birth_date(data['fecha_nacimiento'])
+        except ValueError:
+            return None, 'Fecha de nacimiento inválida. Use AAAA-MM-DD o DD/MM/AAAA'
+        if data['fecha_nacimiento'] > date.today():
+            return None, 'La fecha de nacimiento no puede ser futura'
+    if data['genero']:
+        # 'Masculino', 'femenino', 'M'...
+        data['genero'] = data['genero'][0].upper()
+        if data['genero'] not in GENEROS:
+            return None, 'Género inválido. Use M, F u O'
+    if data['tipo_sangre']:
+        data['tipo_sangre'] = data['tipo_sangre'].upper().replace(' ', '')
+        if data['tipo_sangre'] not in TIPOS_SANGRE:
+            return None, f'Tipo de sangre inválido. Use {", ".join(TIPOS_SANGRE)}'
+    for column, limit in PATIENT_TEXT_LIMITS.items():
+        if len(data[column]) > limit:
+            return None, f'El campo {column} no puede exceder {limit} caracteres'
+
+    # Vacíos como NULL, igual que el alta individual
+    return {column: value or None for column, value in data.items()}, None
+
+
+def _read_header(lines):
+    """Consume el encabezado de `lines` y devuelve (separador, columnas)."""
+    try:
+        header = next(lines, '')
+    except UnicodeDecodeError:
+        raise ImportFileError('El archivo no tiene la codificación indicada (por defecto UTF-8)')
+    if not header.strip():
+        raise ImportFileError('El archivo está vacío')
+    delimiter = max((';', ',', '\t'), key=header.count)
+    columns = [_column(name) for name in next(csv.reader([header], delimiter=delimiter))]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ImportFileError(f'Faltan columnas requeridas: {", ".join(missing)}')
+    return delimiter, columns
+
+
+def _csv_rows(lines):
+    """Filas del CSV como diccionarios por columna, con el separador del encabezado."""
+    delimiter, columns = _read_header(lines)
+    for values in csv.reader(lines, delimiter=delimiter):
+        yield dict(zip(columns, values))
+
+
+class PatientImport:
+    """Una importación: identificadores ya usados, filas rechazadas y métricas."""
+
+    def __init__(self, conn, batch_size=PATIENT_IMPORT_BATCH_SIZE, hash_workers=PATIENT_IMPORT_HASH_WORKERS,
+                 id_importacion=None):
+        self.conn = conn
+        self.cursor = None
+        self.id_importacion = id_importacion
+        self.batch_size = max(1, min(batch_size, 1000))
+        self.hash_workers = max(1, hash_workers)
+        self.errors = []
+        self.imported = []
+        self.rows = 0
+        self.valid = 0
+        self.batches = 0
+        self.timings = {'validacion': 0.0, 'espera_hash': 0.0, 'insercion': 0.0}
+        self._seen = {}
+        self._in_file = {column: {} for column in IDENTIFIER_LABELS}
+
+    def _load_identifiers(self):
+        self.cursor.execute("SELECT cedula, gmail, usuario_login FROM Usuarios")
+        self._seen = {column: set() for column in IDENTIFIER_LABELS}
+        for row in self.cursor.fetchall():
+            for column, value in zip(IDENTIFIER_LABELS, row):
+                if value:
+                    self._seen[column].add(identity_index.normalize(value))
+
+    def _duplicate(self, data):
+        for column, label in IDENTIFIER_LABELS.items():
+            if not data[column]:
+                continue
+            value = identity_index.normalize(data[column])
+            if value in self._in_file[column]:
+                return f'{label} {data[column]} se repite en la fila {self._in_file[column][value]}'
+            if value in self._seen[column]:
+                return f'{label} {data[column]} ya está registrado'
+        return None
+
+    def _accept(self, fila, data):
+        for column in IDENTIFIER_LABELS:
+            if data[column]:
+                self._in_file[column][identity_index.normalize(data[column])] = fila
+
+    def _validate(self, chunk):
+        started = time.perf_counter()
+        accepted = []
+        for fila, record in chunk:
+            if not any(value.strip() for value in record.values() if value):
+                continue
+            self.rows += 1
+            data, error = prepare_row(record)
+            if data is not None:
+                error = self._duplicate(data)
+            if error:
+                self.errors.append({'fila': fila, 'cedula': (record.get('cedula') or '').strip(), 'error': error})
+                continue
+            self._accept(fila, data)
+            accepted.append(data)
+        self.valid += len(accepted)
+        self.timings['validacion'] += time.perf_counter() - started
+        return accepted
+
+    def _insert(self, rows, hashes):
+        # El lote anterior ya se confirmó: la espera no retiene ningún bloqueo
+        started = time.perf_counter()
+        hashed = [future.result() if future else password_service.UNUSABLE_PASSWORD for future in hashes]
+        self.timings['espera_hash'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            self._write(rows, hashed)
+            self.conn.commit()
+        except (DatabaseError, ImportExpired):
+            self.conn.rollback()
+            raise
+        for row in rows:
+            identity_index.record_created(usuario_login=row['usuario_login'], cedula=row['cedula'], gmail=row['gmail'])
+        self.imported.extend(rows)
+        self.batches += 1
+        self.timings['insercion'] += time.perf_counter() - started
+
+    def _write(self, rows, hashed):
+        cursor = self.cursor
+        # Con pyodbc, los parámetros de todas las filas viajan en un solo envío
+        cursor.fast_executemany = True
+        cursor.executemany("""
+            INSERT INTO Usuarios (
+                nombre_completo, usuario_login, contraseña, id_rol,
+                cedula, telefono, gmail, tipo_usuario, activo
+            ) VALUES (?, ?, ?, 4, ?, ?, ?, 'paciente', 1)
+        """, [(row['nombre_completo'], row['usuario_login'], password_hash,
+               row['cedula'], row['telefono'], row['gmail'])
+              for row, password_hash in zip(rows, hashed)])
+
+        logins = [row['usuario_login'] for row in rows]
+        cursor.execute(f"""
+            SELECT usuario_login, id_usuario FROM Usuarios
+            WHERE usuario_login IN ({', '.join('?' * len(logins))})
+        """, logins)
+        user_ids = {identity_index.normalize(login): id_usuario for login, id_usuario in cursor.fetchall()}
+
+        cursor.executemany("""
+            INSERT INTO Pacientes (
+                id_usuario, fecha_nacimiento, genero, tipo_sangre,
+                alergias, enfermedades_cronicas, contacto_emergencia,
+                telefono_emergencia, estado
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'A')
+        """, [(user_ids[identity_index.normalize(row['usuario_login'])], row['fecha_nacimiento'],
+               row['genero'], row['tipo_sangre'], row['alergias'], row['enfermedades_cronicas'],
+               row['contacto_emergencia'], row['telefono_emergencia'])
+              for row in rows])
+
+        ids = list(user_ids.values())
+        cursor.execute(f"""
+            SELECT id_paciente FROM Pacientes
+            WHERE id_usuario IN ({', '.join('?' * len(ids))})
+        """, ids)
+        activity.record_many(cursor, activity.PACIENTE, [row[0] for row in cursor.fetchall()])
+
+        if self.id_importacion:
+            # El avance se confirma junto con el lote
+            cursor.execute("""
+                UPDATE Importaciones_pacientes
+                SET filas = ?, importados = ?, rechazadas = ?, fecha_actualizacion = GETDATE()
+                WHERE id_importacion = ? AND estado = 'en_curso'
+            """, (self.rows, len(self.imported) + len(rows), len(self.errors), self.id_importacion))
+            if cursor.rowcount == 0:
+                # Ya se dio por interrumpida y puede haber empezado otra importación
+                raise ImportExpired('La importación se dio por interrumpida por no registrar avance')
+
+    def run(self, lines, dry_run=False):
+        """
+        Valida e inserta las filas de `lines` (líneas de texto del CSV), con un
+        commit por lote. Con dry_run solo valida y no escribe nada.
+        """
+        records = enumerate(_csv_rows(lines), start=2)  # Fila 1: encabezado
+        executor = None if dry_run else password_service.bulk_executor(self.hash_workers)
+        pending = None
+        try:
+            self.cursor = self.conn.cursor()
+            self._load_identifiers()
+            while True:
+                chunk = list(itertools.islice(records, self.batch_size))
+                if not chunk:
+                    break
+                rows = self._validate(chunk)
+                if dry_run or not rows:
+                    continue
+                # Los hashes de este lote se calculan mientras se inserta el anterior
+                hashes = [password_service.submit_hash(executor, row['contraseña']) if row['contraseña'] else None
+                          for row in rows]
+                if pending:
+                    self._insert(*pending)
+                pending = (rows, hashes)
+            if pending:
+                self._insert(*pending)
+        except UnicodeDecodeError:
+            raise ImportFileError('El archivo no tiene la codificación indicada (por defecto UTF-8)')
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+            if self.cursor:
+                self.cursor.close()
+
+    def report(self, seconds, dry_run=False, error=None):
+        return {
+            'simulacion': dry_run,
+            'error': error,
+            'filas': self.rows,
+            'validas': self.valid,
+            'importados': len(self.imported),
+            'rechazadas': len(self.errors),
+            'errores': self.errors,
+            'metricas': {
+                'segundos': round(seconds, 3),
+                'filas_por_segundo': round(self.rows / seconds, 1) if seconds else None,
+                'lotes': self.batches,
+                **{f'{phase}_s': round(value, 3) for phase, value in self.timings.items()},
+            },
+        }
+
+
+def _import(conn, stream, encoding, dry_run, batch_size=PATIENT_IMPORT_BATCH_SIZE,
+            hash_workers=PATIENT_IMPORT_HASH_WORKERS, id_importacion=None):
+    started = time.perf_counter()
+    importer = PatientImport(conn, batch_size, hash_workers, id_importacion)
+    error = None
+    try:
+        importer.run(codecs.iterdecode(stream, encoding), dry_run)
+    except (ImportFileError, ImportExpired, DatabaseError) as e:
+        conn.rollback()
+        if not importer.imported:
+            raise
+        # Los lotes anteriores ya están confirmados: se informa en lugar de lanzar
+        logger.error(f"Importación de pacientes interrumpida: {str(e)}")
+        error = (f"{'Error de base de datos' if isinstance(e, DatabaseError) else e}. "
+                 f"La importación se detuvo; los {len(importer.imported)} pacientes de los lotes anteriores quedaron importados")
+    if dry_run:
+        conn.rollback()
+
+    report = importer.report(time.perf_counter() - started, dry_run, error)
+    logger.info(
+        f"Importación de pacientes{' (simulación)' if dry_run else ''}: {report['filas']} filas, "
+        f"{report['importados']} importados, {report['rechazadas']} rechazadas en "
+        f"{report['metricas']['segundos']} s ({report['metricas']['filas_por_segundo']} filas/s)"
+    )
+    return report
+
+
+def import_patients(conn, stream, encoding='utf-8-sig', dry_run=False,
+                    batch_size=PATIENT_IMPORT_BATCH_SIZE, hash_workers=PATIENT_IMPORT_HASH_WORKERS):
+    """
+    Importa el CSV de `stream` (binario) con `conn`, un commit por lote, y
+    devuelve el reporte. Lanza ImportBusy, ImportFileError, ImportExpired o
+    DatabaseError si no llegó a importarse ningún lote; si falla después, el
+    reporte trae 'error'.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ImportBusy()
+    try:
+        if dry_run:
+            return _import(conn, stream, encoding, True, batch_size, hash_workers)
+        id_importacion = _claim(conn, None)
+        return _import_claimed(conn, stream, encoding, id_importacion, batch_size, hash_workers)
+    finally:
+        _lock.release()
+
+
+def truncate_errors(report, limit=PATIENT_IMPORT_MAX_ERRORS):
+    """El reporte con como mucho `limit` filas rechazadas y cuántas se omitieron."""
+    return {**report, 'errores': report['errores'][:limit],
+            'errores_omitidos': max(0, len(report['errores']) - limit)}
+
+
+STALE_IMPORT_ERROR = ('La importación se interrumpió (el proceso terminó o dejó de responder). '
+                      'Los pacientes de los lotes confirmados (importados) quedaron guardados')
+
+
+def expire_stale_imports(cursor):
+    """Marca como 'error' las importaciones en curso sin avance en PATIENT_IMPORT_STALE_MINUTES."""
+    cursor.execute("""
+        UPDATE Importaciones_pacientes
+        SET estado = 'error', reporte = ?, fecha_actualizacion = GETDATE()
+        WHERE estado = 'en_curso' AND fecha_actualizacion < DATEADD(minute, ?, GETDATE())
+    """, (json.dumps({'error': STALE_IMPORT_ERROR}, ensure_ascii=False), -PATIENT_IMPORT_STALE_MINUTES))
+    if cursor.rowcount:
+        logger.warning(f"{cursor.rowcount} importaciones de pacientes sin avance marcadas como interrumpidas")
+
+
+def _claim(conn, id_usuario):
+    """
+    Registra una importación en curso y devuelve su id. Lanza ImportBusy si ya
+    hay otra en cualquier proceso (UX_Importaciones_EnCurso).
+    """
+    try:
+        with conn.cursor() as cursor:
+            expire_stale_imports(cursor)
+            cursor.execute(
+                "INSERT INTO Importaciones_pacientes (id_usuario) OUTPUT INSERTED.id_importacion VALUES (?)",
+                (id_usuario,),
+            )
+            id_importacion = cursor.fetchone()[0]
+        conn.commit()
+        return id_importacion
+    except DatabaseError as e:
+        conn.rollback()
+        if is_unique_violation(e):
+            raise ImportBusy()
+        raise
+
+
+def _finish(conn, id_importacion, report):
+    """Guarda el resultado y libera la importación para la siguiente."""
+    estado = 'error' if report.get('error') else 'completada'
+    if 'errores' in report:
+        report = truncate_errors(report)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE Importaciones_pacientes
+                SET estado = ?, filas = ?, importados = ?, rechazadas = ?, reporte = ?,
+                    fecha_actualizacion = GETDATE()
+                WHERE id_importacion = ?
+            """, (estado, report.get('filas', 0), report.get('importados', 0), report.get('rechazadas', 0),
+                  json.dumps(report, ensure_ascii=False), id_importacion))
+        conn.commit()
+    except DatabaseError as e:
+        logger.error(f"No se pudo guardar el resultado de la importación {id_importacion}: {str(e)}")
+
+
+def _import_claimed(conn, stream, encoding, id_importacion, batch_size=PATIENT_IMPORT_BATCH_SIZE,
+                    hash_workers=PATIENT_IMPORT_HASH_WORKERS):
+    """_import de una importación registrada con _claim; el resultado se guarda aunque falle."""
+    report = {'error': 'Error inesperado; revise app.log'}
+    try:
+        report = _import(conn, stream, encoding, False, batch_size, hash_workers, id_importacion)
+        return report
+    except (ImportFileError, ImportExpired) as e:
+        report = {'error': str(e)}
+        raise
+    except DatabaseError:
+        report = {'error': 'Error al importar los pacientes; no se guardó ninguno'}
+        raise
+    finally:
+        _finish(conn, id_importacion, report)
+
+
+def start_import(stream, encoding, id_usuario):
+    """
+    Copia el CSV de `stream` a un archivo temporal, comprueba el encabezado,
+    registra la importación en Importaciones_pacientes y la ejecuta en un hilo.
+    Devuelve el id_importacion; lanza ImportBusy, ImportFileError o DatabaseError.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ImportBusy()
+    upload = conn = None
+    try:
+        upload = tempfile.TemporaryFile()
+        shutil.copyfileobj(stream, upload)
+        upload.seek(0)
+        _read_header(codecs.iterdecode(upload, encoding))
+        upload.seek(0)
+
+        conn = get_db_connection()
+        if not conn:
+            raise DatabaseError('No se pudo conectar a la base de datos')
+        id_importacion = _claim(conn, id_usuario)
+        threading.Thread(target=_run_job, args=(conn, upload, encoding, id_importacion),
+                         name=f'importacion-pacientes-{id_importacion}', daemon=True).start()
+        return id_importacion
+    except BaseException:
+        if conn:
+            conn.close()
+        if upload:
+            upload.close()
+        _lock.release()
+        raise
+
+
+def _run_job(conn, upload, encoding, id_importacion):
+    try:
+        _import_claimed(conn, upload, encoding, id_importacion)
+    except (ImportFileError, ImportExpired, DatabaseError) as e:
+        logger.error(f"Importación de pacientes {id_importacion} fallida: {str(e)}")
+    except Exception:
+        logger.exception(f"Error inesperado en la importación de pacientes {id_importacion}")
+    finally:
+        upload.close()
+        conn.close()
+        _lock.release()
+
+
+def get_import(cursor, id_importacion):
+    """Estado de una importación de start_import, o None si no existe."""
+    cursor.execute("""
+        SELECT id_importacion, id_usuario, estado, fecha_inicio, fecha_actualizacion,
+               filas, importados, rechazadas, reporte
+        FROM Importaciones_pacientes
+        WHERE id_importacion = ?
+    """, (id_importacion,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    columns = ('id_importacion', 'id_usuario', 'estado', 'fecha_inicio', 'fecha_actualizacion',
+               'filas', 'importados', 'rechazadas')
+    return {**dict(zip(columns, row)), 'reporte': json.loads(row[8]) if row[8] else None}
+
+
+def write_errors(path, errors):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as output:
+        writer = csv.DictWriter(output, fieldnames=['fila', 'cedula', 'error'])
+        writer.writeheader()
+        writer.writerows(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archivo', help='CSV con los pacientes')
+    parser.add_argument('--dry-run', action='store_true', help='validar sin insertar nada')
+    parser.add_argument('--encoding', default='utf-8-sig', help='codificación del archivo (p. ej. cp1252)')
+    parser.add_argument('--batch-size', type=int, default=PATIENT_IMPORT_BATCH_SIZE, help='filas por lote (máximo 1000)')
+    parser.add_argument('--workers', type=int, default=PATIENT_IMPORT_HASH_WORKERS, help='hilos para los hashes')
+    parser.add_argument('--errores', help='escribir las filas rechazadas en este CSV')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("No se pudo conectar a la base de datos")
+    try:
+        with open(args.archivo, 'rb') as stream:
+            report = import_patients(conn, stream, args.encoding, args.dry_run, args.batch_size, args.workers)
+    except ImportBusy:
+        sys.exit("Ya hay una importación de pacientes en curso")
+    except (ImportFileError, ImportExpired) as e:
+        sys.exit(str(e))
+    except DatabaseError as e:
+        sys.exit(f"Error de base de datos; no se importó ningún paciente: {e}")
+    finally:
+        conn.close()
+
+    for error in report['errores'][:20]:
+        print(f"fila {error['fila']:<6} {error['cedula']:<14} {error['error']}")
+    if len(report['errores']) > 20:
+        print(f"... y {len(report['errores']) - 20} filas rechazadas más")
+    if args.errores:
+        write_errors(args.errores, report['errores'])
+    for name in ('filas', 'validas', 'importados', 'rechazadas'):
+        print(f"{name:<20} {report[name]}")
+    for name, value in report['metricas'].items():
+        print(f"{name:<20} {value}")
+    if report['error']:
+        sys.exit(report['error'])
+
+
+if __name__ == '__main__':
+    main()
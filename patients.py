@@ -1,10 +1,15 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash
 from middleware import token_required # Assuming you have this middleware
-import pyodbc
 import logging
 from datetime import datetime
-from database import get_db_connection
+from database import get_db_connection, DatabaseError
+from auth_middleware import login_required, role_required
+import identity_index
+import patient_import
+import date_ranges
+import activity
+from json_provider import rows_response
 
 patients_bp = Blueprint('patients', __name__)
 logger = logging.getLogger(__name__)
@@ -82,36 +87,22 @@ def get_pacientes_detallados():
                 params.extend([search_term, search_term, search_term, search_term])
             
             if fecha_desde:
-                query += " AND CONVERT(date, p.fecha_creacion) >= ?"
-                params.append(fecha_desde)
+                date_filter, date_params = date_ranges.since('p.fecha_creacion', fecha_desde)
+                query += f" AND {date_filter}"
+                params.extend(date_params)
             
             if fecha_hasta:
-                query += " AND CONVERT(date, p.fecha_creacion) <= ?"
-                params.append(fecha_hasta)
+                date_filter, date_params = date_ranges.until('p.fecha_creacion', fecha_hasta)
+                query += f" AND {date_filter}"
+                params.extend(date_params)
 
             query += " ORDER BY u.nombre_completo"
 
             cursor.execute(query, params)
-            
-            pacientes = [{
-                'id_paciente': row[0],
-                'nombre_completo': row[1],
-                'telefono': row[2],
-                'gmail': row[3],
-                'cedula': row[4],
-                'estado': row[5],
-                'fecha_nacimiento': row[6].strftime('%Y-%m-%d') if row[6] else None,
-                'genero': row[7],
-                'tipo_sangre': row[8],
-                'alergias': row[9],
-                'enfermedades_cronicas': row[10],
-                'contacto_emergencia': row[11],
-                'telefono_emergencia': row[12],
-                'fecha_creacion': row[13].strftime('%Y-%m-%d %H:%M:%S') if row[13] else None,
-                'id_usuario': row[14]
-            } for row in cursor.fetchall()]
-            
-            return jsonify(pacientes)
+            # fecha_nacimiento y fecha_creacion se serializan en json_provider
+            return rows_response(cursor)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}), 400
     except Exception as e:
         logger.error(f"Error en la base de datos: {str(e)}")
         return jsonify({'error': 'Error al obtener pacientes'}), 500
@@ -136,9 +127,9 @@ def get_pacientes_stats():
             total = cursor.fetchone()[0]
             
             # Nuevos este mes
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT COUNT(*) FROM Pacientes 
-                WHERE fecha_creacion >= DATEADD(month, DATEDIFF(month, 0, GETDATE()), 0)
+                WHERE {date_ranges.this_month('fecha_creacion')}
             """)
             new_this_month = cursor.fetchone()[0]
             
@@ -193,6 +184,11 @@ def check_cedula():
     if not cedula:
         return jsonify({'error': 'Se requiere el parámetro cedula'}), 400
 
+    # Sin la cédula en el índice no hay nadie con ella, ni siquiera el paciente excluido
+    exists = identity_index.contains('cedula', cedula)
+    if exists is False or (exists and not exclude):
+        return jsonify({'exists': exists})
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión a la base de datos'}), 500
@@ -260,6 +256,7 @@ def create_paciente():
 
             # 3. Actualizar el rol del usuario a 'paciente' (id_rol = 4)
             cursor.execute("UPDATE Usuarios SET id_rol = 4, tipo_usuario = 'paciente' WHERE id_usuario = ?", (id_usuario,))
+            activity.record(cursor, activity.PACIENTE, paciente_id)
 
             conn.commit()
             return jsonify({
@@ -273,6 +270,92 @@ def create_paciente():
     finally:
         conn.close()
 
+@patients_bp.route('/api/pacientes/importar', methods=['POST'])
+@login_required
+@role_required(1, 3) # Admin y Recepcionista
+def importar_pacientes(current_user):
+    """
+    Importa pacientes desde un CSV (campo 'archivo' de un formulario o cuerpo
+    text/csv). ?dry_run=1 solo valida y devuelve el reporte; si no, la
+    importación corre en segundo plano y se responde 202 con el id para
+    consultar su avance. ?encoding= si el archivo no es UTF-8. Columnas y
+    reglas en patient_import.py.
+    """
+    archivo = request.files.get('archivo')
+    if archivo:
+        stream = archivo.stream
+    elif request.mimetype in ('text/csv', 'text/plain'):
+        stream = request.stream
+    else:
+        return jsonify({'error': 'Envíe el CSV en el campo archivo o como cuerpo text/csv'}), 400
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'si', 'sí')
+    encoding = request.args.get('encoding', 'utf-8-sig')
+    try:
+        ''.encode(encoding)
+    except LookupError:
+        return jsonify({'error': f'Codificación desconocida: {encoding}'}), 400
+
+    if not dry_run:
+        try:
+            id_importacion = patient_import.start_import(stream, encoding, current_user['id_usuario'])
+        except patient_import.ImportBusy:
+            return jsonify({'error': 'Ya hay una importación de pacientes en curso. Intente más tarde.'}), 409
+        except patient_import.ImportFileError as e:
+            return jsonify({'error': str(e)}), 400
+        except DatabaseError as e:
+            logger.error(f"Error en la base de datos al iniciar la importación de pacientes: {str(e)}")
+            return jsonify({'error': 'Error al iniciar la importación de pacientes'}), 500
+        logger.info(f"Importación de pacientes {id_importacion} iniciada por el usuario {current_user['id_usuario']}")
+        return jsonify({
+            'id_importacion': id_importacion,
+            'estado': 'en_curso',
+            'url_estado': f'/api/pacientes/importar/{id_importacion}',
+        }), 202
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
+
+    try:
+        report = patient_import.import_patients(conn, stream, encoding, dry_run=True)
+    except patient_import.ImportBusy:
+        return jsonify({'error': 'Ya hay una importación de pacientes en curso. Intente más tarde.'}), 409
+    except patient_import.ImportFileError as e:
+        return jsonify({'error': str(e)}), 400
+    except DatabaseError as e:
+        logger.error(f"Error en la base de datos al validar la importación de pacientes: {str(e)}")
+        return jsonify({'error': 'Error al validar los pacientes'}), 500
+    finally:
+        conn.close()
+
+    # El reporte completo de filas rechazadas puede ser muy largo; el CLI lo escribe entero
+    return jsonify(patient_import.truncate_errors(report)), 200
+
+@patients_bp.route('/api/pacientes/importar/<int:id_importacion>', methods=['GET'])
+@login_required
+@role_required(1, 3) # Admin y Recepcionista
+def estado_importacion(current_user, id_importacion):
+    """Avance de una importación en segundo plano y, al terminar, su reporte."""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
+
+    try:
+        with conn.cursor() as cursor:
+            # Si el worker que la ejecutaba terminó, no debe figurar en curso para siempre
+            patient_import.expire_stale_imports(cursor)
+            importacion = patient_import.get_import(cursor, id_importacion)
+        conn.commit()
+        if not importacion:
+            return jsonify({'error': 'Importación no encontrada'}), 404
+        return jsonify(importacion), 200
+    except DatabaseError as e:
+        conn.rollback()
+        logger.error(f"Error en la base de datos: {str(e)}")
+        return jsonify({'error': 'Error al obtener el estado de la importación'}), 500
+    finally:
+        conn.close()
+
 @patients_bp.route('/api/pacientes/<int:id_paciente>', methods=['GET'])
 def get_paciente(id_paciente):
     """Obtiene un paciente específico por ID"""
@@ -383,8 +466,10 @@ def update_paciente(id_paciente):
             
             if cursor.rowcount == 0:
                 return jsonify({'error': 'Paciente no encontrado'}), 404
+            activity.record(cursor, activity.PACIENTE, id_paciente, 'actualizado')
                 
             conn.commit()
+            identity_index.record_changed(gmail=data.get('gmail'))
             return jsonify({'message': 'Paciente actualizado exitosamente'})
     except Exception as e:
         conn.rollback()
@@ -408,9 +493,9 @@ def update_paciente_status(id_paciente):
         with conn.cursor() as cursor:
             # Si se está inactivando, verificar citas futuras
             if data['estado'] == 'I':
-                cursor.execute("""
+                cursor.execute(f"""
                     SELECT 1 FROM Citas 
-                    WHERE id_paciente = ? AND fecha_cita >= CAST(GETDATE() AS DATE)
+                    WHERE id_paciente = ? AND {date_ranges.from_today('fecha_cita')}
                 """, (id_paciente,))
                 
                 if cursor.fetchone():
@@ -427,6 +512,7 @@ def update_paciente_status(id_paciente):
             
             if cursor.rowcount == 0:
                 return jsonify({'error': 'Paciente no encontrado'}), 404
+            activity.record(cursor, activity.PACIENTE, id_paciente, 'activado' if data['estado'] == 'A' else 'desactivado')
                 
             conn.commit()
             return jsonify({
@@ -449,9 +535,9 @@ def delete_paciente(id_paciente):
     try:
         with conn.cursor() as cursor:
             # Verificar citas futuras antes de inactivar
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT 1 FROM Citas 
-                WHERE id_paciente = ? AND fecha_cita >= CAST(GETDATE() AS DATE)
+                WHERE id_paciente = ? AND {date_ranges.from_today('fecha_cita')}
             """, (id_paciente,))
             
             if cursor.fetchone():
@@ -468,6 +554,7 @@ def delete_paciente(id_paciente):
             
             if cursor.rowcount == 0:
                 return jsonify({'error': 'Paciente no encontrado'}), 404
+            activity.record(cursor, activity.PACIENTE, id_paciente, 'desactivado')
                 
             conn.commit()
             return jsonify({'message': 'Paciente marcado como inactivo exitosamente'})
@@ -0,0 +1,101 @@
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, has_app_context
+
+# Presupuesto de idas y vueltas a la base de datos por endpoint.
+#
+# El cursor instrumentado de database.py avisa aquí cada sentencia ejecutada y cada
+# conexión abierta. Los endpoints decorados con @query_budget comparan lo que
+# consumieron contra lo declarado: con app.config['TESTING'] (o QUERY_BUDGET_STRICT)
+# se lanza QueryBudgetExceeded para que la regresión falle antes de desplegar; en
+# producción solo se registra una advertencia.
+
+_local = threading.local()
+_lock = threading.Lock()
+
+# Presupuestos declarados, por nombre de función del endpoint
+QUERY_BUDGETS = {}
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+def _active_trackers():
+    return getattr(_local, 'trackers', [])
+
+def count_round_trip():
+    trackers = _active_trackers()
+    if trackers:
+        with _lock:
+            for counts in trackers:
+                counts['round_trips'] += 1
+
+def count_connection():
+    trackers = _active_trackers()
+    if trackers:
+        with _lock:
+            for counts in trackers:
+                counts['connections'] += 1
+
+@contextmanager
+def track_round_trips():
+    """Cuenta las sentencias y conexiones abiertas dentro del bloque en el hilo actual.
+
+        with track_round_trips() as counts:
+            client.get('/api/admin/stats')
+        assert counts['round_trips'] <= 6
+    """
+    counts = {'round_trips': 0, 'connections': 0}
+    if not hasattr(_local, 'trackers'):
+        _local.trackers = []
+    _local.trackers.append(counts)
+    try:
+        yield counts
+    finally:
+        _local.trackers.remove(counts)
+
+def propagate(fn):
+    """Envuelve fn para que, al correr en otro hilo, cuente sobre los contadores del hilo actual."""
+    trackers = list(_active_trackers())
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, 'trackers', [])
+        _local.trackers = previous + trackers
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.trackers = previous
+    return wrapper
+
+def _strict():
+    return has_app_context() and (current_app.config.get('TESTING') or current_app.config.get('QUERY_BUDGET_STRICT'))
+
+def query_budget(round_trips, connections=1):
+    """Declara el máximo de sentencias y conexiones que puede usar un endpoint.
+
+    Se coloca debajo de @login_required/@role_required para que la carga del usuario
+    en sesión no cuente contra el presupuesto del endpoint.
+    """
+    def decorator(f):
+        QUERY_BUDGETS[f.__name__] = {'round_trips': round_trips, 'connections': connections}
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            with track_round_trips() as counts:
+                response = f(*args, **kwargs)
+
+            exceeded = []
+            if counts['round_trips'] > round_trips:
+                exceeded.append(f"{counts['round_trips']} consultas (máximo {round_trips})")
+            if connections is not None and counts['connections'] > connections:
+                exceeded.append(f"{counts['connections']} conexiones (máximo {connections})")
+            if exceeded:
+                message = f"Presupuesto de base de datos excedido en {f.__name__}: {', '.join(exceeded)}"
+                if _strict():
+                    raise QueryBudgetExceeded(message)
+                logging.warning(message)
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,215 @@
+import hashlib
+import threading
+import time
+from datetime import date, timedelta
+
+from config import DAY_NAMES, RECONCILIATION_MAX_AGE
+import date_ranges
+
+# Conciliación de asistencias (Asistencias) contra los horarios planificados
+# (Horarios_disponibles), solo de los médicos activos.
+#
+# Para cada médico y día del rango se expanden los bloques semanales del día de
+# la semana y se comparan con el registro de asistencia de ese día:
+#   - minutos_tarde: entrada respecto al inicio del primer bloque
+#   - minutos_salida_anticipada: fin del último bloque respecto a la salida
+#   - ausente: había horario y no hay registro (o el registro es 'Ausente')
+#   - sin_salida: hay entrada y no salida en un día ya terminado
+#   - sin_horario: hubo presencia un día sin bloques planificados
+# La tolerancia para 'tarde' y 'salida_anticipada' se aplica al responder, así
+# que los resultados guardados sirven para cualquier tolerancia.
+#
+# Modo incremental: los días ya conciliados se guardan en memoria y solo se
+# reprocesan los que faltan, los que asistencia.py marca al escribir
+# (mark_dirty) y los de los médicos cuyo horario cambió (se detecta comparando
+# una huella de sus bloques en cada llamada, sin depender de quién lo cambió).
+# Cada resultado caduca a los RECONCILIATION_MAX_AGE segundos para recoger los
+# cambios hechos en otros workers. El día de hoy nunca se guarda.
+#
+# Toda la conciliación son tres consultas (médicos, horarios y asistencias del
+# tramo pendiente) y una pasada lineal por médico sobre sus días pendientes.
+
+INCIDENCIAS = ('tarde', 'salida_anticipada', 'sin_salida', 'ausente', 'sin_horario')
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute + value.second / 60
+
+
+def _schedule_fingerprint(blocks):
+    text = '|'.join(f'{day}:{start}-{end}' for day, start, end in sorted(blocks, key=str))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def reconcile_day(fecha, blocks, record, today):
+    """
+    Concilia un día. blocks: [(hora_inicio, hora_fin)] ordenados;
+    record: (hora_entrada, hora_salida, estado_asistencia) o None.
+    """
+    entrada, salida, estado = record if record else (None, None, None)
+    presente = record is not None and (estado != 'Ausente' or entrada is not None)
+    day = {
+        'fecha': fecha,
+        'dia_semana': DAY_NAMES[fecha.isoweekday()],
+        'horario': [[start, end] for start, end in blocks],
+        'hora_entrada': entrada,
+        'hora_salida': salida,
+        'estado_asistencia': estado,
+        'minutos_tarde': None,
+        'minutos_salida_anticipada': None,
+        'ausente': bool(blocks) and not presente,
+        'sin_salida': presente and entrada is not None and salida is None and fecha < today,
+        'sin_horario': presente and not blocks,
+    }
+    if blocks and entrada is not None:
+        day['minutos_tarde'] = round(_minutes(entrada) - _minutes(blocks[0][0]))
+    if blocks and salida is not None:
+        day['minutos_salida_anticipada'] = round(_minutes(blocks[-1][1]) - _minutes(salida))
+    return day
+
+
+def incidencias(day, tolerance):
+    """Incidencias de un día conciliado con la tolerancia indicada (minutos)."""
+    found = []
+    if day['minutos_tarde'] is not None and day['minutos_tarde'] > tolerance:
+        found.append('tarde')
+    if day['minutos_salida_anticipada'] is not None and day['minutos_salida_anticipada'] > tolerance:
+        found.append('salida_anticipada')
+    found += [name for name in ('sin_salida', 'ausente', 'sin_horario') if day[name]]
+    return found
+
+
+class ReconciliationStore:
+    """Días conciliados por médico, con la huella del horario con el que se calcularon."""
+
+    def __init__(self, max_age=RECONCILIATION_MAX_AGE):
+        self.max_age = max_age
+        self._days = {}
+        self._fingerprints = {}
+        # Una conciliación a la vez: las peticiones simultáneas no repiten el mismo trabajo
+        self._lock = threading.Lock()
+
+    def mark_dirty(self, id_medico, fecha):
+        """Tras escribir una asistencia: ese día se reprocesa en la próxima conciliación."""
+        days = self._days.get(id_medico)
+        if days is not None:
+            days.pop(fecha, None)
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+            self._fingerprints.clear()
+
+    def _pending(self, id_medico, start, end, today, now):
+        days = self._days.get(id_medico, {})
+        pending = []
+        fecha = start
+        while fecha <= end:
+            stored = days.get(fecha)
+            if fecha >= today or stored is None or now - stored[0] > self.max_age:
+                pending.append(fecha)
+            fecha += timedelta(days=1)
+        return pending
+
+    def reconcile(self, cursor, start, end, id_medico=None, incremental=True):
+        """
+        Días conciliados de `start` a `end` (como mucho hasta hoy), por médico.
+        Devuelve (médicos {id: nombre}, días [dict], días reprocesados).
+        """
+        today = date.today()
+        end = min(end, today)
+        # Solo médicos activos: los dados de baja conservan sus bloques y figurarían ausentes cada día
+        doctor_filter, doctor_params = ("AND m.id_medico = ?", [id_medico]) if id_medico else ("", [])
+
+        with self._lock:
+            cursor.execute(f"""
+                SELECT m.id_medico, u.nombre_completo
+                FROM Medicos m
+                JOIN Usuarios u ON m.id_usuario = u.id_usuario
+                WHERE m.estado = 'A' {doctor_filter}
+            """, doctor_params)
+            doctors = {row[0]: row[1] for row in cursor.fetchall()}
+
+            cursor.execute(f"""
+                SELECT h.id_medico, h.dia_semana_num, h.hora_inicio, h.hora_fin
+                FROM Horarios_disponibles h
+                JOIN Medicos m ON h.id_medico = m.id_medico
+                WHERE m.estado = 'A' {doctor_filter}
+            """, doctor_params)
+            blocks = {}
+            for row in cursor.fetchall():
+                blocks.setdefault(row[0], []).append((row[1], row[2], row[3]))
+
+            # Médicos cuyo horario cambió desde la última conciliación: se descartan sus días
+            for doctor in doctors:
+                fingerprint = _schedule_fingerprint(blocks.get(doctor, []))
+                if not incremental or self._fingerprints.get(doctor) != fingerprint:
+                    self._days.pop(doctor, None)
+                    self._fingerprints[doctor] = fingerprint
+
+            now = time.monotonic()
+            pending = {}
+            if start <= end:
+                for doctor in doctors:
+                    days = self._pending(doctor, start, end, today, now)
+                    if days:
+                        pending[doctor] = days
+
+            todays = self._process(cursor, pending, blocks, len(doctors), today, now) if pending else {}
+
+            results = []
+            for doctor in doctors:
+                days = self._days.get(doctor, {})
+                fecha = start
+                while fecha <= end:
+                    stored = days.get(fecha)
+                    if stored is not None:
+                        results.append({'id_medico': doctor, **stored[1]})
+                    fecha += timedelta(days=1)
+                # Hoy no se guarda: se entrega lo calculado en esta llamada
+                if doctor in todays:
+                    results.append({'id_medico': doctor, **todays[doctor]})
+
+        return doctors, results, sum(len(days) for days in pending.values())
+
+    def _process(self, cursor, pending, blocks, doctor_count, today, now):
+        """Concilia los días pendientes; devuelve los de hoy, que no se guardan."""
+        first = min(days[0] for days in pending.values())
+        last = max(days[-1] for days in pending.values())
+        doctor_ids = list(pending)
+        where, params = date_ranges.between('fecha', first, last)
+        # Con todos (o muchos) médicos pendientes es más barato leer el tramo entero que filtrar por lista
+        if len(doctor_ids) < doctor_count and len(doctor_ids) <= 1000:
+            where += f" AND id_medico IN ({', '.join('?' * len(doctor_ids))})"
+            params += doctor_ids
+        cursor.execute(f"""
+            SELECT id_medico, fecha, hora_entrada, hora_salida, estado_asistencia
+            FROM Asistencias
+            WHERE {where}
+        """, params)
+        records = {}
+        for row in cursor.fetchall():
+            records.setdefault(row[0], {})[row[1]] = (row[2], row[3], row[4])
+
+        todays = {}
+        for doctor, days in pending.items():
+            # Bloques del médico por día de la semana, ordenados por hora de inicio
+            by_weekday = {}
+            for weekday, start, end in sorted(blocks.get(doctor, [])):
+                by_weekday.setdefault(weekday, []).append((start, end))
+            doctor_records = records.get(doctor, {})
+            stored = self._days.setdefault(doctor, {})
+            for fecha in days:
+                day = reconcile_day(fecha, by_weekday.get(fecha.isoweekday(), []), doctor_records.get(fecha), today)
+                if fecha < today:
+                    stored[fecha] = (now, day)
+                else:
+                    todays[doctor] = day
+        return todays
+
+
+store = ReconciliationStore()
+
+
+def mark_dirty(id_medico, fecha):
+    store.mark_dirty(id_medico, fecha)
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from auth_middleware import login_required
+from config import COMPLIANCE_PAGE_SIZE, COMPLIANCE_MAX_PAGE_SIZE
 from database import get_db_connection
-from datetime import date
+from json_provider import rows_as_dicts
+import date_ranges
 import logging
 
 reports_bp = Blueprint('reports', __name__)
@@ -18,6 +20,10 @@ def get_activity_report(current_user):
 
     if not start_date or not end_date:
         return jsonify({'error': 'Se requieren fechas de inicio y fin'}), 400
+    try:
+        start_date, end_date = date_ranges.parse_date(start_date), date_ranges.parse_date(end_date)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}), 400
 
     conn = get_db_connection()
     if not conn:
@@ -25,51 +31,50 @@ def get_activity_report(current_user):
 
     try:
         with conn.cursor() as cursor:
+            date_filter, params = date_ranges.between('c.fecha_cita', start_date, end_date)
             # Consulta para la tabla detallada
-            query = """
+            query = f"""
                 SELECT 
-                    c.fecha_cita, c.hora_cita, p.nombre_completo AS paciente_nombre, 
-                    m.nombre_completo AS medico_nombre, e.nombre_especialidad, c.estado
+                    c.fecha_cita AS fecha, c.hora_cita AS hora,
+                    COALESCE(p.nombre_completo, 'N/A') AS paciente,
+                    COALESCE(m.nombre_completo, 'N/A') AS medico,
+                    COALESCE(e.nombre_especialidad, 'N/A') AS especialidad,
+                    COALESCE(c.estado, 'pendiente') AS estado
                 FROM Citas c
                 LEFT JOIN Pacientes pac ON c.id_paciente = pac.id_paciente
                 LEFT JOIN Usuarios p ON pac.id_usuario = p.id_usuario
                 LEFT JOIN Medicos med ON c.id_medico = med.id_medico
                 LEFT JOIN Usuarios m ON med.id_usuario = m.id_usuario
                 LEFT JOIN Especialidades e ON med.especialidad = e.nombre_especialidad
-                WHERE c.fecha_cita BETWEEN ? AND ?
+                WHERE {date_filter}
                 ORDER BY c.fecha_cita, c.hora_cita
             """
-            cursor.execute(query, (start_date, end_date))
+            cursor.execute(query, params)
             
-            detailed_data = [{
-                'fecha': row.fecha_cita.strftime('%Y-%m-%d'),
-                'hora': row.hora_cita.strftime('%H:%M'),
-                'paciente': row.paciente_nombre or 'N/A',
-                'medico': row.medico_nombre or 'N/A',
-                'especialidad': row.nombre_especialidad or 'N/A',
-                'estado': row.estado or 'pendiente'
-            } for row in cursor.fetchall()]
+            # fecha y hora se serializan en json_provider (YYYY-MM-DD y HH:MM)
+            detailed_data = rows_as_dicts(cursor)
 
             # Consulta para el gráfico resumen por estado
-            summary_query = """
+            date_filter, params = date_ranges.between('fecha_cita', start_date, end_date)
+            summary_query = f"""
                 SELECT estado, COUNT(*) as total
                 FROM Citas
-                WHERE fecha_cita BETWEEN ? AND ?
+                WHERE {date_filter}
                 GROUP BY estado
             """
-            cursor.execute(summary_query, (start_date, end_date))
+            cursor.execute(summary_query, params)
             
             summary_data = {row.estado or 'pendiente': row.total for row in cursor.fetchall()}
 
             # Consulta para el gráfico de serie temporal
-            time_series_query = """
+            time_series_query = f"""
                 SELECT fecha_cita, COUNT(*) as total
                 FROM Citas
-                WHERE fecha_cita BETWEEN ? AND ?
+                WHERE {date_filter}
                 GROUP BY fecha_cita
                 ORDER BY fecha_cita
             """
-            cursor.execute(time_series_query, (start_date, end_date))
+            cursor.execute(time_series_query, params)
             time_series_rows = cursor.fetchall()
             time_series_data = {
                 'labels': [row.fecha_cita.strftime('%d/%m') for row in time_series_rows],
@@ -89,18 +94,103 @@ def get_activity_report(current_user):
         if conn:
             conn.close()
 
+# Estado de cada cita en el reporte de cumplimiento. Las citas pendientes o
+# confirmadas de días ya pasados cuentan como ausencia del paciente.
+COMPLIANCE_STATUS = f"""
+    CASE
+        WHEN COALESCE(c.estado, 'pendiente') IN ('pendiente', 'confirmada') AND c.fecha_cita < {date_ranges.TODAY} THEN 'Ausente'
+        WHEN c.estado = 'completada' THEN 'Completada'
+        WHEN c.estado = 'cancelada' THEN 'Cancelada'
+        WHEN c.estado = 'confirmada' THEN 'Confirmada'
+        ELSE 'Programada'
+    END
+"""
+
+COMPLIANCE_STATES = ('Completada', 'Cancelada', 'Ausente', 'Programada', 'Confirmada')
+
+
+def _no_show_rate(counts):
+    """Porcentaje de ausencias sobre las citas que debían atenderse (completadas + ausentes)."""
+    due = counts['Completada'] + counts['Ausente']
+    return round(100 * counts['Ausente'] / due, 1) if due else None
+
+
+def _compliance_summary(cursor, date_filter, params):
+    """Resumen general, por médico y por especialidad con una sola consulta agrupada."""
+    # Una sola pasada agregada por médico y estado; el resumen general y
+    # por especialidad se suman a partir de estas filas (pocas por médico)
+    query = f"""
+        SELECT
+            t.id_medico, m.nombre_completo AS medico,
+            COALESCE(med.especialidad, 'No Asignada') AS especialidad,
+            t.estado, COUNT(*) AS total
+        FROM (
+            SELECT c.id_medico, {COMPLIANCE_STATUS} AS estado
+            FROM Citas c
+            WHERE {date_filter}
+        ) t
+        LEFT JOIN Medicos med ON t.id_medico = med.id_medico
+        LEFT JOIN Usuarios m ON med.id_usuario = m.id_usuario
+        GROUP BY t.id_medico, m.nombre_completo, med.especialidad, t.estado
+    """
+    cursor.execute(query, params)
+
+    summary = dict.fromkeys(COMPLIANCE_STATES, 0)
+    by_doctor = {}
+    by_specialty = {}
+    for row in cursor.fetchall():
+        summary[row.estado] += row.total
+        doctor = by_doctor.setdefault(row.id_medico, {
+            'id_medico': row.id_medico,
+            'medico': row.medico or 'N/A',
+            'especialidad': row.especialidad,
+            'estados': dict.fromkeys(COMPLIANCE_STATES, 0),
+        })
+        doctor['estados'][row.estado] += row.total
+        specialty = by_specialty.setdefault(row.especialidad, {
+            'especialidad': row.especialidad,
+            'estados': dict.fromkeys(COMPLIANCE_STATES, 0),
+        })
+        specialty['estados'][row.estado] += row.total
+
+    for group in list(by_doctor.values()) + list(by_specialty.values()):
+        group['total'] = sum(group['estados'].values())
+        group['tasa_ausencia'] = _no_show_rate(group['estados'])
+
+    total = sum(summary.values())
+    return {
+        'summary': summary,
+        'total': total,
+        'tasa_ausencia': _no_show_rate(summary),
+        'by_doctor': sorted(by_doctor.values(), key=lambda group: group['medico']),
+        'by_specialty': sorted(by_specialty.values(), key=lambda group: group['especialidad']),
+    }
+
+
 @reports_bp.route('/api/reports/appointment-compliance', methods=['GET'])
 @login_required
 def get_compliance_report(current_user):
     """
-    Genera un reporte de cumplimiento de citas (asistencia vs. ausencias).
-    Filtros: start_date, end_date.
+    Genera un reporte de cumplimiento de citas (asistencia vs. ausencias), con
+    la tasa de ausencias por médico y por especialidad.
+    Filtros: start_date, end_date. Detalle opcional y paginado:
+    details=1, page, per_page. Con summary=0 (para pedir las páginas siguientes
+    del detalle) solo se devuelve la página, sin resumen ni total_pages.
     """
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
 
     if not start_date or not end_date:
         return jsonify({'error': 'Se requieren fechas de inicio y fin'}), 400
+    try:
+        start_date, end_date = date_ranges.parse_date(start_date), date_ranges.parse_date(end_date)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}), 400
+
+    with_details = request.args.get('details') == '1'
+    with_summary = not with_details or request.args.get('summary') != '0'
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', COMPLIANCE_PAGE_SIZE, type=int), 1), COMPLIANCE_MAX_PAGE_SIZE)
 
     conn = get_db_connection()
     if not conn:
@@ -108,43 +198,38 @@ def get_compliance_report(current_user):
 
     try:
         with conn.cursor() as cursor:
-            today_str = date.today().strftime('%Y-%m-%d')
-            query = """
-                SELECT 
-                    c.fecha_cita, p.nombre_completo AS paciente_nombre, 
-                    m.nombre_completo AS medico_nombre, c.estado
-                FROM Citas c
-                LEFT JOIN Pacientes pac ON c.id_paciente = pac.id_paciente
-                LEFT JOIN Usuarios p ON pac.id_usuario = p.id_usuario
-                LEFT JOIN Medicos med ON c.id_medico = med.id_medico
-                LEFT JOIN Usuarios m ON med.id_usuario = m.id_usuario
-                WHERE c.fecha_cita BETWEEN ? AND ?
-            """
-            cursor.execute(query, (start_date, end_date))
-            
-            rows = cursor.fetchall()
-            
-            summary = {'Completada': 0, 'Cancelada': 0, 'Ausente': 0, 'Programada': 0, 'Confirmada': 0}
-            details = []
-
-            for row in rows:
-                final_status = row.estado
-                if row.estado in ('programada', 'confirmada') and row.fecha_cita.strftime('%Y-%m-%d') < today_str:
-                    final_status = 'Ausente'
-                
-                if final_status in summary:
-                    summary[final_status] += 1
-                else:
-                    summary[final_status] = 1
-
-                details.append({
-                    'fecha': row.fecha_cita.strftime('%Y-%m-%d'),
-                    'paciente': row.paciente_nombre or 'N/A',
-                    'medico': row.medico_nombre or 'N/A',
-                    'estado': final_status
+            date_filter, params = date_ranges.between('c.fecha_cita', start_date, end_date)
+            # La primera petición trae el resumen; las páginas siguientes del detalle
+            # (summary=0) no repiten la consulta agrupada
+            result = _compliance_summary(cursor, date_filter, params) if with_summary else {}
+
+            if with_details:
+                # El total de filas ya se conoce por el resumen (o por la primera página): no hace falta un COUNT aparte
+                details_query = f"""
+                    SELECT
+                        c.fecha_cita AS fecha,
+                        COALESCE(p.nombre_completo, 'N/A') AS paciente,
+                        COALESCE(m.nombre_completo, 'N/A') AS medico,
+                        {COMPLIANCE_STATUS} AS estado
+                    FROM Citas c
+                    LEFT JOIN Pacientes pac ON c.id_paciente = pac.id_paciente
+                    LEFT JOIN Usuarios p ON pac.id_usuario = p.id_usuario
+                    LEFT JOIN Medicos med ON c.id_medico = med.id_medico
+                    LEFT JOIN Usuarios m ON med.id_usuario = m.id_usuario
+                    WHERE {date_filter}
+                    ORDER BY c.fecha_cita, c.hora_cita, c.id_cita
+                    OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+                """
+                cursor.execute(details_query, params + [(page - 1) * per_page, per_page])
+                result.update({
+                    'details': rows_as_dicts(cursor),
+                    'page': page,
+                    'per_page': per_page,
                 })
+                if with_summary:
+                    result['total_pages'] = (result['total'] + per_page - 1) // per_page
 
-            return jsonify({'summary': summary, 'details': details})
+            return jsonify(result)
 
     except Exception as e:
         logging.error(f"Error en reporte de cumplimiento: {e}")
@@ -165,6 +250,10 @@ def get_new_patients_report(current_user):
 
     if not start_date or not end_date:
         return jsonify({'error': 'Se requieren fechas de inicio y fin'}), 400
+    try:
+        start_date, end_date = date_ranges.parse_date(start_date), date_ranges.parse_date(end_date)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}), 400
 
     conn = get_db_connection()
     if not conn:
@@ -172,17 +261,18 @@ def get_new_patients_report(current_user):
 
     try:
         with conn.cursor() as cursor:
-            query = """
+            date_filter, params = date_ranges.between('u.fecha_creacion', start_date, end_date)
+            query = f"""
                 SELECT 
                     u.nombre_completo, u.cedula, u.telefono, u.gmail, 
                     u.fecha_creacion, p.genero
                 FROM Usuarios u
                 JOIN Pacientes p ON u.id_usuario = p.id_usuario
                 WHERE u.tipo_usuario = 'paciente' 
-                AND CAST(u.fecha_creacion AS DATE) BETWEEN ? AND ?
+                AND {date_filter}
                 ORDER BY u.fecha_creacion DESC
             """
-            cursor.execute(query, (start_date, end_date))
+            cursor.execute(query, params)
             rows = cursor.fetchall()
 
             patients_data = [{
@@ -195,15 +285,17 @@ def get_new_patients_report(current_user):
             } for row in rows]
 
             # Consulta para el gráfico de tendencia
-            time_series_query = """
-                SELECT CAST(fecha_creacion AS DATE) as fecha, COUNT(*) as total
+            # fecha_creacion_dia es la columna calculada CAST(fecha_creacion AS DATE) (migración 4)
+            day_filter, day_params = date_ranges.between('fecha_creacion_dia', start_date, end_date)
+            time_series_query = f"""
+                SELECT fecha_creacion_dia as fecha, COUNT(*) as total
                 FROM Usuarios 
                 WHERE tipo_usuario = 'paciente' 
-                AND CAST(fecha_creacion AS DATE) BETWEEN ? AND ?
-                GROUP BY CAST(fecha_creacion AS DATE) 
+                AND {day_filter}
+                GROUP BY fecha_creacion_dia 
                 ORDER BY fecha
             """
-            cursor.execute(time_series_query, (start_date, end_date))
+            cursor.execute(time_series_query, day_params)
             time_series_rows = cursor.fetchall()
             time_series_data = {
                 'labels': [row.fecha.strftime('%d/%m') for row in time_series_rows],
@@ -211,17 +303,17 @@ def get_new_patients_report(current_user):
             }
 
             # Resumen por género - consulta separada para asegurar datos
-            gender_query = """
+            gender_query = f"""
                 SELECT 
                     COALESCE(p.genero, 'No especificado') as genero,
                     COUNT(*) as total
                 FROM Usuarios u
                 JOIN Pacientes p ON u.id_usuario = p.id_usuario
                 WHERE u.tipo_usuario = 'paciente' 
-                AND CAST(u.fecha_creacion AS DATE) BETWEEN ? AND ?
+                AND {date_filter}
                 GROUP BY COALESCE(p.genero, 'No especificado')
             """
-            cursor.execute(gender_query, (start_date, end_date))
+            cursor.execute(gender_query, params)
             gender_rows = cursor.fetchall()
             
             # Inicializar con todos los géneros posibles
@@ -263,6 +355,10 @@ def get_doctor_occupancy_report(current_user):
 
     if not start_date or not end_date:
         return jsonify({'error': 'Se requieren fechas de inicio y fin'}), 400
+    try:
+        start_date, end_date = date_ranges.parse_date(start_date), date_ranges.parse_date(end_date)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}), 400
 
     conn = get_db_connection()
     if not conn:
@@ -271,31 +367,33 @@ def get_doctor_occupancy_report(current_user):
     try:
         with conn.cursor() as cursor:
             # 1. Datos para el Heatmap de horarios
-            heatmap_query = """
+            date_filter, params = date_ranges.between('fecha_cita', start_date, end_date)
+            heatmap_query = f"""
                 SELECT 
                     DATEPART(weekday, fecha_cita) as dia_semana_num,
                     DATEPART(hour, hora_cita) as hora,
                     COUNT(*) as total_citas
                 FROM Citas
-                WHERE fecha_cita BETWEEN ? AND ? AND estado != 'cancelada'
+                WHERE {date_filter} AND estado != 'cancelada'
                 GROUP BY DATEPART(weekday, fecha_cita), DATEPART(hour, hora_cita)
             """
-            cursor.execute(heatmap_query, (start_date, end_date))
+            cursor.execute(heatmap_query, params)
             heatmap_data = cursor.fetchall()
 
             # 2. Datos para el ranking de médicos
-            ranking_query = """
+            date_filter, params = date_ranges.between('c.fecha_cita', start_date, end_date)
+            ranking_query = f"""
                 SELECT TOP 10
                     m.nombre_completo,
                     COUNT(c.id_cita) as total_citas
                 FROM Citas c
                 JOIN Medicos med ON c.id_medico = med.id_medico
                 JOIN Usuarios m ON med.id_usuario = m.id_usuario
-                WHERE c.fecha_cita BETWEEN ? AND ? AND c.estado != 'cancelada'
+                WHERE {date_filter} AND c.estado != 'cancelada'
                 GROUP BY m.nombre_completo
                 ORDER BY total_citas DESC
             """
-            cursor.execute(ranking_query, (start_date, end_date))
+            cursor.execute(ranking_query, params)
             ranking_rows = cursor.fetchall()
             
             ranking_data = {
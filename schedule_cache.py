@@ -0,0 +1,69 @@
+import logging
+
+from config import REFERENCE_CACHE_MAX_AGE
+from database import get_db_connection, DatabaseError
+import cache
+
+# Horario semanal de todos los médicos en memoria.
+#
+# Horarios_disponibles cambia pocas veces y lo leen la gestión de horarios, la
+# agenda del médico, el chatbot y el cálculo de franjas libres al dar o
+# reagendar citas. Se carga entera con una consulta y cada médico queda como
+# una semana de 8 posiciones indexada por número de día (1 = Lunes ...
+# 7 = Domingo; la 0 no se usa) con sus bloques (id_horario, hora_inicio,
+# hora_fin) ordenados por hora de inicio.
+#
+# Las escrituras de schedules.py llaman a invalidate(); con varios workers,
+# REFERENCE_CACHE_MAX_AGE acota cuánto tarda en verse un cambio de otro worker.
+
+EMPTY_WEEK = ((),) * 8
+
+
+def _load_schedules():
+    """{id_medico: semana} con todos los bloques de Horarios_disponibles."""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT id_medico, dia_semana_num, id_horario, hora_inicio, hora_fin
+                FROM Horarios_disponibles
+            """)
+            rows = cursor.fetchall()
+    except DatabaseError as e:
+        logging.error(f"Error al cargar los horarios de los médicos: {str(e)}")
+        return None
+    finally:
+        conn.close()
+
+    weeks = {}
+    for id_medico, day, id_horario, hora_inicio, hora_fin in rows:
+        weeks.setdefault(id_medico, [[] for _ in range(8)])[day].append((id_horario, hora_inicio, hora_fin))
+
+    return {
+        id_medico: tuple(tuple(sorted(blocks, key=lambda block: block[1])) for blocks in days)
+        for id_medico, days in weeks.items()
+    }
+
+
+schedules = cache.VersionedCache('horarios', _load_schedules, max_age=REFERENCE_CACHE_MAX_AGE)
+
+
+def week(id_medico):
+    """Semana del médico (EMPTY_WEEK si no tiene horario) o None si no se pudo cargar."""
+    weeks = schedules.get()
+    if weeks is None:
+        return None
+    return weeks.get(id_medico, EMPTY_WEEK)
+
+
+def day(id_medico, weekday):
+    """Bloques del médico ese día de la semana (1-7), o None si no se pudo cargar."""
+    doctor_week = week(id_medico)
+    return None if doctor_week is None else doctor_week[weekday]
+
+
+def invalidate():
+    """Tras escribir en Horarios_disponibles."""
+    schedules.bump()
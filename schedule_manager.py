@@ -1,16 +1,7 @@
 import pyodbc
 from datetime import datetime, time
 from typing import List, Dict, Optional
-
-DIA_SEMANA_MAP = {
-    1: "Lunes",
-    2: "Martes",
-    3: "Miércoles",
-    4: "Jueves",
-    5: "Viernes",
-    6: "Sábado",
-    7: "Domingo"
-}
+from config import DAY_NAMES
 
 class MedicalScheduleManager:
     def __init__(self, connection_string: str):
@@ -21,10 +12,10 @@ class MedicalScheduleManager:
     
     def get_doctor_schedules(self, doctor_id: int) -> List[Dict]:
         query = """
-        SELECT id_horario, id_medico, dia_semana, hora_inicio, hora_fin,
+        SELECT id_horario, id_medico, dia_semana_num, dia_semana, hora_inicio, hora_fin
         FROM Horarios_disponibles
         WHERE id_medico = ?
-        ORDER BY dia_semana, hora_inicio
+        ORDER BY dia_semana_num, hora_inicio
         """
         
         try:
@@ -37,6 +28,7 @@ class MedicalScheduleManager:
                     schedules.append({
                         'id_horario': row.id_horario,
                         'id_medico': row.id_medico,
+                        'dia_semana_num': row.dia_semana_num,
                         'dia_semana': row.dia_semana,
                         'hora_inicio': str(row.hora_inicio),
                         'hora_fin': str(row.hora_fin)
@@ -55,13 +47,12 @@ class MedicalScheduleManager:
         if self._check_schedule_conflict(doctor_id, day_of_week, start_time, end_time):
             raise Exception("Conflicto de horarios detectado")
         
-        dia_semana_str = DIA_SEMANA_MAP.get(day_of_week)
-        if not dia_semana_str:
+        if day_of_week not in DAY_NAMES:
             raise Exception("Día de la semana inválido")
 
         query = """
         INSERT INTO Horarios_disponibles
-        (id_medico, dia_semana, hora_inicio, hora_fin)
+        (id_medico, dia_semana_num, hora_inicio, hora_fin)
         OUTPUT INSERTED.id_horario
         VALUES (?, ?, ?, ?)
         """
@@ -69,7 +60,7 @@ class MedicalScheduleManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(query, (doctor_id, dia_semana_str, start_time, end_time))
+                cursor.execute(query, (doctor_id, day_of_week, start_time, end_time))
                 schedule_id = cursor.fetchone()[0]
                 conn.commit()
                 return schedule_id
@@ -83,12 +74,11 @@ class MedicalScheduleManager:
         if not current_schedule:
             raise Exception("Horario no encontrado")
         
-        new_day = day_of_week if day_of_week is not None else current_schedule['dia_semana']
+        new_day = day_of_week if day_of_week is not None else current_schedule['dia_semana_num']
         new_start = start_time if start_time is not None else current_schedule['hora_inicio']
         new_end = end_time if end_time is not None else current_schedule['hora_fin']
         
-        dia_semana_str = DIA_SEMANA_MAP.get(new_day)
-        if not dia_semana_str:
+        if new_day not in DAY_NAMES:
             raise Exception("Día de la semana inválido")
 
         if not self._validate_schedule_input(current_schedule['id_medico'], new_day, new_start, new_end):
@@ -100,14 +90,14 @@ class MedicalScheduleManager:
         
         query = """
         UPDATE Horarios_disponibles
-        SET dia_semana = ?, hora_inicio = ?, hora_fin = ?
+        SET dia_semana_num = ?, hora_inicio = ?, hora_fin = ?
         WHERE id_horario = ?
         """
         
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(query, (dia_semana_str, new_start, new_end, schedule_id))
+                cursor.execute(query, (new_day, new_start, new_end, schedule_id))
                 conn.commit()
                 return cursor.rowcount > 0
                 
@@ -132,7 +122,7 @@ class MedicalScheduleManager:
     
     def get_schedule_by_id(self, schedule_id: int) -> Optional[Dict]:
         query = """
-        SELECT id_horario, id_medico, dia_semana, hora_inicio, hora_fin
+        SELECT id_horario, id_medico, dia_semana_num, dia_semana, hora_inicio, hora_fin
         FROM Horarios_disponibles
         WHERE id_horario = ?
         """
@@ -147,6 +137,7 @@ class MedicalScheduleManager:
                     return {
                         'id_horario': row.id_horario,
                         'id_medico': row.id_medico,
+                        'dia_semana_num': row.dia_semana_num,
                         'dia_semana': row.dia_semana,
                         'hora_inicio': str(row.hora_inicio),
                         'hora_fin': str(row.hora_fin)
@@ -182,7 +173,7 @@ class MedicalScheduleManager:
         existing_schedules = self.get_doctor_schedules(id_medico)
         
         day_schedules = [s for s in existing_schedules 
-                        if s['dia_semana'] == DIA_SEMANA_MAP.get(dia_semana)
+                        if s['dia_semana_num'] == dia_semana
                         and (exclude_id is None or s['id_horario'] != exclude_id)]
         
         new_start = datetime.strptime(hora_inicio, '%H:%M').time()
@@ -1,25 +1,22 @@
 from flask import Blueprint, request, jsonify, send_file
-import pyodbc
 import logging
 from datetime import datetime, timedelta
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 from auth_middleware import login_required
-from database import get_db_connection
+from database import get_db_connection, DatabaseError
+from config import DAY_NAMES
 from auth_middleware import role_required
+import schedule_cache
 import io
 
 schedules_bp = Blueprint('schedules', __name__)
 
 def check_schedule_conflict(cursor, id_medico, dia_semana, hora_inicio, hora_fin, exclude_id=None):
-    """Verifica si hay conflictos de horario para el médico"""
+    """Verifica si hay conflictos de horario para el médico (dia_semana: 1-7)"""
     query = """
                 SELECT id_horario
                 FROM Horarios_disponibles
                 WHERE id_medico = ?
-                AND dia_semana = ?
+                AND dia_semana_num = ?
                 AND (
                     (hora_inicio < ? AND hora_fin > ?)
                     OR (hora_inicio >= ? AND hora_inicio < ?)
@@ -53,16 +50,6 @@ def validate_schedule_input(id_medico, dia_semana, hora_inicio, hora_fin):
     except (ValueError, TypeError):
         return False
 
-DAY_NAMES = {
-    1: 'Lunes',
-    2: 'Martes',
-    3: 'Miércoles',
-    4: 'Jueves',
-    5: 'Viernes',
-    6: 'Sábado',
-    7: 'Domingo'
-}
-
 def validate_day_of_week(day):
     """Validate that day is an integer between 1-7"""
     if not isinstance(day, int):
@@ -77,42 +64,22 @@ def validate_day_of_week(day):
 @login_required
 def get_horarios_medico(current_user, id_medico):
     """Obtiene todos los horarios de un médico específico"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
-
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT id_horario, id_medico, dia_semana, hora_inicio, hora_fin
-                FROM Horarios_disponibles
-                WHERE id_medico = ?
-                ORDER BY CASE dia_semana 
-                    WHEN 'Lunes' THEN 1 WHEN 'Martes' THEN 2 WHEN 'Miércoles' THEN 3 
-                    WHEN 'Jueves' THEN 4 WHEN 'Viernes' THEN 5 WHEN 'Sábado' THEN 6 
-                    WHEN 'Domingo' THEN 7 END, hora_inicio
-            """, (id_medico,))
-
-            schedules = []
-            day_name_to_num = {v: k for k, v in DAY_NAMES.items()}
-            for row in cursor.fetchall():
-                schedules.append({
-                    'id_horario': row[0],
-                    'id_medico': row[1],
-                    'dia_semana_num': day_name_to_num.get(row[2]),
-                    'dia_semana': row[2],
-                    'hora_inicio': str(row[3])[:5],
-                    'hora_fin': str(row[4])[:5]
-                })
-            
-            schedules.sort(key=lambda x: x['dia_semana_num'])
-            return jsonify(schedules)
-
-    except pyodbc.Error as e:
-        logging.error(f"Error al obtener horarios: {str(e)}")
+    week = schedule_cache.week(id_medico)
+    if week is None:
         return jsonify({'error': 'Error al obtener horarios'}), 500
-    finally:
-        conn.close()
+
+    schedules = []
+    for day_num in range(1, 8):
+        for id_horario, hora_inicio, hora_fin in week[day_num]:
+            schedules.append({
+                'id_horario': id_horario,
+                'id_medico': id_medico,
+                'dia_semana_num': day_num,
+                'dia_semana': DAY_NAMES[day_num],
+                'hora_inicio': str(hora_inicio)[:5],
+                'hora_fin': str(hora_fin)[:5]
+            })
+    return jsonify(schedules)
 
 # Endpoint para crear un nuevo horario
 @schedules_bp.route('/api/horarios', methods=['POST'])
@@ -159,18 +126,19 @@ def create_horario(current_user):
     try:
         with conn.cursor() as cursor:
             # Verificar conflictos
-            if check_schedule_conflict(cursor, data['id_medico'], dia_semana_str, data['hora_inicio'], data['hora_fin']):
+            if check_schedule_conflict(cursor, data['id_medico'], dia_semana, data['hora_inicio'], data['hora_fin']):
                 return jsonify({'error': 'Conflicto de horarios detectado'}), 400
 
             cursor.execute("""
                 INSERT INTO Horarios_disponibles 
-                (id_medico, dia_semana, hora_inicio, hora_fin)
+                (id_medico, dia_semana_num, hora_inicio, hora_fin)
                 OUTPUT INSERTED.id_horario
                 VALUES (?, ?, ?, ?)
-            """, (data['id_medico'], dia_semana_str, data['hora_inicio'], data['hora_fin']))
+            """, (data['id_medico'], dia_semana, data['hora_inicio'], data['hora_fin']))
 
             schedule_id = cursor.fetchone()[0]
             conn.commit()
+            schedule_cache.invalidate()
 
             return jsonify({
                 'id_horario': schedule_id,
@@ -179,7 +147,7 @@ def create_horario(current_user):
                 'dia_semana': dia_semana_str
             }), 201
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error al crear horario: {str(e)}. Datos enviados: {data}")
         return jsonify({'error': 'Error al crear horario en la base de datos', 'detalle': str(e)}), 500
@@ -214,7 +182,7 @@ def update_horario(current_user, id_horario):
         with conn.cursor() as cursor:
             # Obtener el horario actual
             cursor.execute("""
-                SELECT id_medico, dia_semana, hora_inicio, hora_fin
+                SELECT id_medico, dia_semana_num, hora_inicio, hora_fin
                 FROM Horarios_disponibles
                 WHERE id_horario = ?
             """, (id_horario,))
@@ -224,9 +192,7 @@ def update_horario(current_user, id_horario):
                 return jsonify({'error': 'Horario no encontrado'}), 404
 
             current_doctor_id = current[0]
-            # Convert day name back to number for internal logic if needed
-            day_name_to_num = {v: k for k, v in DAY_NAMES.items()}
-            current_day_num = day_name_to_num.get(current[1], 0)
+            current_day_num = current[1]
 
             current_values = {
                 'dia_semana': current_day_num,
@@ -290,7 +256,7 @@ def update_horario(current_user, id_horario):
             # Verificar conflictos
             if check_schedule_conflict(cursor,
                 current_doctor_id,
-                dia_semana_str,
+                updated_values['dia_semana'],
                 updated_values['hora_inicio'],
                 updated_values['hora_fin'],
                 id_horario
@@ -303,16 +269,17 @@ def update_horario(current_user, id_horario):
             # Actualizar en la base de datos
             cursor.execute("""
                 UPDATE Horarios_disponibles
-                SET dia_semana = ?, hora_inicio = ?, hora_fin = ?
+                SET dia_semana_num = ?, hora_inicio = ?, hora_fin = ?
                 WHERE id_horario = ?
             """, (
-                dia_semana_str,
+                updated_values['dia_semana'],
                 updated_values['hora_inicio'],
                 updated_values['hora_fin'],
                 id_horario
             ))
 
             conn.commit()
+            schedule_cache.invalidate()
 
             if cursor.rowcount > 0:
                 return jsonify({
@@ -326,7 +293,7 @@ def update_horario(current_user, id_horario):
                 })
             return jsonify({'error': 'No se realizaron cambios en el horario'}), 404
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error al actualizar horario {id_horario}: {str(e)}")
         return jsonify({
@@ -355,13 +322,14 @@ def delete_horario(current_user, id_horario):
             """, (id_horario,))
 
             conn.commit()
+            schedule_cache.invalidate()
 
             if cursor.rowcount > 0:
                 return jsonify({'message': 'Horario eliminado correctamente'})
             else:
                 return jsonify({'error': 'Horario no encontrado'}), 404
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error al eliminar horario: {str(e)}")
         return jsonify({'error': 'Error al eliminar horario'}), 500
@@ -373,43 +341,19 @@ def delete_horario(current_user, id_horario):
 @login_required
 def get_horarios_semanal(current_user, id_medico):
     """Obtiene el horario semanal organizado por día"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
-
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT id_horario, dia_semana, hora_inicio, hora_fin
-                FROM Horarios_disponibles
-                WHERE id_medico = ?
-                ORDER BY hora_inicio
-            """, (id_medico,))
-
-            schedules = cursor.fetchall()
-            weekly_schedule = {i: [] for i in range(1, 8)}  # Días 1-7
-            day_name_to_num = {v: k for k, v in DAY_NAMES.items()}
-
-            for schedule in schedules:
-                day_str = schedule[1]
-                day_num = day_name_to_num.get(day_str)
-                if day_num and 1 <= day_num <= 7:
-                    weekly_schedule[day_num].append({
-                        'id_horario': schedule[0],
-                        'hora_inicio': str(schedule[2])[:8],
-                        'hora_fin': str(schedule[3])[:8]
-                    })
-
-            return jsonify(weekly_schedule)
-
-    except pyodbc.Error as e:
-        logging.error(f"Error al obtener horario semanal: {str(e)}")
+    week = schedule_cache.week(id_medico)
+    if week is None:
         return jsonify({'error': 'Error al obtener horario semanal'}), 500
-    except ValueError as e:
-        logging.error(f"Error de valor en horario semanal: {str(e)}")
-        return jsonify({'error': 'Error de datos en horario semanal'}), 500
-    finally:
-        conn.close()
+
+    weekly_schedule = {
+        day_num: [{
+            'id_horario': id_horario,
+            'hora_inicio': str(hora_inicio)[:8],
+            'hora_fin': str(hora_fin)[:8]
+        } for id_horario, hora_inicio, hora_fin in week[day_num]]
+        for day_num in range(1, 8)
+    }
+    return jsonify(weekly_schedule)
 
 # Endpoint para verificar slots disponibles
 @schedules_bp.route('/api/horarios/<int:id_medico>/slots', methods=['GET'])
@@ -422,44 +366,20 @@ def get_available_slots(current_user, id_medico):
     if not dia_semana or not 1 <= dia_semana <= 7:
         return jsonify({'error': 'Día de la semana inválido'}), 400
     
-    day_name = DAY_NAMES.get(dia_semana)
-    if not day_name:
-        return jsonify({'error': 'Día de la semana inválido'}), 400
-
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
-
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT hora_inicio, hora_fin
-                FROM Horarios_disponibles
-                WHERE id_medico = ? AND dia_semana = ?
-                ORDER BY hora_inicio
-            """, (id_medico, day_name))
-
-            schedules = cursor.fetchall()
-            available_slots = []
-
-            for schedule in schedules:
-                start_time = schedule[0]
-                end_time = schedule[1]
-
-                current_time = datetime.combine(datetime.today(), start_time)
-                end_datetime = datetime.combine(datetime.today(), end_time)
+    blocks = schedule_cache.day(id_medico, dia_semana)
+    if blocks is None:
+        return jsonify({'error': 'Error al obtener slots disponibles'}), 500
 
-                while current_time + timedelta(minutes=int(duracion_str)) <= end_datetime:
-                    available_slots.append(current_time.strftime('%H:%M'))
-                    current_time += timedelta(minutes=int(duracion_str))
+    available_slots = []
+    for _, start_time, end_time in blocks:
+        current_time = datetime.combine(datetime.today(), start_time)
+        end_datetime = datetime.combine(datetime.today(), end_time)
 
-            return jsonify(sorted(available_slots))
+        while current_time + timedelta(minutes=int(duracion_str)) <= end_datetime:
+            available_slots.append(current_time.strftime('%H:%M'))
+            current_time += timedelta(minutes=int(duracion_str))
 
-    except pyodbc.Error as e:
-        logging.error(f"Error al obtener slots disponibles: {str(e)}")
-        return jsonify({'error': 'Error al obtener slots disponibles'}), 500
-    finally:
-        conn.close()
+    return jsonify(sorted(available_slots))
 
 # Endpoint para copiar horarios de un médico a otro
 @schedules_bp.route('/api/horarios/copy', methods=['POST'])
@@ -486,7 +406,7 @@ def copy_schedules(current_user):
         with conn.cursor() as cursor:
             # 1. Obtener los horarios del médico de origen
             cursor.execute(
-                "SELECT dia_semana, hora_inicio, hora_fin FROM Horarios_disponibles WHERE id_medico = ?",
+                "SELECT dia_semana_num, hora_inicio, hora_fin FROM Horarios_disponibles WHERE id_medico = ?",
                 (source_doctor_id,)
             )
             source_schedules = cursor.fetchall()
@@ -503,19 +423,20 @@ def copy_schedules(current_user):
             for schedule in source_schedules:
                 # Si no se sobrescribe, se debe verificar si hay conflicto.
                 if not overwrite:
-                    if check_schedule_conflict(cursor, target_doctor_id, schedule.dia_semana, str(schedule.hora_inicio), str(schedule.hora_fin)):
+                    if check_schedule_conflict(cursor, target_doctor_id, schedule.dia_semana_num, str(schedule.hora_inicio), str(schedule.hora_fin)):
                         continue # Saltar este horario si hay conflicto
 
                 cursor.execute(
-                    "INSERT INTO Horarios_disponibles (id_medico, dia_semana, hora_inicio, hora_fin) VALUES (?, ?, ?, ?)",
-                    (target_doctor_id, schedule.dia_semana, schedule.hora_inicio, schedule.hora_fin)
+                    "INSERT INTO Horarios_disponibles (id_medico, dia_semana_num, hora_inicio, hora_fin) VALUES (?, ?, ?, ?)",
+                    (target_doctor_id, schedule.dia_semana_num, schedule.hora_inicio, schedule.hora_fin)
                 )
                 copied_count += 1
 
             conn.commit()
+            schedule_cache.invalidate()
             return jsonify({'message': f'Se copiaron {copied_count} de {len(source_schedules)} horarios exitosamente.'}), 200
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error al copiar horarios: {str(e)}")
         return jsonify({'error': 'Error en la base de datos al copiar horarios', 'detalle': str(e)}), 500
@@ -544,10 +465,11 @@ def delete_all_horarios_medico(current_user, id_medico):
             # Eliminar los horarios
             cursor.execute("DELETE FROM Horarios_disponibles WHERE id_medico = ?", (id_medico,))
             conn.commit()
+            schedule_cache.invalidate()
 
             return jsonify({'message': f'Se eliminaron {count} horarios del médico exitosamente.'}), 200
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error al eliminar todos los horarios del médico {id_medico}: {str(e)}")
         return jsonify({'error': 'Error en la base de datos al eliminar los horarios', 'detalle': str(e)}), 500
@@ -559,6 +481,12 @@ def delete_all_horarios_medico(current_user, id_medico):
 @login_required
 def export_schedules_pdf(current_user, id_medico):
     """Genera un PDF con los horarios de un médico."""
+    # ReportLab se importa aquí para no pagar su costo de carga al iniciar la aplicación
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib import colors
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión a la base de datos'}), 500
@@ -576,8 +504,11 @@ def export_schedules_pdf(current_user, id_medico):
                 return jsonify({'error': 'Médico no encontrado'}), 404
             doctor_name = doctor_row[0]
 
-            cursor.execute("SELECT dia_semana, hora_inicio, hora_fin FROM Horarios_disponibles WHERE id_medico = ? ORDER BY CASE dia_semana WHEN 'Lunes' THEN 1 WHEN 'Martes' THEN 2 WHEN 'Miércoles' THEN 3 WHEN 'Jueves' THEN 4 WHEN 'Viernes' THEN 5 WHEN 'Sábado' THEN 6 ELSE 7 END, hora_inicio", (id_medico,))
-            schedules = cursor.fetchall()
+            week = schedule_cache.week(id_medico)
+            if week is None:
+                return jsonify({'error': 'Error interno al generar el PDF'}), 500
+            schedules = [(DAY_NAMES[day_num], hora_inicio, hora_fin)
+                         for day_num in range(1, 8) for _, hora_inicio, hora_fin in week[day_num]]
 
             if not schedules:
                 return jsonify({'error': 'El médico no tiene horarios para exportar.'}), 404
@@ -587,8 +518,8 @@ def export_schedules_pdf(current_user, id_medico):
             elements.append(Spacer(1, 12))
 
             table_data = [['Día', 'Hora de Inicio', 'Hora de Fin']]
-            for row in schedules:
-                table_data.append([row.dia_semana, str(row.hora_inicio)[:5], str(row.hora_fin)[:5]])
+            for dia_semana, hora_inicio, hora_fin in schedules:
+                table_data.append([dia_semana, str(hora_inicio)[:5], str(hora_fin)[:5]])
 
             table = Table(table_data)
             style = TableStyle([
@@ -624,43 +555,21 @@ def export_schedules_pdf(current_user, id_medico):
 @role_required(2) # Solo para médicos
 def get_my_schedule(current_user):
     """Obtiene el horario semanal del médico que ha iniciado sesión."""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
+    # login_required ya resolvió el id_medico del usuario
+    doctor_id = current_user.get('id_medico')
+    if not doctor_id:
+        return jsonify({'error': 'Perfil de médico no encontrado para este usuario.'}), 404
 
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT id_medico FROM Medicos WHERE id_usuario = ?
-            """, (current_user.get('id_usuario'),))
-            doctor_row = cursor.fetchone()
-            if not doctor_row:
-                return jsonify({'error': 'Perfil de médico no encontrado para este usuario.'}), 404
-            doctor_id = doctor_row.id_medico
-            cursor.execute("""
-                SELECT id_horario, dia_semana, hora_inicio, hora_fin
-                FROM Horarios_disponibles
-                WHERE id_medico = ?
-                ORDER BY dia_semana, hora_inicio
-            """, (doctor_id,))
-
-            schedules = cursor.fetchall()
-            
-            weekly_schedule = {day_name: [] for day_name in DAY_NAMES.values()}
-
-            for schedule in schedules:
-                day_str = schedule[1]
-                if day_str in weekly_schedule:
-                    weekly_schedule[day_str].append({
-                        'id_horario': schedule[0],
-                        'hora_inicio': str(schedule[2]),
-                        'hora_fin': str(schedule[3])
-                    })
-
-            return jsonify(weekly_schedule)
-
-    except pyodbc.Error as e:
-        logging.error(f"Error al obtener mi horario semanal: {str(e)}")
+    week = schedule_cache.week(doctor_id)
+    if week is None:
         return jsonify({'error': 'Error al obtener el horario semanal'}), 500
-    finally:
-        conn.close()
+
+    weekly_schedule = {
+        DAY_NAMES[day_num]: [{
+            'id_horario': id_horario,
+            'hora_inicio': str(hora_inicio),
+            'hora_fin': str(hora_fin)
+        } for id_horario, hora_inicio, hora_fin in week[day_num]]
+        for day_num in range(1, 8)
+    }
+    return jsonify(weekly_schedule)
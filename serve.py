@@ -0,0 +1,166 @@
+"""Arranque de producción.
+
+main.py levanta el servidor de desarrollo de Werkzeug (un proceso, depurador
+activo). Este script sirve la aplicación con un servidor WSGI multihilo:
+
+  - gunicorn (Linux/macOS): varios workers con hilos (gthread). La aplicación
+    se carga una vez en el proceso maestro antes del fork (preload_app) y cada
+    worker, al arrancar, reinicia el hilo de logging y precalienta la conexión
+    a la base de datos y las cachés.
+  - waitress (Windows, o si gunicorn no está instalado): un proceso con hilos.
+
+Los hilos por worker son WEB_THREADS (cada hilo usa como mucho una conexión a
+la vez) y los workers se limitan para no superar DB_MAX_CONNECTIONS en total.
+
+Antes de cargar la aplicación (y de crear los workers) se aplican las
+migraciones pendientes una sola vez, en el proceso principal: sin ellas
+/api/health/ready responde 503 porque el esquema no está en la versión esperada.
+
+Con gunicorn y varios workers, app.log y slow_queries.log no se rotan desde la
+aplicación (LOG_FILE_MODE='watched'): la rotación la hace logrotate, o bien se
+usa LOG_FILE_MODE=stdout y los registros los recoge el supervisor del proceso.
+
+Uso:
+    python serve.py
+    python serve.py --port 8080 --workers 2 --threads 8
+    python serve.py --profile        # solo muestra la configuración calculada
+    python serve.py --skip-migrations  # las migraciones se aplican aparte (init_database.py)
+"""
+import argparse
+import logging
+import os
+import sys
+
+from config import WEB_HOST, WEB_PORT, WEB_THREADS, WEB_WORKERS, DB_MAX_CONNECTIONS
+
+# Páginas públicas que se renderizan al arrancar cada worker (ver page_cache.py)
+WARM_PAGES = ['/', '/login']
+
+
+def serving_profile(workers=None, threads=None):
+    """Workers e hilos para esta máquina, acotados por las conexiones disponibles."""
+    threads = threads or WEB_THREADS
+    workers = workers or WEB_WORKERS
+    if not workers:
+        cpu_bound = 2 * (os.cpu_count() or 1) + 1
+        workers = max(1, min(cpu_bound, DB_MAX_CONNECTIONS // threads))
+    return {
+        'workers': workers,
+        'threads': threads,
+        'max_db_connections': workers * threads,
+    }
+
+
+def warm_worker(app):
+    """Abre y prueba una conexión, carga el índice de identificadores y renderiza las páginas cacheadas."""
+    from database import get_db_connection
+    import identity_index
+
+    conn = get_db_connection()
+    if conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+        finally:
+            # Con el pooling de ODBC la conexión queda abierta en el pool del proceso
+            conn.close()
+        identity_index.warm()
+    else:
+        logging.warning("Worker sin conexión a la base de datos al arrancar")
+
+    client = app.test_client()
+    for path in WARM_PAGES:
+        client.get(path, headers={'Accept-Encoding': 'gzip'})
+    logging.info(f"Worker {os.getpid()} listo")
+
+
+def serve_gunicorn(app, host, port, profile):
+    from gunicorn.app.base import BaseApplication
+
+    import logger
+
+    def post_fork(server, worker):
+        logger.restart_after_fork()
+        warm_worker(app)
+
+    class ClinicaApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', profile['workers'])
+            self.cfg.set('threads', profile['threads'])
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('preload_app', True)
+            self.cfg.set('timeout', 60)
+            self.cfg.set('keepalive', 5)
+            self.cfg.set('post_fork', post_fork)
+
+        def load(self):
+            return app
+
+    ClinicaApplication().run()
+
+
+def serve_waitress(app, host, port, profile):
+    from waitress import serve
+
+    warm_worker(app)
+    serve(app, host=host, port=port, threads=profile['threads'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=WEB_HOST)
+    parser.add_argument('--port', type=int, default=WEB_PORT)
+    parser.add_argument('--workers', type=int, help='workers de gunicorn (por defecto, automático)')
+    parser.add_argument('--threads', type=int, help='hilos por worker')
+    parser.add_argument('--server', choices=['gunicorn', 'waitress'], help='forzar un servidor')
+    parser.add_argument('--profile', action='store_true', help='mostrar la configuración y salir')
+    parser.add_argument('--skip-migrations', action='store_true', help='no aplicar las migraciones pendientes al arrancar')
+    args = parser.parse_args()
+
+    server = args.server
+    if not server:
+        try:
+            if os.name == 'nt':
+                raise ImportError
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'waitress'
+
+    profile = serving_profile(args.workers, args.threads)
+    if server == 'waitress':
+        # waitress no crea procesos: un solo worker con todos sus hilos
+        profile = serving_profile(1, args.threads)
+    if args.profile:
+        print({'server': server, **profile})
+        return
+
+    import logger
+    if server == 'gunicorn' and profile['workers'] > 1 and logger.file_mode() == 'rotate':
+        # Varios procesos no pueden rotar el mismo archivo: la rotación queda para logrotate
+        logger.use_file_mode('watched')
+
+    from app import create_app
+    app = create_app()
+
+    if not args.skip_migrations:
+        # Una sola vez y antes del fork: los workers nacen con el esquema al día
+        from init_database import init_database
+        if not init_database():
+            app.logger.error("No se pudieron aplicar las migraciones; /api/health/ready responderá 503")
+
+    app.logger.info(f"Sirviendo con {server} en {args.host}:{args.port}: {profile}")
+
+    try:
+        if server == 'gunicorn':
+            serve_gunicorn(app, args.host, args.port, profile)
+        else:
+            serve_waitress(app, args.host, args.port, profile)
+    except ImportError:
+        sys.exit(f"{server} no está instalado: pip install {server}")
+
+
+if __name__ == '__main__':
+    main()
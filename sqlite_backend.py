@@ -0,0 +1,308 @@
+import re
+import sqlite3
+from datetime import date, datetime, time
+from functools import lru_cache
+from database import DatabaseError
+
+# Backend SQLite para pruebas locales y benchmarks sin SQL Server (DB_BACKEND=sqlite).
+#
+# Las consultas de los blueprints están escritas en T-SQL; translate() las reescribe
+# al dialecto de SQLite y SQLiteConnection/SQLiteCursor imitan la parte de la API de
+# pyodbc que usa la aplicación (parámetros posicionales, acceso a columnas por
+# atributo, fetchval, commit al salir del bloque with del cursor, fechas y horas
+# como objetos de Python).
+
+# --- Traducción T-SQL -> SQLite ---
+
+_FUNCTION_CALL = re.compile(r"\b(GETDATE|SCOPE_IDENTITY|CONVERT|CAST|DATEADD|DATEDIFF|DATEPART)\s*\(", re.IGNORECASE)
+_SELECT_TOP = re.compile(r"\bSELECT\s+TOP\s*\(?\s*(\d+)\s*\)?", re.IGNORECASE)
+_OFFSET_FETCH = re.compile(r"\bOFFSET\s+(\?|\d+)\s+ROWS\s+FETCH\s+NEXT\s+(\?|\d+)\s+ROWS\s+ONLY", re.IGNORECASE)
+_OUTPUT_CLAUSE = re.compile(r"\bOUTPUT\s+((?:INSERTED|DELETED)\.\w+(?:\s*,\s*(?:INSERTED|DELETED)\.\w+)*)", re.IGNORECASE)
+_UNICODE_LITERAL = re.compile(r"\bN'")
+_CAST_ARGS = re.compile(r"(.*)\s+AS\s+(\w+(?:\s*\(\s*\w+\s*\))?)\s*$", re.IGNORECASE | re.DOTALL)
+_STRING_CONCAT = re.compile(r"(?<=')\s*\+\s*|\s*\+\s*(?=')")
+
+_DATE_UNITS = {'day': 'days', 'dd': 'days', 'd': 'days', 'month': 'months', 'mm': 'months', 'm': 'months',
+               'year': 'years', 'yy': 'years', 'yyyy': 'years', 'hour': 'hours', 'hh': 'hours',
+               'minute': 'minutes', 'mi': 'minutes', 'n': 'minutes', 'second': 'seconds', 'ss': 'seconds'}
+_DATEPART_FORMATS = {'year': '%Y', 'month': '%m', 'day': '%d', 'hour': '%H', 'minute': '%M', 'second': '%S'}
+_TIME_UNITS = {'hours': 24, 'minutes': 1440, 'seconds': 86400}
+_TEXT_TYPES = ('varchar', 'nvarchar', 'char', 'nchar', 'text', 'ntext')
+
+def _split_args(args):
+    """Divide los argumentos de una llamada por las comas de primer nivel."""
+    parts, depth, current, quoted = [], 0, '', False
+    for char in args:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        current += char
+    parts.append(current.strip())
+    return parts
+
+def _closing_paren(sql, start):
+    """Índice del paréntesis que cierra el abierto en sql[start - 1]."""
+    depth, quoted = 1, False
+    for i in range(start, len(sql)):
+        char = sql[i]
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise DatabaseError(f"Paréntesis sin cerrar en la consulta: {sql}")
+
+def _date_literal(value):
+    # En T-SQL el entero 0 como fecha equivale a 1900-01-01
+    return "'1900-01-01'" if value == '0' else value
+
+def _rewrite_call(name, args):
+    name = name.upper()
+    if name == 'GETDATE':
+        return "datetime('now', 'localtime')"
+    if name == 'SCOPE_IDENTITY':
+        return 'last_insert_rowid()'
+
+    if name == 'CAST':
+        expression, target = _CAST_ARGS.match(args).groups()
+        expression, target = _rewrite_functions(expression.strip()), target.lower()
+        if target == 'date':
+            return f'date({expression})'
+        if target.split('(')[0] in _TEXT_TYPES:
+            return f'CAST({expression} AS TEXT)'
+        return f'CAST({expression} AS {target.upper()})'
+
+    parts = [_rewrite_functions(part) for part in _split_args(args)]
+    if name == 'CONVERT':
+        target = parts[0].lower().split('(')[0]
+        if target == 'date':
+            return f'date({parts[1]})'
+        if target in _TEXT_TYPES:
+            style = parts[2] if len(parts) > 2 else None
+            if style == '108':
+                return f"strftime('%H:%M:%S', {parts[1]})"
+            return f'CAST({parts[1]} AS TEXT)'
+        return f'CAST({parts[1]} AS {parts[0].upper()})'
+
+    unit = parts[0].lower()
+    if name == 'DATEADD':
+        return f"datetime({_date_literal(parts[2])}, printf('%+d {_DATE_UNITS[unit]}', {parts[1]}))"
+    if name == 'DATEDIFF':
+        start, end = _date_literal(parts[1]), _date_literal(parts[2])
+        if _DATE_UNITS[unit] == 'months':
+            return (f"((CAST(strftime('%Y', {end}) AS INTEGER) - CAST(strftime('%Y', {start}) AS INTEGER)) * 12"
+                    f" + CAST(strftime('%m', {end}) AS INTEGER) - CAST(strftime('%m', {start}) AS INTEGER))")
+        if _DATE_UNITS[unit] == 'years':
+            return f"(CAST(strftime('%Y', {end}) AS INTEGER) - CAST(strftime('%Y', {start}) AS INTEGER))"
+        if _DATE_UNITS[unit] in _TIME_UNITS:
+            # julianday() también acepta horas solas ('08:30:00'); la diferencia se pasa a la unidad pedida
+            return f"CAST(ROUND((julianday({end}) - julianday({start})) * {_TIME_UNITS[_DATE_UNITS[unit]]}) AS INTEGER)"
+        return f"CAST(julianday(date({end})) - julianday(date({start})) AS INTEGER)"
+    if name == 'DATEPART':
+        if unit in ('weekday', 'dw'):
+            # SQL Server (DATEFIRST 7): domingo = 1 ... sábado = 7
+            return f"(CAST(strftime('%w', {parts[1]}) AS INTEGER) + 1)"
+        return f"CAST(strftime('{_DATEPART_FORMATS[unit]}', {parts[1]}) AS INTEGER)"
+    raise DatabaseError(f"Función T-SQL no soportada en SQLite: {name}")
+
+def _rewrite_functions(sql):
+    result, position = '', 0
+    while True:
+        match = _FUNCTION_CALL.search(sql, position)
+        if not match:
+            return result + sql[position:]
+        end = _closing_paren(sql, match.end())
+        result += sql[position:match.start()] + _rewrite_call(match.group(1), sql[match.end():end])
+        position = end + 1
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """Reescribe una sentencia T-SQL de la aplicación al dialecto de SQLite."""
+    sql = _UNICODE_LITERAL.sub("'", sql)
+    sql = _rewrite_functions(sql)
+    sql = _STRING_CONCAT.sub(' || ', sql)
+    sql = _OFFSET_FETCH.sub(r'LIMIT \1, \2', sql)
+
+    suffix = ''
+    top = _SELECT_TOP.search(sql)
+    if top:
+        sql = sql[:top.start()] + 'SELECT ' + sql[top.end():]
+        suffix += f' LIMIT {top.group(1)}'
+    output = _OUTPUT_CLAUSE.search(sql)
+    if output:
+        sql = sql[:output.start()] + sql[output.end():]
+        suffix += ' RETURNING ' + re.sub(r'(INSERTED|DELETED)\.', '', output.group(1), flags=re.IGNORECASE)
+
+    if suffix:
+        sql = sql.rstrip().rstrip(';') + suffix
+    return sql
+
+# --- Conversión de tipos ---
+
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' ', timespec='seconds'))
+sqlite3.register_adapter(time, lambda value: value.isoformat(timespec='seconds'))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()[:10]))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('TIME', lambda value: time.fromisoformat(value.decode()))
+
+_DATE_TEXT = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_TIME_TEXT = re.compile(r'^\d{2}:\d{2}:\d{2}(\.\d+)?$')
+
+def _convert(value):
+    # Las columnas calculadas (date(...), strftime(...)) llegan como texto; pyodbc las
+    # devolvería como date/time, que es lo que esperan los blueprints.
+    if isinstance(value, str):
+        if _DATE_TEXT.match(value):
+            return date.fromisoformat(value)
+        if _TIME_TEXT.match(value):
+            return time.fromisoformat(value)
+    return value
+
+_SHORT_TIME_TEXT = re.compile(r'^\d{2}:\d{2}$')
+
+def _normalize_param(value):
+    # SQL Server convierte '09:30' a TIME al comparar; en SQLite son textos distintos de
+    # '09:30:00', así que las horas sin segundos se completan antes de enviarlas.
+    if isinstance(value, str) and _SHORT_TIME_TEXT.match(value):
+        return value + ':00'
+    return value
+
+class Row(tuple):
+    """Fila compatible con pyodbc.Row: acceso por índice y por nombre de columna."""
+
+    def __new__(cls, columns, values):
+        row = super().__new__(cls, values)
+        row._columns = columns
+        return row
+
+    def __getattr__(self, name):
+        try:
+            return self[self._columns[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+# --- Conexión y cursor ---
+
+class SQLiteCursor:
+    # Opción de pyodbc; executemany de sqlite3 ya reutiliza la sentencia preparada
+    fast_executemany = False
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._conn.cursor()
+        self._columns = None
+
+    @staticmethod
+    def _params(params):
+        # pyodbc acepta cursor.execute(sql, (a, b)) y cursor.execute(sql, a, b)
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        return tuple(_normalize_param(value) for value in params)
+
+    def execute(self, sql, *params):
+        try:
+            self._cursor.execute(translate(sql), self._params(params))
+        except sqlite3.Error as e:
+            if DatabaseError is sqlite3.Error:
+                raise
+            raise DatabaseError(str(e)) from e
+        self._columns = {column[0]: i for i, column in enumerate(self._cursor.description or ())}
+        return self
+
+    def executemany(self, sql, params):
+        try:
+            self._cursor.executemany(translate(sql), [tuple(_normalize_param(value) for value in row) for row in params])
+        except sqlite3.Error as e:
+            if DatabaseError is sqlite3.Error:
+                raise
+            raise DatabaseError(str(e)) from e
+        self._columns = {}
+        return self
+
+    def _row(self, values):
+        return Row(self._columns, [_convert(value) for value in values])
+
+    def fetchone(self):
+        values = self._cursor.fetchone()
+        return self._row(values) if values is not None else None
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        return [self._row(values) for values in rows]
+
+    def fetchall(self):
+        return [self._row(values) for values in self._cursor.fetchall()]
+
+    def fetchval(self):
+        row = self.fetchone()
+        return row[0] if row is not None else None
+
+    def __iter__(self):
+        for values in self._cursor:
+            yield self._row(values)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Igual que pyodbc: confirma la transacción si el bloque terminó sin excepción
+        if exc_type is None:
+            self._connection.commit()
+
+class SQLiteConnection:
+    def __init__(self, path):
+        # Como con pyodbc, la conexión puede cerrarse desde otro hilo (p. ej. el cierre de chatbot.py)
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+
+    def cursor(self):
+        return SQLiteCursor(self)
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+def connect(path):
+    try:
+        return SQLiteConnection(path)
+    except sqlite3.Error as e:
+        if DatabaseError is sqlite3.Error:
+            raise
+        raise DatabaseError(str(e)) from e
@@ -7,22 +7,39 @@ document.addEventListener('DOMContentLoaded', function() {
     initDashboard();
 
     function initDashboard() {
-        loadUserData();
-        loadStatistics();
-        loadUpcomingAppointments();
-        loadSystemSummary();
-        loadRecentActivity();
-        initCharts();
+        // Una sola petición trae todos los widgets del primer render;
+        // si falla, cada widget vuelve a pedir su propio endpoint.
+        fetchJson('/api/admin/bootstrap')
+            .then(bootstrap => bootstrap.widgets || {})
+            .catch(error => {
+                console.error('Error al cargar el bootstrap del dashboard:', error);
+                return {};
+            })
+            .then(widgets => {
+                loadUserData(widgets.user);
+                loadStatistics(widgets.stats);
+                loadUpcomingAppointments(widgets.upcoming_appointments);
+                loadSystemSummary(widgets.stats);
+                loadRecentActivity(widgets.recent_activity);
+                initCharts(widgets.appointments_chart, widgets.status_chart);
+            });
         setupEventListeners();
     }
 
+    // Devuelve los datos precargados si existen; si no, los pide al servidor
+    function fetchJson(url, preloaded) {
+        if (preloaded !== undefined && preloaded !== null) {
+            return Promise.resolve(preloaded);
+        }
+        return fetch(url).then(response => {
+            if (!response.ok) throw new Error('Error en la respuesta del servidor');
+            return response.json();
+        });
+    }
+
     // Cargar datos del usuario
-    function loadUserData() {
-        fetch('/api/user-data')
-            .then(response => {
-                if (!response.ok) throw new Error('Error en la respuesta del servidor');
-                return response.json();
-            })
+    function loadUserData(preloaded) {
+        fetchJson('/api/user-data', preloaded)
             .then(data => {
                 document.getElementById('username').textContent = data.nombre || 'Administrador';
                 document.getElementById('userrole').textContent = data.rol || 'Admin';
@@ -34,12 +51,8 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Cargar estadísticas
-    function loadStatistics() {
-        fetch('/api/admin/stats')
-            .then(response => {
-                if (!response.ok) throw new Error('Error en la respuesta del servidor');
-                return response.json();
-            })
+    function loadStatistics(preloaded) {
+        fetchJson('/api/admin/stats', preloaded)
             .then(stats => {
                 updateStatsCards(stats);
                 
@@ -123,12 +136,8 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Cargar próximas citas
-    function loadUpcomingAppointments() {
-        fetch('/api/upcoming-appointments')
-            .then(response => {
-                if (!response.ok) throw new Error('Error en la respuesta del servidor');
-                return response.json();
-            })
+    function loadUpcomingAppointments(preloaded) {
+        fetchJson('/api/upcoming-appointments', preloaded)
             .then(appointments => {
                 const tableBody = document.querySelector('#upcoming-appointments tbody');
                 tableBody.innerHTML = '';
@@ -172,12 +181,8 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Cargar resumen del sistema
-    function loadSystemSummary() {
-        fetch('/api/admin/stats')
-            .then(response => {
-                if (!response.ok) throw new Error('Error en la respuesta del servidor');
-                return response.json();
-            })
+    function loadSystemSummary(preloaded) {
+        fetchJson('/api/admin/stats', preloaded)
             .then(stats => {
                 const summaryContainer = document.getElementById('system-summary');
                 summaryContainer.innerHTML = `
@@ -215,12 +220,16 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Cargar actividad reciente
-    function loadRecentActivity() {
-        fetch('/api/admin/recent-activity')
-            .then(response => {
-                if (!response.ok) throw new Error('Error en la respuesta del servidor');
-                return response.json();
-            })
+    // "Nuevo Médico" para las altas; "Médico actualizado", "Cita cancelada"... para el resto
+    function activityTitle(activity, newLabel, noun) {
+        if (!activity.action || activity.action === 'creado' || activity.action === 'creada') {
+            return newLabel;
+        }
+        return `${noun} ${activity.action}`;
+    }
+
+    function loadRecentActivity(preloaded) {
+        fetchJson('/api/admin/recent-activity', preloaded)
             .then(activities => {
                 const container = document.getElementById('recent-activity');
                 container.innerHTML = '';
@@ -243,15 +252,15 @@ document.addEventListener('DOMContentLoaded', function() {
                     switch (activity.type) {
                         case 'Médico':
                             iconHtml = '<i class="fas fa-user-md fa-lg text-success me-3 mt-1"></i>';
-                            textHtml = `<div><strong>Nuevo Médico:</strong> ${activity.name} (${activity.specialty})</div>`;
+                            textHtml = `<div><strong>${activityTitle(activity, 'Nuevo Médico', 'Médico')}:</strong> ${activity.name} (${activity.specialty})</div>`;
                             break;
                         case 'Paciente':
                             iconHtml = '<i class="fas fa-user-plus fa-lg text-info me-3 mt-1"></i>';
-                            textHtml = `<div><strong>Nuevo Paciente:</strong> ${activity.name}</div>`;
+                            textHtml = `<div><strong>${activityTitle(activity, 'Nuevo Paciente', 'Paciente')}:</strong> ${activity.name}</div>`;
                             break;
                         case 'Cita':
                             iconHtml = '<i class="fas fa-calendar-check fa-lg text-warning me-3 mt-1"></i>';
-                            textHtml = `<div><strong>Nueva Cita:</strong> ${activity.details}</div>`;
+                            textHtml = `<div><strong>${activityTitle(activity, 'Nueva Cita', 'Cita')}:</strong> ${activity.details}</div>`;
                             break;
                         default:
                             iconHtml = '<i class="fas fa-info-circle fa-lg text-secondary me-3 mt-1"></i>';
@@ -278,13 +287,13 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Inicializar gráficas
-    function initCharts() {
-        initAppointmentsChart();
-        initStatusChart();
+    function initCharts(appointmentsData, statusData) {
+        initAppointmentsChart(null, null, appointmentsData);
+        initStatusChart(statusData);
     }
 
     // Gráfica de rendimiento de citas
-    function initAppointmentsChart(startDate = null, endDate = null) {
+    function initAppointmentsChart(startDate = null, endDate = null, preloaded = null) {
         let url = '/api/admin/appointments-chart';
         if (startDate && endDate) {
             const params = new URLSearchParams({
@@ -294,11 +303,7 @@ document.addEventListener('DOMContentLoaded', function() {
             url += `?${params.toString()}`;
         }
 
-        fetch(url)
-            .then(response => {
-                if (!response.ok) throw new Error('Error en la respuesta del servidor');
-                return response.json();
-            })
+        fetchJson(url, preloaded)
             .then(chartData => {
                 const ctx = document.getElementById('appointmentsChart').getContext('2d');
                 
@@ -380,12 +385,8 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Gráfica de estado de citas
-    function initStatusChart() {
-        fetch('/api/admin/appointments-status-chart')
-            .then(response => {
-                if (!response.ok) throw new Error('Error en la respuesta del servidor');
-                return response.json();
-            })
+    function initStatusChart(preloaded) {
+        fetchJson('/api/admin/appointments-status-chart', preloaded)
             .then(chartData => {
                 const ctx = document.getElementById('statusChart').getContext('2d');
                 
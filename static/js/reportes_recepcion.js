@@ -12,6 +12,9 @@ $(document).ready(function() {
     let complianceChart = null;
     let doctorRankingChart = null;
 
+    // Filas por página del detalle de cumplimiento (máximo que acepta la API)
+    const COMPLIANCE_DETAILS_PAGE = 1000;
+
     // --- INICIALIZACIÓN ---
     const initialize = () => {
         // Establecer fechas por defecto (últimos 30 días)
@@ -508,7 +511,7 @@ $(document).ready(function() {
             // Destruir gráfico anterior
             destroyChart(complianceChart);
 
-            fetch(`/api/reports/appointment-compliance?start_date=${startDate}&end_date=${endDate}`)
+            fetch(`/api/reports/appointment-compliance?start_date=${startDate}&end_date=${endDate}&details=1&per_page=${COMPLIANCE_DETAILS_PAGE}`)
                 .then(response => {
                     if (!response.ok) throw new Error(`Error del servidor: ${response.statusText}`);
                     return response.json();
@@ -613,6 +616,9 @@ $(document).ready(function() {
                         pageLength: 10
                     });
 
+                    // El detalle llega paginado: el resto de páginas se agrega a la tabla en segundo plano
+                    loadComplianceDetailPages(startDate, endDate, complianceTable, 2, data.total_pages || 1);
+
                     resolve();
                 })
                 .catch(error => {
@@ -624,6 +630,22 @@ $(document).ready(function() {
         });
     }
 
+    function loadComplianceDetailPages(startDate, endDate, table, page, totalPages) {
+        if (page > totalPages) return;
+        fetch(`/api/reports/appointment-compliance?start_date=${startDate}&end_date=${endDate}&details=1&summary=0&per_page=${COMPLIANCE_DETAILS_PAGE}&page=${page}`)
+            .then(response => {
+                if (!response.ok) throw new Error(`Error del servidor: ${response.statusText}`);
+                return response.json();
+            })
+            .then(data => {
+                // Si se generó otro reporte mientras tanto, esta tabla ya no existe
+                if (table !== complianceTable) return;
+                table.rows.add(data.details || []).draw(false);
+                loadComplianceDetailPages(startDate, endDate, table, page + 1, totalPages);
+            })
+            .catch(error => console.error('Error al cargar el detalle de cumplimiento:', error));
+    }
+
     function generateOccupancyReport(startDate, endDate) {
         return new Promise((resolve, reject) => {
             $('#heatmap-body').html('<tr><td colspan="8" class="text-center"><div class="spinner-border spinner-border-sm"></div> Cargando...</td></tr>');
@@ -0,0 +1,81 @@
+"""Fixtures de las pruebas de presupuesto de base de datos.
+
+Las pruebas corren contra el backend SQLite (DB_BACKEND=sqlite, ver
+sqlite_backend.py) en una base temporal con el esquema de migrations.py y un
+conjunto pequeño de datos de benchmarks/generate_data.py, así que no necesitan
+SQL Server. La aplicación se crea con TESTING=True: los endpoints con
+@query_budget lanzan QueryBudgetExceeded si superan lo declarado.
+
+Uso:
+    python -m pytest -q
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py lee el entorno al importarse: se fija antes de importar la aplicación
+_DB_DIR = tempfile.mkdtemp(prefix='clinica_tests_')
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(_DB_DIR, 'clinica_tests.db')
+# Los contadores de query_budget los alimenta el cursor instrumentado
+os.environ['DB_INSTRUMENTATION'] = 'True'
+# Sin app.log ni slow_queries.log en el repositorio
+os.environ.setdefault('LOG_FILE_MODE', 'stdout')
+
+import pytest
+
+import cache
+import logger
+import password_service
+import query_budget
+
+PASSWORD = 'Bench1234!'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from init_database import init_database
+    from benchmarks.generate_data import generate
+    from app import create_app
+
+    assert init_database(), "No se pudo crear el esquema de pruebas"
+    generate(argparse.Namespace(doctors=3, patients=12, receptionists=1, years=1, future_days=30,
+                                occupancy=0.5, seed=7, password=PASSWORD, reset=False))
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+    # El hilo escritor del logging usa el stderr que pytest cierra al terminar
+    logger.stop()
+
+
+@pytest.fixture
+def login(app):
+    """Cliente con la sesión iniciada: login('bench_admin_1')."""
+    def _login(usuario_login):
+        # Las pruebas inician muchas sesiones seguidas desde la misma IP
+        password_service.identifier_limiter.reset()
+        password_service.ip_limiter.reset()
+        client = app.test_client()
+        response = client.post('/api/login', json={'identificador': usuario_login, 'contraseña': PASSWORD},
+                               headers={'X-Requested-With': 'XMLHttpRequest'})
+        assert response.status_code == 200, response.get_json()
+        return client
+    return _login
+
+
+@pytest.fixture
+def round_trips():
+    """
+    track_round_trips() con las cachés en memoria vacías, para medir el peor caso
+    (la primera petición tras un despliegue o una invalidación):
+
+        with round_trips() as counts:
+            client.get('/api/admin/stats')
+    """
+    for name in cache.snapshot():
+        cache.bump(name)
+    return query_budget.track_round_trips
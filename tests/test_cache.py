@@ -0,0 +1,39 @@
+import cache
+
+
+def test_invalidate_during_load_discards_the_loaded_value():
+    data = {'paciente': 'antes'}
+    history = None
+
+    def loader(key):
+        value = data[key]
+        # Una escritura confirma e invalida mientras la carga sigue en curso
+        data[key] = 'después'
+        history.invalidate(key)
+        return value
+
+    history = cache.VersionedCache('prueba_generaciones', loader)
+    assert history.get('paciente') == 'antes'
+    assert history.snapshot()['entries'] == 0
+
+    history._loader = lambda key: data[key]
+    assert history.get('paciente') == 'después'
+    assert history.get('paciente') == 'después'
+    assert history.snapshot()['hits'] == 1
+
+
+def test_invalidate_other_key_keeps_the_loaded_value():
+    values = cache.VersionedCache('prueba_otra_clave', lambda key: key.upper())
+    values.invalidate('b')
+    assert values.get('a') == 'A'
+    assert values.snapshot()['entries'] == 1
+
+
+def test_generations_are_bounded(monkeypatch):
+    monkeypatch.setattr(cache, 'MAX_GENERATIONS', 3)
+    values = cache.VersionedCache('prueba_limite', lambda key: key)
+    values.get('a')
+    for key in ('b', 'c', 'd', 'e'):
+        values.invalidate(key)
+    assert len(values._generations) <= 3
+    assert values.snapshot()['entries'] == 0
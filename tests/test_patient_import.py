@@ -0,0 +1,197 @@
+import io
+import time
+
+import pytest
+
+import password_service
+import patient_import
+from database import DatabaseError, get_db_connection
+
+HEADER = 'nombre_completo;cedula;contraseña;gmail\n'
+
+
+def _csv(*rows):
+    return (HEADER + ''.join(';'.join(row) + '\n' for row in rows)).encode('utf-8')
+
+
+def _usuarios(cedulas):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT cedula FROM Usuarios WHERE cedula IN ({', '.join('?' * len(cedulas))})", cedulas)
+            return sorted(row[0] for row in cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def test_import_runs_in_background(login):
+    client = login('bench_admin_1')
+    body = _csv(('Ana Pérez', 'V-90000001', 'Clave1234!', 'ana.perez@correo.com'),
+                ('Luis Mora', 'V-90000002', 'Clave1234!', 'luis.mora@correo.com'))
+    response = client.post('/api/pacientes/importar', data=body, content_type='text/csv')
+    assert response.status_code == 202, response.get_json()
+
+    url = response.get_json()['url_estado']
+    deadline = time.monotonic() + 60
+    while True:
+        estado = client.get(url).get_json()
+        if estado['estado'] != 'en_curso' or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    assert estado['estado'] == 'completada', estado
+    assert estado['importados'] == 2
+    assert estado['reporte']['errores'] == []
+    assert _usuarios(['V-90000001', 'V-90000002']) == ['V-90000001', 'V-90000002']
+
+
+def test_import_rejects_bad_header_before_starting(login):
+    client = login('bench_admin_1')
+    response = client.post('/api/pacientes/importar', data=b'nombre;telefono\nAna;123\n', content_type='text/csv')
+    assert response.status_code == 400
+    assert 'cedula' in response.get_json()['error']
+
+
+def test_database_error_keeps_committed_batches(app, monkeypatch):
+    write = patient_import.PatientImport._write
+    calls = []
+
+    def fail_second_batch(self, rows, hashed):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise DatabaseError('fallo simulado')
+        write(self, rows, hashed)
+
+    monkeypatch.setattr(patient_import.PatientImport, '_write', fail_second_batch)
+    body = _csv(('Rosa Díaz', 'V-90000011', 'Clave1234!', 'rosa.diaz@correo.com'),
+                ('Pedro Gil', 'V-90000012', 'Clave1234!', 'pedro.gil@correo.com'))
+    conn = get_db_connection()
+    try:
+        report = patient_import.import_patients(conn, io.BytesIO(body), batch_size=1)
+    finally:
+        conn.close()
+
+    assert report['importados'] == 1
+    assert 'se detuvo' in report['error']
+    assert _usuarios(['V-90000011', 'V-90000012']) == ['V-90000011']
+
+
+def test_database_error_in_first_batch_raises(app, monkeypatch):
+    def fail(self, rows, hashed):
+        raise DatabaseError('fallo simulado')
+
+    monkeypatch.setattr(patient_import.PatientImport, '_write', fail)
+    conn = get_db_connection()
+    try:
+        with pytest.raises(DatabaseError):
+            patient_import.import_patients(conn, io.BytesIO(_csv(('Eva Sol', 'V-90000021', 'Clave1234!', ''))))
+    finally:
+        conn.close()
+
+
+def test_row_without_password_gets_an_unusable_one(app):
+    conn = get_db_connection()
+    try:
+        report = patient_import.import_patients(conn, io.BytesIO(_csv(('Iván Rey', 'V-90000031', '', 'ivan.rey@correo.com'))))
+        assert report['importados'] == 1, report
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT contraseña FROM Usuarios WHERE cedula = ?", ('V-90000031',))
+            assert cursor.fetchone()[0] == password_service.UNUSABLE_PASSWORD
+    finally:
+        conn.close()
+
+    response = app.test_client().post('/api/login', json={'identificador': 'V-90000031', 'contraseña': '!'},
+                                      headers={'X-Requested-With': 'XMLHttpRequest'})
+    assert response.status_code == 401
+
+
+def test_rows_without_email_are_all_imported(app):
+    conn = get_db_connection()
+    try:
+        report = patient_import.import_patients(conn, io.BytesIO(_csv(('Olga Paz', 'V-90000041', '', ''),
+                                                                      ('Raúl Paz', 'V-90000042', '', ''))))
+    finally:
+        conn.close()
+    assert report['importados'] == 2, report
+
+
+def _running_import(updated_sql='GETDATE()'):
+    """Una fila 'en_curso' como la que deja otro worker; devuelve su id."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO Importaciones_pacientes (estado, fecha_actualizacion)
+                OUTPUT INSERTED.id_importacion VALUES ('en_curso', {updated_sql})
+            """)
+            id_importacion = cursor.fetchone()[0]
+        conn.commit()
+        return id_importacion
+    finally:
+        conn.close()
+
+
+def _estado(id_importacion):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            return patient_import.get_import(cursor, id_importacion)['estado']
+    finally:
+        conn.close()
+
+
+def _close_import(id_importacion):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("UPDATE Importaciones_pacientes SET estado = 'error' WHERE id_importacion = ?", (id_importacion,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_import_running_in_another_process_is_busy(app):
+    other = _running_import()
+    conn = get_db_connection()
+    try:
+        with pytest.raises(patient_import.ImportBusy):
+            patient_import.import_patients(conn, io.BytesIO(_csv(('Sara Luna', 'V-90000051', '', ''))))
+    finally:
+        conn.close()
+        _close_import(other)
+    assert _usuarios(['V-90000051']) == []
+
+
+def test_stale_import_is_marked_as_error(login):
+    stale = _running_import('DATEADD(day, -1, GETDATE())')
+    estado = login('bench_admin_1').get(f'/api/pacientes/importar/{stale}').get_json()
+    assert estado['estado'] == 'error'
+    assert 'interrumpió' in estado['reporte']['error']
+
+    conn = get_db_connection()
+    try:
+        report = patient_import.import_patients(conn, io.BytesIO(_csv(('Tomás Vera', 'V-90000061', '', ''))))
+    finally:
+        conn.close()
+    assert report['importados'] == 1
+
+
+def test_expired_import_stops_writing(app, monkeypatch):
+    write = patient_import.PatientImport._write
+    claimed = []
+
+    def expire_then_write(self, rows, hashed):
+        # Otro proceso la dio por interrumpida antes de este lote
+        self.cursor.execute("UPDATE Importaciones_pacientes SET estado = 'error' WHERE id_importacion = ?",
+                            (self.id_importacion,))
+        claimed.append(self.id_importacion)
+        write(self, rows, hashed)
+
+    monkeypatch.setattr(patient_import.PatientImport, '_write', expire_then_write)
+    conn = get_db_connection()
+    try:
+        with pytest.raises(patient_import.ImportExpired):
+            patient_import.import_patients(conn, io.BytesIO(_csv(('Nora Gil', 'V-90000071', '', ''))))
+    finally:
+        conn.close()
+    assert _usuarios(['V-90000071']) == []
+    assert _estado(claimed[0]) == 'error'
@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask import jsonify
+
+from database import get_db_connection
+from query_budget import QUERY_BUDGETS, QueryBudgetExceeded, query_budget
+
+# login_required carga el usuario de la sesión con una consulta y una conexión
+# propias, que quedan fuera del presupuesto del endpoint
+AUTH_ROUND_TRIPS = 1
+AUTH_CONNECTIONS = 1
+
+
+def assert_within_budget(endpoint, counts):
+    budget = QUERY_BUDGETS[endpoint]
+    assert counts['round_trips'] > 0, "El cursor instrumentado no registró ninguna consulta"
+    assert counts['round_trips'] <= budget['round_trips'] + AUTH_ROUND_TRIPS, (endpoint, counts, budget)
+    assert counts['connections'] <= budget['connections'] + AUTH_CONNECTIONS, (endpoint, counts, budget)
+
+
+@pytest.mark.parametrize('usuario_login, path, endpoint', [
+    ('bench_admin_1', '/api/admin/bootstrap', 'admin_bootstrap'),
+    ('bench_medico_1', '/api/doctor/bootstrap', 'doctor_bootstrap'),
+    ('bench_recepcion_1', '/api/reception/bootstrap', 'reception_bootstrap'),
+    ('bench_paciente_1', '/api/patient/bootstrap', 'patient_bootstrap'),
+    ('bench_admin_1', '/api/admin/stats', 'admin_stats'),
+    ('bench_admin_1', '/api/admin/recent-activity', 'recent_activity'),
+])
+def test_get_endpoint_budget(login, round_trips, usuario_login, path, endpoint):
+    client = login(usuario_login)
+    with round_trips() as counts:
+        response = client.get(path)
+    assert response.status_code == 200, response.get_json()
+    assert_within_budget(endpoint, counts)
+
+
+def _free_slot(cursor):
+    """Una cita pendiente y una fecha/hora libre dentro del horario de su médico."""
+    cursor.execute("SELECT id_cita, id_medico FROM Citas WHERE estado = 'pendiente' AND fecha_cita > ? ORDER BY id_cita",
+                   (date.today(),))
+    id_cita, id_medico = cursor.fetchone()
+    cursor.execute("SELECT dia_semana_num, hora_inicio FROM Horarios_disponibles WHERE id_medico = ?", (id_medico,))
+    blocks = cursor.fetchall()
+    cursor.execute("SELECT fecha_cita, hora_cita FROM Citas WHERE id_medico = ?", (id_medico,))
+    taken = {(str(fecha)[:10], str(hora)[:5]) for fecha, hora in cursor.fetchall()}
+    for offset in range(1, 60):
+        fecha = date.today() + timedelta(days=offset)
+        for weekday, hora_inicio in blocks:
+            hora = str(hora_inicio)[:5]
+            if weekday == fecha.isoweekday() and (fecha.isoformat(), hora) not in taken:
+                return id_cita, fecha.isoformat(), hora
+    pytest.skip("No hay un horario libre para reagendar en los datos de prueba")
+
+
+def test_reschedule_cita_budget(login, round_trips):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            id_cita, fecha, hora = _free_slot(cursor)
+    finally:
+        conn.close()
+
+    client = login('bench_recepcion_1')
+    with round_trips() as counts:
+        response = client.patch(f'/api/citas/{id_cita}/reschedule', json={'fecha_cita': fecha, 'hora_cita': hora})
+    assert response.status_code == 200, response.get_json()
+    assert_within_budget('reschedule_cita', counts)
+
+
+def test_budget_exceeded_fails_in_testing(app):
+    @query_budget(round_trips=1)
+    def two_queries():
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.execute("SELECT 2")
+        finally:
+            conn.close()
+        return jsonify({'ok': datetime.now().isoformat()})
+
+    with app.app_context():
+        with pytest.raises(QueryBudgetExceeded):
+            two_queries()
@@ -1,9 +1,9 @@
 from flask import Blueprint, render_template, jsonify, request, session
 from auth_middleware import login_required
-from database import get_db_connection
+from database import get_db_connection, DatabaseError
 import logging
-import pyodbc
-from werkzeug.security import check_password_hash, generate_password_hash
+import password_service
+import cache
 
 profile_bp = Blueprint('profile', __name__)
  
@@ -81,10 +81,13 @@ def update_my_profile(current_user):
             # Actualizar la sesión si el nombre cambió
             if 'nombre_completo' in update_data:
                 session['nombre_completo'] = update_data['nombre_completo']
+            # Nombre y teléfono aparecen en la plantilla y el directorio de médicos
+            if current_user.get('id_medico'):
+                cache.bump('medicos')
 
             return jsonify({'message': 'Perfil actualizado exitosamente'}), 200
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Error de base de datos al actualizar perfil: {e}")
         return jsonify({'error': 'Error interno al actualizar el perfil'}), 500
@@ -115,15 +118,17 @@ def change_my_password(current_user):
             cursor.execute("SELECT contraseña FROM Usuarios WHERE id_usuario = ?", (current_user['id_usuario'],))
             user_row = cursor.fetchone()
 
-            if not user_row or not user_row.contraseña or not check_password_hash(user_row.contraseña, current_password):
+            if not user_row or not password_service.verify_password(user_row.contraseña, current_password):
                 return jsonify({'error': 'La contraseña actual es incorrecta'}), 403
 
-            new_hashed_password = generate_password_hash(new_password)
+            new_hashed_password = password_service.hash_password(new_password)
             cursor.execute("UPDATE Usuarios SET contraseña = ? WHERE id_usuario = ?", (new_hashed_password, current_user['id_usuario']))
             conn.commit()
 
             return jsonify({'message': 'Contraseña actualizada exitosamente'}), 200
 
+    except password_service.PasswordServiceBusy:
+        return password_service.busy_response()
     except Exception as e:
         conn.rollback()
         logging.error(f"Error inesperado al cambiar contraseña: {e}")
@@ -1,17 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app, session
 from auth_middleware import login_required
-import pyodbc
 import logging
 import secrets
-import smtplib
-from database import get_db_connection
-from werkzeug.security import generate_password_hash, check_password_hash, generate_password_hash
-from werkzeug.security import generate_password_hash
-import pyodbc
+from database import get_db_connection, DatabaseError
+import password_service
+import identity_index
+import cache
+import activity
 import re  # For email validation
 from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 users_bp = Blueprint('users', __name__)
 
@@ -150,7 +147,7 @@ def get_users():
             'total_pages': (total_users + per_page - 1) // per_page
         })
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Database error in get_users: {str(e)}")
         return jsonify({'error': 'Error al obtener usuarios', 'details': str(e)}), 500
     except Exception as e:
@@ -194,7 +191,7 @@ def get_user(user_id):
             'tipo_usuario': user[8]
         })
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Database error in get_user: {str(e)}")
         return jsonify({'error': 'Error al obtener el usuario', 'details': str(e)}), 500
     except Exception as e:
@@ -226,11 +223,7 @@ def create_user():
         return jsonify(validation_error[0]), validation_error[1]
 
     # Generar hash de contraseña
-    hashed_password = generate_password_hash(
-        data['contraseña'],
-        method='pbkdf2:sha256',
-        salt_length=16
-    )
+    hashed_password = password_service.hash_password(data['contraseña'])
 
     # Derivar tipo_usuario del id_rol
     id_rol = int(data['id_rol'])
@@ -283,20 +276,25 @@ def create_user():
 
         # Crear registro correspondiente en Pacientes o Medicos según el tipo
         if tipo_usuario == 'paciente':
-            cursor.execute("INSERT INTO Pacientes (id_usuario, estado) VALUES (?, 'A')", (new_user_id,))
+            cursor.execute("INSERT INTO Pacientes (id_usuario, estado) OUTPUT INSERTED.id_paciente VALUES (?, 'A')", (new_user_id,))
+            activity.record(cursor, activity.PACIENTE, cursor.fetchone()[0])
             logging.info(f"Created patient record for new user_id: {new_user_id}")
         elif tipo_usuario == 'medico':
-            cursor.execute("INSERT INTO Medicos (id_usuario, estado) VALUES (?, 'A')", (new_user_id,))
+            cursor.execute("INSERT INTO Medicos (id_usuario, estado) OUTPUT INSERTED.id_medico VALUES (?, 'A')", (new_user_id,))
+            activity.record(cursor, activity.MEDICO, cursor.fetchone()[0])
             logging.info(f"Created doctor record for new user_id: {new_user_id}")
 
         conn.commit()
+        identity_index.record_created(usuario_login=data['usuario_login'], cedula=str(data['cedula']), gmail=data.get('gmail'))
+        if tipo_usuario == 'medico':
+            cache.bump('medicos')
 
         return jsonify({
             'message': 'Usuario creado exitosamente',
             'id_usuario': new_user_id
         }), 201
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Database error in create_user: {str(e)}")
         return jsonify({'error': 'Error al crear el usuario', 'details': str(e)}), 500
@@ -337,6 +335,11 @@ def update_user(user_id):
         logging.error(f"Error de validación: {validation_error[0]}")
         return jsonify(validation_error[0]), validation_error[1]
 
+    # El hash se calcula antes de abrir la conexión para no retenerla mientras tanto
+    hashed_password = None
+    if 'contraseña' in data and data['contraseña']:
+        hashed_password = password_service.hash_password(data['contraseña'])
+
     conn = get_db_connection()
     if not conn:
         logging.error("Error de conexión a la base de datos")
@@ -414,8 +417,7 @@ def update_user(user_id):
             update_params.append(bool(data['activo']))
         
         # Actualizar contraseña solo si se proporciona
-        if 'contraseña' in data and data['contraseña']:
-            hashed_password = generate_password_hash(data['contraseña'], method='pbkdf2:sha256', salt_length=16)
+        if hashed_password:
             update_fields.append("contraseña = ?")
             update_params.append(hashed_password)
 
@@ -457,10 +459,14 @@ def update_user(user_id):
                     logging.info(f"Added to Medicos table for user_id: {user_id}")
         
         conn.commit()
+        # Nombre, teléfono, correo o rol pueden cambiar la plantilla de médicos
+        cache.bump('medicos')
+        if any(field in data for field in ('usuario_login', 'cedula', 'gmail')):
+            identity_index.record_changed(usuario_login=data.get('usuario_login'), cedula=data.get('cedula'), gmail=data.get('gmail'))
 
         return jsonify({'message': 'Usuario actualizado exitosamente'})
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         error_msg = f"Database error in update_user: {str(e)}"
         logging.error(error_msg)
@@ -509,7 +515,7 @@ def delete_user(user_id):
 
         return jsonify({'message': 'Usuario desactivado exitosamente'})
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Database error in delete_user: {str(e)}")
         return jsonify({
@@ -590,7 +596,7 @@ def request_password_recovery():
             'email_sent': True
         })
         
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Database error in password recovery: {str(e)}")
         return jsonify({'error': 'Error al procesar la solicitud'}), 500
@@ -637,6 +643,9 @@ def reset_password():
         logging.error("Password too short in reset request")
         return jsonify({'error': 'La contraseña debe tener al menos 8 caracteres'}), 400
     
+    # El hash se calcula antes de abrir la conexión para no retenerla mientras tanto
+    hashed_password = password_service.hash_password(new_password)
+
     conn = get_db_connection()
     if not conn:
         logging.error("Database connection failed in reset password")
@@ -667,8 +676,6 @@ def reset_password():
         user_id, expiration = token_data
         
         # Actualizar contraseña del usuario
-        hashed_password = generate_password_hash(new_password, method='pbkdf2:sha256', salt_length=16)
-        
         cursor.execute("""
             UPDATE Usuarios 
             SET contraseña = ? 
@@ -686,7 +693,7 @@ def reset_password():
         
         return jsonify({'message': 'Contraseña restablecida exitosamente'})
         
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         conn.rollback()
         logging.error(f"Database error in reset_password: {str(e)}")
         return jsonify({'error': 'Error al restablecer la contraseña', 'details': str(e)}), 500
@@ -702,6 +709,11 @@ def reset_password():
 
 def send_recovery_email(to_email, username, code):
     """Envía email de recuperación de contraseña"""
+    # smtplib y email solo se necesitan aquí; se cargan bajo demanda
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     try:
         # Configuración desde variables de entorno o configuración de la app
         smtp_server = current_app.config.get('SMTP_SERVER', 'smtp.gmail.com')
@@ -791,7 +803,7 @@ def get_all_pacientes():
 
         return jsonify(pacientes_list)
 
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Database error in get_all_pacientes: {str(e)}")
         return jsonify({'error': 'Error al obtener la lista de pacientes'}), 500
     finally:
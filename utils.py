@@ -1,7 +1,6 @@
 from datetime import datetime, time, timedelta
-import pyodbc
 import logging
-from database import get_db_connection
+from database import get_db_connection, DatabaseError
 
 def validate_schedule_input(doctor_id: int, day_of_week: int, start_time: str, end_time: str) -> bool:
     """Valida los parámetros de entrada para horarios"""
@@ -38,7 +37,7 @@ def check_schedule_conflict(doctor_id, dia_semana, hora_inicio, hora_fin, exclud
                 SELECT COUNT(*) 
                 FROM horarios_disponibles
                 WHERE id_medico = ? 
-                AND dia_semana = ? 
+                AND dia_semana_num = ? 
                 AND (
                     (? < hora_fin AND ? > hora_inicio)
                 )
@@ -53,7 +52,7 @@ def check_schedule_conflict(doctor_id, dia_semana, hora_inicio, hora_fin, exclud
             count = cursor.fetchone()[0]
             return count > 0
             
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logging.error(f"Error verificando conflictos: {str(e)}")
         return True  # Assume conflict if error occurs
     finally:
@@ -1,10 +1,21 @@
 from datetime import datetime, time
 import logging
-from database import get_db_connection
-import pyodbc
+import re
+from database import get_db_connection, DatabaseError
 
 logger = logging.getLogger(__name__)
 
+# Formatos que exige el registro (auth.register) y la importación de pacientes
+CEDULA_REGEX = re.compile(r'^[VEGJ]-\d{5,9}$', re.IGNORECASE)
+EMAIL_REGEX = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]+$')
+
+def is_valid_cedula(cedula):
+    """Cédula con letra y guion: V-12345678"""
+    return bool(CEDULA_REGEX.match(str(cedula)))
+
+def is_valid_email(email):
+    return bool(EMAIL_REGEX.match(str(email)))
+
 def validate_schedule_input(id_medico, dia_semana, hora_inicio, hora_fin):
     """Valida los datos de entrada para un horario"""
     try:
@@ -39,7 +50,7 @@ def check_schedule_conflict(id_medico, dia_semana, hora_inicio, hora_fin, exclud
             query = """
                 SELECT id_horario 
                 FROM horarios_disponibles
-                WHERE id_medico = ? AND dia_semana = ?
+                WHERE id_medico = ? AND dia_semana_num = ?
                 AND (
                     (? < hora_fin AND ? > hora_inicio)
                 )
@@ -53,7 +64,7 @@ def check_schedule_conflict(id_medico, dia_semana, hora_inicio, hora_fin, exclud
             cursor.execute(query, params)
             return cursor.fetchone() is not None
             
-    except pyodbc.Error as e:
+    except DatabaseError as e:
         logger.error(f"Error al verificar conflicto de horario: {str(e)}")
         return True
     finally:
@@ -1,27 +1,28 @@
 # views.py
 from flask import Blueprint, render_template
+from page_cache import render_cached_page
 
 views_bp = Blueprint('views', __name__)
 
 @views_bp.route('/')
 def index():
-    return render_template('index.html')
+    return render_cached_page('index.html')
 
 @views_bp.route('/privacy')
 def privacy():
-    return render_template('privacy.html')
+    return render_cached_page('privacy.html')
 
 @views_bp.route('/terms')
 def terms():
-    return render_template('terms.html')
+    return render_cached_page('terms.html')
 
 @views_bp.route('/faq')
 def faq():
-    return render_template('faq.html')
+    return render_cached_page('faq.html')
 
 @views_bp.route('/login')
 def login_page():
-    return render_template('login.html')
+    return render_cached_page('login.html')
 
 @views_bp.route('/forgot_contraseña')
 def forgot_contraseña():